@@ -1,8 +1,10 @@
-import os
 import streamlit as st
 
-# --- If you use OpenAI, install "openai" and set OPENAI_API_KEY in Streamlit secrets ---
-from openai import OpenAI
+# --- Completions go through professorbot.llm; set OPENAI_API_KEY in Streamlit secrets ---
+from professorbot import engine, limits, quota, store
+from professorbot.students import student_key
+
+MODULE = "Behavior III"
 
 st.set_page_config(page_title="ProfessorBot - Behavior III", page_icon="💬")
 st.title("💬 ProfessorBot - Behavior III")
@@ -28,14 +30,8 @@ to download the transcript and submit to Canvas.
     )
 
 # ---------- Session State ----------
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-
-if "turn_count" not in st.session_state:
-    st.session_state.turn_count = 0  # counts user turns
-
-if "conversation_done" not in st.session_state:
-    st.session_state.conversation_done = False
+engine.init_state(st.session_state)
+store.restore(st.session_state, st.query_params)  # shared state when running several workers
 
 # ---------- Helper: system prompt (DO NOT CHANGE per your request) ----------
 SYSTEM_PROMPT = f"""
@@ -71,59 +67,56 @@ Conversation procedure: \n
 8. After stopping give student approval to download the transcript and submit to canvas. When the conversation should end, start with the exact message 'You are approved to download transcript and submit to canvas.'. Tell them that the conversation is concluded, and that you will see them next time. \n
 """
 
-def call_llm(chat_messages):
-    api_key = st.secrets.get("OPENAI_API_KEY", None) or os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return "⚠️ Missing OPENAI_API_KEY. Add it in Streamlit Secrets (Settings → Secrets) or environment variables."
-    client = OpenAI(api_key=api_key)
-
-    resp = client.chat.completions.create(
-        model="gpt-4.1",
-        messages=chat_messages,
-        temperature=0.4,
-    )
-    return resp.choices[0].message.content
-
+ENGINE = engine.Engine(MODULE, SYSTEM_PROMPT, PROCEDURE_PROMPT)
 
 # ---------- Render chat history ----------
 for m in st.session_state.messages:
     with st.chat_message(m["role"]):
-        st.markdown(m["content"])
+        st.markdown(m.full_text)
 
 # ---------- First assistant message ----------
-if len(st.session_state.messages) == 0:
-    opening = (
-        "Hi — I’m ProfessorBot.\n\n"
-        "Before we begin: **What is your Penn ID ?**"
-    )
-    st.session_state.messages.append({"role": "assistant", "content": opening})
+if ENGINE.start(st.session_state):
+    store.persist(st.session_state)
     st.rerun()
 
-# ---------- User input ----------
-user_text = st.chat_input("Type your response...", disabled=st.session_state.conversation_done)
-if user_text:
-    st.session_state.messages.append({"role": "user", "content": user_text})
-    st.session_state.turn_count += 1
+# ---------- Token quota ----------
+student = student_key(st.session_state.messages)
+quota_status, quota_note = quota.check(student, MODULE)
+if quota_note:
+    st.warning(quota_note)
 
-    # Build prompt
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-    messages.append({"role": "system", "content": PROCEDURE_PROMPT})
-    messages.append({"role": "system", "content": f"User turn count so far: {st.session_state.turn_count}. If >= 15, you must end now."})
-    messages += st.session_state.messages
+# ---------- Reply in progress (background job, survives reruns and refreshes) ----------
+if st.session_state.pending:
+    job = ENGINE.reply_job(st.session_state, student)
 
     # ---- show "typing" / loading indicator while fetching ----
     with st.chat_message("assistant"):
-        placeholder = st.empty()
-        placeholder.markdown("_ProfessorBot is typing…_")
-        assistant_text = call_llm(messages)
-        placeholder.markdown(assistant_text)
+        st.markdown("_ProfessorBot is typing…_")
+        assistant_text = job.result()
 
-    st.session_state.messages.append({"role": "assistant", "content": assistant_text})
+    ENGINE.finish(st.session_state, job, assistant_text, student)
+    store.persist(st.session_state)
+    st.rerun()
 
-    # Detect approval
-    if "approved to download transcript" in assistant_text:
-        st.session_state.conversation_done = True
+# ---------- Contest an off-topic refusal ----------
+if st.session_state.prefiltered and not st.session_state.conversation_done:
+    if st.button("My last message was about the course"):
+        ENGINE.contest(st.session_state)
+        st.info("Thanks — please send your message again.")
 
+# ---------- User input ----------
+if st.session_state.input_note:
+    st.warning(st.session_state.input_note)
+    st.session_state.input_note = None
+
+user_text = st.chat_input(
+    "Type your response...",
+    max_chars=limits.max_chars(MODULE),
+    disabled=st.session_state.conversation_done or quota_status == quota.BLOCK,
+)
+if user_text:
+    if ENGINE.accept(st.session_state, user_text):  # a rejected message only leaves a note
+        store.persist(st.session_state)
     st.rerun()
 
 # ---------- Download transcript ONLY after approval ----------
@@ -136,13 +129,7 @@ st.markdown("### 📥 Download chat transcript")
 if not st.session_state.conversation_done:
     st.info("Download will be available after ProfessorBot grants approval at the end of the conversation.")
 else:
-    lines = []
-    for m in st.session_state.get("messages", []):
-        role = m.get("role", "unknown").upper()
-        content = m.get("content", "")
-        lines.append(f"{role}:\n{content}\n")
-
-    txt_data = "\n---\n".join(lines)
+    txt_data = engine.transcript(st.session_state.messages)
 
     st.download_button(
         label="Download transcript (TXT)",
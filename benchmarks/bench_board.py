@@ -0,0 +1,138 @@
+"""Progress board push latency for a full class.
+
+Runs ``professorbot.asgi`` in-process (uvicorn on a thread) with
+``--students`` simulated students publishing per-turn progress events for
+one module, each turn ``--think`` seconds apart (jittered), walking the
+procedure and getting approved after ``--turns`` turns. ``--viewers``
+clients hold the board's event stream open. Reported: events published,
+pushes received, the latency from each event's publication to the first
+push that includes it (p50/p95/max, across every viewer), and the cost of
+``publish`` and ``snapshot`` in microseconds.
+
+    python benchmarks/bench_board.py --students 300 --viewers 5 --duration 30
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("PROFESSORBOT_DASHBOARD_PASSWORD", "bench")
+
+
+def students(module, count, think, turns, duration, published, stop):
+    """Publish every student's turns from one thread; records (version, time) after each event."""
+    from professorbot import procedure, progress
+
+    steps = [sid for sid, _ in procedure.page_steps()[module]]
+    board = progress.board(module)
+    due = [(random.uniform(0, think), i, 0) for i in range(count)]
+    heapq.heapify(due)
+    started = time.time()
+    while due and not stop.is_set() and time.time() - started < duration:
+        at, i, turn = heapq.heappop(due)
+        time.sleep(max(0.0, started + at - time.time()))
+        approved = turn >= turns
+        step = None if approved else steps[min(turn * len(steps) // turns, len(steps) - 1)]
+        progress.publish(module, f"bench-{i}", f"{10_000_000 + i}", step, turn, approved)
+        published.append((board.version, time.time()))
+        if not approved:
+            heapq.heappush(due, (at + think * random.uniform(0.5, 1.5), i, turn + 1))
+
+
+async def viewer(port, slug, published, latencies, pushes, stop):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /api/{slug}/board/events?key=bench HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+    await writer.drain()
+    seen = 0  # events already delivered to this viewer
+    buffer = b""
+    while not stop.is_set():
+        try:
+            chunk = await asyncio.wait_for(reader.read(65536), 0.5)
+        except asyncio.TimeoutError:
+            continue
+        if not chunk:
+            break
+        buffer += chunk
+        while b"\n\n" in buffer:
+            block, buffer = buffer.split(b"\n\n", 1)
+            line = next((l for l in block.split(b"\n") if l.startswith(b"data: ")), None)
+            if line is None:
+                continue
+            now = time.time()
+            version = json.loads(line[6:])["version"]
+            pushes.append(now)
+            while seen < len(published) and published[seen][0] <= version:
+                latencies.append(now - published[seen][1])
+                seen += 1
+    writer.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--page", default="Behavior-III.py")
+    ap.add_argument("--students", type=int, default=300)
+    ap.add_argument("--viewers", type=int, default=5)
+    ap.add_argument("--think", type=float, default=10.0, help="mean seconds between a student's turns")
+    ap.add_argument("--turns", type=int, default=10, help="turns until approval")
+    ap.add_argument("--duration", type=float, default=30.0)
+    ap.add_argument("--port", type=int, default=8880)
+    args = ap.parse_args()
+
+    import uvicorn
+
+    from professorbot import asgi, engine, progress
+
+    e = engine.Engine.from_page(os.path.join(ROOT, args.page))
+    server = uvicorn.Server(uvicorn.Config(asgi.app, port=args.port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    published, latencies, stop = [], [], threading.Event()
+    pushes = [[] for _ in range(args.viewers)]
+
+    async def run():
+        views = [asyncio.ensure_future(viewer(args.port, asgi.slug(e.module), published, latencies, p, stop))
+                 for p in pushes]
+        await asyncio.sleep(0.5)
+        await asyncio.to_thread(students, e.module, args.students, args.think, args.turns, args.duration,
+                                published, stop)
+        await asyncio.sleep(1.0)  # let the last pushes arrive
+        stop.set()
+        await asyncio.gather(*views)
+
+    asyncio.run(run())
+    server.should_exit = True
+
+    board = progress.board(e.module)
+    started = time.perf_counter()
+    for _ in range(1000):
+        board.snapshot()
+    snapshot_us = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    for i in range(10_000):
+        progress.publish("bench-publish", f"s{i % 300}", "x", "1", i // 300)
+    publish_us = (time.perf_counter() - started) * 100
+
+    lat = sorted(latencies) or [float("nan")]
+    print(json.dumps({
+        "students": args.students, "viewers": args.viewers, "events": len(published),
+        "events_per_s": round(len(published) / args.duration, 1),
+        "pushes_per_viewer": round(statistics.mean(len(p) for p in pushes), 1),
+        "latency_ms": {"p50": round(statistics.median(lat) * 1000, 1), "p95": round(lat[int(0.95 * (len(lat) - 1))] * 1000, 1),
+                       "max": round(lat[-1] * 1000, 1)},
+        "publish_us": round(publish_us, 1), "snapshot_us": round(snapshot_us, 1),
+        "board": {k: board.snapshot()[k] for k in ("students", "in_progress", "approved", "stuck_count")},
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Cancellation of in-flight completions: disconnects and deadlines.
+
+Each case runs in a new interpreter against ``professorbot.localserver``
+streaming one word every ``--delay`` seconds, and submits one reply job the
+way the pages do. ``full`` lets it finish; ``disconnect`` cancels the job
+``--after`` seconds in (what the token does once every waiting session is
+gone); ``deadline`` sets PROFESSORBOT_TURN_DEADLINE to ``--after``. Reported:
+job wall time, how long the job took to stop after the cancel, words the
+server still had to send when the client hung up, and the cancelled-token
+counts recorded by ``professorbot.cancel``.
+
+    python benchmarks/bench_cancel.py --delay 0.05 --after 0.5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+from professorbot import localserver
+server = localserver.serve(port=0)
+os.environ["PROFESSORBOT_BACKENDS"] = json.dumps({{"backends": {{"local": {{
+    "base_url": f"http://127.0.0.1:{{server.server_port}}/v1", "api_key": "local", "metered": False}}}}}})
+from professorbot import cancel, jobs, llm
+from professorbot.chatlog import ChatLog, prompt_prefix
+
+procedure = "\n".join(f"{{i}}. " + "Ask the student a long and careful question about their choice " * 3 for i in range(1, 6))
+log = ChatLog()
+log.append("assistant", "Hi, what is your Penn ID?")
+log.append("user", "12345678")
+started = time.perf_counter()
+job = jobs.submit(("bench", 1), llm.call_llm, log.request(prompt_prefix("You are ProfessorBot.", procedure), "ctl"), "bench")
+cancelled_at = None
+if {case!r} == "disconnect":
+    time.sleep({after})
+    cancelled_at = time.perf_counter()
+    jobs.cancel(("bench", 1), "disconnected")
+try:
+    result = job.result()
+    outcome = "finished" if not result.startswith("⚠️") else "deadline notice"
+except cancel.Cancelled as exc:
+    outcome = "cancelled: " + exc.reason
+ended = time.perf_counter()
+if {case!r} == "deadline":
+    cancelled_at = started + {after}
+time.sleep(0.3)  # let the server notice the hang-up
+print(json.dumps({{"outcome": outcome, "job_s": round(ended - started, 3),
+                  "stop_after_cancel_ms": None if cancelled_at is None else round((ended - cancelled_at) * 1000, 1),
+                  "server": localserver.STREAMS, "cancelled_tokens": cancel.stats()}}))
+"""
+
+
+def run(case, delay, after):
+    env = dict(os.environ, PROFESSORBOT_LOCAL_TOKEN_DELAY=str(delay))
+    if case == "deadline":
+        env["PROFESSORBOT_TURN_DEADLINE"] = str(after)
+    out = subprocess.run([sys.executable, "-c", CHILD.format(root=ROOT, case=case, after=after)],
+                         env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--delay", type=float, default=0.05, help="seconds per streamed word")
+    ap.add_argument("--after", type=float, default=0.5, help="seconds before the disconnect / deadline")
+    args = ap.parse_args()
+    for case in ("full", "disconnect", "deadline"):
+        print(json.dumps({"case": case, **run(case, args.delay, args.after)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Resident memory of N concurrent sessions: plain list-of-dicts vs ChatLog.
+
+Each variant runs in a fresh subprocess so RSS numbers are not shared. RSS does
+not shrink when freed memory stays in the allocator's arenas, so live heap size
+(tracemalloc) is reported too; that is the number spilling reduces.
+
+    python benchmarks/bench_chatlog.py --sessions 1000 --turns 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SYSTEM = "You are ProfessorBot, simulating a brief one-on-one interaction. " * 40
+PROCEDURE = "Conversation procedure: step. " * 120
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def fake_text(session, turn, n):
+    # distinct strings per session so nothing is shared by accident
+    return (f"s{session}t{turn} " + "lorem ipsum dolor sit amet " * n)[: n * 27]
+
+
+def run_baseline(sessions, turns):
+    states, payloads = [], []
+    for s in range(sessions):
+        history = [{"role": "assistant", "content": "Hi — I’m ProfessorBot."}]
+        for t in range(turns):
+            history.append({"role": "user", "content": fake_text(s, t, 8)})
+            messages = [{"role": "system", "content": SYSTEM}]
+            messages.append({"role": "system", "content": PROCEDURE})
+            messages.append({"role": "system", "content": f"User turn count so far: {t + 1}."})
+            messages += history
+            history.append({"role": "assistant", "content": fake_text(s, t, 20)})
+        states.append(history)
+        payloads.append(messages)  # the last request each session built
+    return states, payloads
+
+
+def run_chatlog(sessions, turns):
+    from professorbot.chatlog import ChatLog, prompt_prefix
+
+    states, payloads = [], []
+    for s in range(sessions):
+        log = ChatLog()
+        log.append("assistant", "Hi — I’m ProfessorBot.")
+        for t in range(turns):
+            log.append("user", fake_text(s, t, 8))
+            messages = log.request(prompt_prefix(SYSTEM, PROCEDURE), f"User turn count so far: {t + 1}.")
+            log.append("assistant", fake_text(s, t, 20))
+        states.append(log)
+        payloads.append(messages)
+    return states, payloads
+
+
+def run_spilled(sessions, turns):
+    from professorbot import chatlog
+
+    states, _ = run_chatlog(sessions, turns)
+    chatlog.sweep(ttl=1e-9)  # every session idle: spill them all
+    return states
+
+
+def child(variant, sessions, turns):
+    os.environ["PROFESSORBOT_SPILL_TTL"] = "0"  # only the explicit sweep in run_spilled
+    before = rss_bytes()
+    tracemalloc.start()
+    keep = VARIANTS[variant](sessions, turns)
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    after = rss_bytes()
+    print(json.dumps({"variant": variant, "sessions": sessions, "turns": turns,
+                      "rss_mb": round((after - before) / 2**20, 2),
+                      "heap_mb": round(heap / 2**20, 2)}))
+    return keep
+
+
+VARIANTS = {"baseline": run_baseline, "chatlog": run_chatlog, "spilled": run_spilled}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=1000)
+    ap.add_argument("--turns", type=int, default=15)
+    ap.add_argument("--child", choices=sorted(VARIANTS))
+    args = ap.parse_args()
+    if args.child:
+        child(args.child, args.sessions, args.turns)
+        return
+    for variant in VARIANTS:
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", variant,
+             "--sessions", str(args.sessions), "--turns", str(args.turns)],
+            check=True, capture_output=True, text=True,
+        )
+        print(out.stdout.strip())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""First-turn latency on a fresh process, with and without professorbot.warmup.
+
+Each case runs in a new interpreter against the configured endpoint
+(OPENAI_API_KEY, and OPENAI_BASE_URL for a self-hosted or mock server) and
+times import plus the first and second completions.
+
+    python benchmarks/bench_first_turn.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+if {warm}:
+    from professorbot import warmup
+    warmup.warm()
+t1 = time.perf_counter()
+from professorbot.llm import call_llm
+msgs = [{{"role": "system", "content": "Reply with one word."}}, {{"role": "user", "content": "Hello"}}]
+s = time.perf_counter(); call_llm(msgs, "bench", "bench"); first = time.perf_counter() - s
+s = time.perf_counter(); call_llm(msgs, "bench", "bench"); second = time.perf_counter() - s
+print(json.dumps({{"startup": t1 - t0, "first_turn": first, "second_turn": second}}))
+"""
+
+
+def run(warm):
+    env = dict(os.environ, PROFESSORBOT_READY_FILE=os.path.join(ROOT, ".bench.ready"))
+    out = subprocess.run([sys.executable, "-c", CHILD.format(root=ROOT, warm=warm)],
+                         env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+    for warm in (False, True):
+        results = [run(warm) for _ in range(args.runs)]
+        summary = {k: round(statistics.median(r[k] for r in results) * 1000, 1) for k in results[0]}
+        print(json.dumps({"warmup": warm, "median_ms": summary}))
+    ready = os.path.join(ROOT, ".bench.ready")
+    if os.path.exists(ready):
+        os.remove(ready)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Concurrent sessions per core: the Streamlit pages against ``professorbot.asgi``.
+
+Both frontends serve one page (``--page``, Behavior III by default) from a
+single process, pinned to ``--core`` when the machine has more than one, and
+backed by ``professorbot.localserver`` streaming one word every ``--delay``
+seconds. N simulated students each keep a session open and send a message
+every ``--think`` seconds (jittered); a student whose conversation is
+approved starts a new one. Streamlit students speak its websocket protocol
+like a browser tab does, so every turn pays for the script reruns.
+
+For each N, after ``--warmup`` seconds, the benchmark measures over
+``--duration`` seconds: turns per second, p50/p95 turn latency (send to the
+full reply), the frontend process's CPU in cores (from /proc) and its
+resident memory. ``sessions_per_core`` is N divided by the cores used, the
+capacity of one core at this pace if latency holds; the run stops growing N
+for a frontend once its p95 exceeds ``--slo`` seconds.
+
+    python benchmarks/bench_frontends.py --sessions 25,50,100,200 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STUDENT = [
+    "12345678",
+    "I think people mostly stick with whatever option is already selected for them.",
+    "Yes, I think that is reasonable as long as people can opt out easily.",
+    "Because changing a default takes effort and people assume it is the recommended choice.",
+    "I am not sure, maybe the government should decide but with some oversight.",
+]
+
+
+# ---------- processes ----------
+def _pinned(core):
+    def pin():
+        if core is not None and hasattr(os, "sched_setaffinity") and len(os.sched_getaffinity(0)) > 1:
+            os.sched_setaffinity(0, {core})
+    return pin
+
+
+def _wait_port(port, timeout=30.0):
+    import socket
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"nothing listening on port {port}")
+
+
+def start_frontend(kind, page, port, env, core):
+    if kind == "streamlit":
+        cmd = [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, page), "--server.port", str(port),
+               "--server.headless", "true", "--browser.gatherUsageStats", "false"]
+    else:
+        cmd = [sys.executable, "-m", "professorbot.asgi", "--port", str(port)]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, preexec_fn=_pinned(core),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _wait_port(port)
+    return proc
+
+
+def cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+# ---------- students ----------
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.measuring = False
+
+    def turn(self, seconds):
+        if self.measuring:
+            self.latencies.append(seconds)
+
+
+async def _think(think):
+    await asyncio.sleep(think * random.uniform(0.5, 1.5))
+
+
+async def streamlit_student(port, think, stats, stop):
+    import websockets
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    async def run(ws, chat_id=None, text=None):
+        """Rerun the script (with a chat message) until a run finishes normally; returns the input's id."""
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        if text is not None:
+            widget = msg.rerun_script.widget_states.widgets.add()
+            widget.id = chat_id
+            widget.chat_input_value.data = text
+        await ws.send(msg.SerializeToString())
+        found, disabled = None, False
+        while True:
+            fwd = ForwardMsg()
+            fwd.ParseFromString(await ws.recv())
+            kind = fwd.WhichOneof("type")
+            if kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                element = fwd.delta.new_element
+                if element.WhichOneof("type") == "chat_input":
+                    found, disabled = element.chat_input.id, element.chat_input.disabled
+            elif kind == "script_finished" and fwd.script_finished == ForwardMsg.FINISHED_SUCCESSFULLY:
+                return found, disabled
+
+    while not stop.is_set():
+        async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"],
+                                      max_size=None) as ws:
+            chat_id, done = await run(ws)
+            for text in _messages():
+                if done or stop.is_set():
+                    break
+                await _think(think)
+                started = time.perf_counter()
+                chat_id, done = await run(ws, chat_id, text)
+                stats.turn(time.perf_counter() - started)
+
+
+async def _http(port, method, path, body=None):
+    """Tiny HTTP/1.1 client: ``(status, body)``, reading chunked event streams to the end."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, _, rest = data.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    if b"transfer-encoding: chunked" in head.lower():
+        out = b""
+        while rest:
+            size, _, rest = rest.partition(b"\r\n")
+            n = int(size, 16)
+            if n == 0:
+                break
+            out, rest = out + rest[:n], rest[n + 2:]
+        rest = out
+    return status, rest.decode("utf-8")
+
+
+async def asgi_student(port, slug, think, stats, stop):
+    while not stop.is_set():
+        _, body = await _http(port, "POST", f"/api/{slug}/sessions")
+        sid = json.loads(body)["session"]
+        for text in _messages():
+            if stop.is_set():
+                break
+            await _think(think)
+            started = time.perf_counter()
+            status, body = await _http(port, "POST", f"/api/{slug}/sessions/{sid}/messages", {"text": text})
+            if status != 200 or "event: done" not in body:
+                stats.errors += 1
+                break
+            stats.turn(time.perf_counter() - started)
+            if '"approved": true' in body:
+                break
+
+
+def _messages():
+    yield STUDENT[0]
+    while True:
+        yield random.choice(STUDENT[1:])
+
+
+# ---------- runs ----------
+async def measure(kind, port, slug, pid, sessions, think, warmup, duration):
+    stats, stop = Stats(), asyncio.Event()
+    student = streamlit_student if kind == "streamlit" else asgi_student
+    tasks = []
+    for _ in range(sessions):  # stagger the arrivals over the warm-up
+        args = (port, think, stats, stop) if kind == "streamlit" else (port, slug, think, stats, stop)
+        tasks.append(asyncio.ensure_future(student(*args)))
+        await asyncio.sleep(warmup / sessions)
+    stats.measuring = True
+    cpu_before, started = cpu_seconds(pid), time.perf_counter()
+    await asyncio.sleep(duration)
+    stats.measuring = False
+    elapsed, cpu = time.perf_counter() - started, cpu_seconds(pid) - cpu_before
+    memory = rss_mb(pid)
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    failed = sum(1 for r in await asyncio.gather(*tasks, return_exceptions=True)
+                 if isinstance(r, Exception) and not isinstance(r, asyncio.CancelledError))
+    lat = sorted(stats.latencies) or [float("nan")]
+    cores = cpu / elapsed
+    return {
+        "frontend": kind, "sessions": sessions, "turns_per_s": round(len(stats.latencies) / elapsed, 2),
+        "p50_s": round(statistics.median(lat), 3), "p95_s": round(lat[int(0.95 * (len(lat) - 1))], 3),
+        "cpu_cores": round(cores, 3), "rss_mb": round(memory, 1),
+        "sessions_per_core": round(sessions / cores) if cores else None,
+        "errors": stats.errors + failed,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--page", default="Behavior-III.py")
+    ap.add_argument("--frontend", action="append", choices=("streamlit", "asgi"), help="default both")
+    ap.add_argument("--sessions", default="10,25,50,100", help="concurrent students per step")
+    ap.add_argument("--think", type=float, default=5.0, help="mean seconds between a reply and the next message")
+    ap.add_argument("--delay", type=float, default=0.01, help="seconds per streamed word at the local server")
+    ap.add_argument("--warmup", type=float, default=5.0)
+    ap.add_argument("--duration", type=float, default=20.0)
+    ap.add_argument("--slo", type=float, default=5.0, help="p95 turn latency beyond which N stops growing")
+    ap.add_argument("--core", type=int, default=0, help="core the frontend is pinned to, on multi-core machines")
+    ap.add_argument("--port", type=int, default=8870)
+    args = ap.parse_args()
+
+    from professorbot import engine
+
+    slug = engine.Engine.from_page(os.path.join(ROOT, args.page)).module.lower().replace(" ", "-")
+    env = dict(os.environ, PROFESSORBOT_LOCAL_TOKEN_DELAY=str(args.delay), PYTHONPATH=ROOT)
+    local = subprocess.Popen([sys.executable, "-m", "professorbot.localserver", "--port", str(args.port + 1)],
+                             cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _wait_port(args.port + 1)
+    env["PROFESSORBOT_BACKENDS"] = json.dumps({"backends": {"local": {
+        "base_url": f"http://127.0.0.1:{args.port + 1}/v1", "api_key": "local", "metered": False}}})
+    try:
+        for kind in args.frontend or ("streamlit", "asgi"):
+            proc = start_frontend(kind, args.page, args.port, env, args.core)
+            try:
+                for n in (int(s) for s in args.sessions.split(",")):
+                    result = asyncio.run(measure(kind, args.port, slug, proc.pid, n, args.think,
+                                                 args.warmup, args.duration))
+                    print(json.dumps(result), flush=True)
+                    if result["p95_s"] > args.slo:
+                        break
+            finally:
+                proc.terminate()
+                proc.wait()
+    finally:
+        local.terminate()
+
+
+if __name__ == "__main__":
+    main()
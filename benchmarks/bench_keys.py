@@ -0,0 +1,93 @@
+"""API key pool against rate-limited mock endpoints.
+
+Each case runs in a new interpreter with ``professorbot.localserver``
+endpoints standing in for API keys (``localserver.Limits``: rate-limit
+headers, 429s, ``insufficient_quota`` and 401s like the hosted API), and
+sends completions through ``llm.complete`` at ``--rate`` per second for
+``--duration`` seconds, each with a prompt about ``--prompt`` tokens long.
+
+- ``single``: one key, 120 requests and 60k tokens per minute.
+- ``pool``: that key plus one half its size, one twice its size, one with
+  only 20k tokens of quota left and one the endpoint rejects.
+
+Reported: completions that succeeded or failed, latency p50/p95 (including
+any wait for a key), and per key the calls, tokens, state and the 429s and
+401s its endpoint sent.
+
+    python benchmarks/bench_keys.py --rate 4 --duration 30
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+KEYS = {
+    "single": [("a", dict(rpm=120, tpm=60_000))],
+    "pool": [("a", dict(rpm=120, tpm=60_000)), ("b", dict(rpm=60, tpm=30_000)), ("c", dict(rpm=240, tpm=120_000)),
+             ("low-quota", dict(rpm=600, quota=20_000)), ("revoked", dict(api_key="sk-rotated"))],
+}
+
+CHILD = r"""
+import json, os, statistics, sys, time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, {root!r})
+from professorbot import localserver
+servers, keys = {{}}, []
+for name, spec in {keys!r}:
+    servers[name] = localserver.serve(port=0, limits=localserver.Limits(**spec))
+    keys.append({{"name": name, "api_key": f"sk-{{name}}", "base_url": f"http://127.0.0.1:{{servers[name].server_port}}/v1"}})
+os.environ["PROFESSORBOT_BACKENDS"] = json.dumps({{"backends": {{"openai": {{"keys": keys, "metered": False}}}}}})
+from professorbot import backends, llm
+
+system = "You are ProfessorBot. " + "Follow the procedure one step at a time and ask one question per turn. " * ({prompt} // 15)
+messages = [{{"role": "system", "content": system}}, {{"role": "user", "content": "My answer is B because it is cheaper."}}]
+rate, duration = {rate}, {duration}
+started = time.perf_counter()
+
+def turn(i):
+    due = started + i / rate
+    time.sleep(max(0.0, due - time.perf_counter()))
+    try:
+        llm.complete(messages, "bench")
+        return True, time.perf_counter() - due
+    except Exception as exc:
+        return type(exc).__name__, time.perf_counter() - due
+
+with ThreadPoolExecutor(64) as pool:
+    results = list(pool.map(turn, range(int(rate * duration))))
+lat = sorted(t for ok, t in results if ok is True) or [float("nan")]
+failed = {{}}
+for ok, _ in results:
+    if ok is not True:
+        failed[ok] = failed.get(ok, 0) + 1
+print(json.dumps({{
+    "ok": sum(ok is True for ok, _ in results), "failed": failed,
+    "latency_ms": {{"p50": round(statistics.median(lat) * 1000, 1), "p95": round(lat[int(0.95 * (len(lat) - 1))] * 1000, 1)}},
+    "keys": [{{**{{k: s[k] for k in ("key", "state", "calls", "failures", "prompt_tokens", "completion_tokens")}},
+              "endpoint": servers[s["key"].split(":", 1)[1]].limits.stats}} for s in backends.key_statuses()],
+}}))
+"""
+
+
+def run(case, rate, duration, prompt):
+    code = CHILD.format(root=ROOT, keys=KEYS[case], rate=rate, duration=duration, prompt=prompt)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rate", type=float, default=4.0, help="completions per second")
+    ap.add_argument("--duration", type=float, default=30.0)
+    ap.add_argument("--prompt", type=int, default=600, help="prompt tokens per completion (approximate)")
+    ap.add_argument("--cases", nargs="+", default=list(KEYS))
+    args = ap.parse_args()
+    for case in args.cases:
+        print(json.dumps({"case": case, **run(case, args.rate, args.duration, args.prompt)}))
+
+
+if __name__ == "__main__":
+    main()
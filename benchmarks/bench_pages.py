@@ -0,0 +1,137 @@
+"""Headless script-run benchmark for every module page.
+
+Each page is driven through Streamlit's AppTest with the model replaced by a
+canned reply, and every scenario is timed (median of --repeat runs) with peak
+Python allocations from tracemalloc:
+
+    first_paint        fresh session, including the opening-message rerun
+    opening_rerun      plain rerun once the opening message is shown
+    turn_<N>           one user turn with N messages already in the history
+    download           rerun after approval, rendering the transcript download
+
+    python benchmarks/bench_pages.py --out bench_pages.json
+    python benchmarks/bench_pages.py --out new.json --compare bench_pages.json
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="bench-pages-")
+os.environ.setdefault("PROFESSORBOT_LEDGER", os.path.join(_tmp, "ledger.sqlite3"))
+os.environ.setdefault("PROFESSORBOT_PREFILTER_LOG", os.path.join(_tmp, "prefilter.jsonl"))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from professorbot import llm  # noqa: E402
+from professorbot.chatlog import ChatLog  # noqa: E402
+
+HISTORY_LENGTHS = (0, 10, 20, 40)
+REPLY = "Thanks — that is a thoughtful answer. What made you choose that option over the other one?"
+STUDENT = "I picked the first option mostly because the ratings looked a bit more consistent overall."
+
+
+def fake_call_llm(chat_messages, module=None, student=None, session=None):
+    return REPLY
+
+
+def history(n):
+    log = ChatLog()
+    log.append("assistant", "Hi — I’m ProfessorBot.\n\nBefore we begin: **What is your Penn ID ?**")
+    for i in range(n):
+        log.append("user" if i % 2 == 0 else "assistant", STUDENT if i % 2 == 0 else REPLY)
+    return log
+
+
+def measure(make_app, act, repeat):
+    times, peaks = [], []
+    for _ in range(repeat):
+        at = make_app()
+        tracemalloc.start()
+        started = time.perf_counter()
+        act(at)
+        times.append(time.perf_counter() - started)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+    return {"median_ms": round(statistics.median(times) * 1000, 3),
+            "min_ms": round(min(times) * 1000, 3),
+            "peak_kb": round(statistics.median(peaks) / 1024, 1)}
+
+
+def bench_page(path, repeat):
+    def fresh():
+        return AppTest.from_file(path, default_timeout=60)
+
+    def primed(n, done=False):
+        def make():
+            at = fresh()
+            at.session_state["messages"] = history(n)
+            at.session_state["turn_count"] = (n + 1) // 2
+            at.session_state["conversation_done"] = done
+            at.run()
+            return at
+        return make
+
+    results = {
+        "first_paint": measure(fresh, lambda at: at.run(), repeat),
+        "opening_rerun": measure(primed(0), lambda at: at.run(), repeat),
+    }
+    for n in HISTORY_LENGTHS:
+        results[f"turn_{n}"] = measure(primed(n), lambda at: at.chat_input[0].set_value(STUDENT).run(), repeat)
+    results["download"] = measure(primed(max(HISTORY_LENGTHS), done=True), lambda at: at.run(), repeat)
+    return results
+
+
+def compare(new, old):
+    for module, scenarios in new["modules"].items():
+        for name, stats in scenarios.items():
+            before = old["modules"].get(module, {}).get(name)
+            if before:
+                delta = (stats["median_ms"] - before["median_ms"]) / before["median_ms"]
+                flag = "  <-- slower" if delta > 0.2 else ""
+                print(f"{module:<20} {name:<14} {before['median_ms']:>9.2f} -> {stats['median_ms']:>9.2f} ms"
+                      f" ({delta:+.0%}){flag}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--module", action="append", help="page file name; repeatable; default all")
+    ap.add_argument("--out", default="bench_pages.json")
+    ap.add_argument("--compare", help="earlier report to diff against")
+    args = ap.parse_args()
+
+    llm.call_llm = fake_call_llm
+    pages = args.module or sorted(os.path.basename(p) for p in glob.glob(os.path.join(ROOT, "*.py")))
+    report = {"commit": git_commit(), "repeat": args.repeat, "modules": {}}
+    for page in pages:
+        report["modules"][page] = bench_page(os.path.join(ROOT, page), args.repeat)
+        print(page, json.dumps(report["modules"][page]))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Scrubbing throughput against plain reading.
+
+Builds a synthetic submission tree of ``--files`` transcripts (each a
+ProfessorBot conversation with a Penn ID, a Machine I style profile answer
+and details dropped into later turns), then reports MB/s for reading every
+file, for copying every file (the floor for anything that writes a new
+tree) and for ``scrub.scrub_tree`` at each ``--workers`` count, plus the
+tokens added to the key map.
+
+    python benchmarks/bench_scrub.py --files 5000 --workers 1 2 4
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("PROFESSORBOT_PII_KEY", "bench")
+
+FILLER = ("I think the main point is that incentives change behavior, but only when people notice them. "
+          "Could you explain why the second option is better?")
+DETAILS = ["I'm {age} years old.", "I'm from {town}.", "My hobbies are {hobby}.", "Email me at s{n}@upenn.edu",
+           "I am a {gender}.", "Call me at 215-555-{phone:04d}."]
+TOWNS = ["Austin", "New York City", "Lagos", "Seoul", "Philadelphia, PA", "São Paulo"]
+HOBBIES = ["chess and hiking", "painting", "soccer, guitar and cooking"]
+
+
+def transcript(n, turns):
+    fill = dict(age=random.randint(18, 30), town=random.choice(TOWNS), hobby=random.choice(HOBBIES), n=n,
+                gender=random.choice(["male", "female", "non-binary"]), phone=random.randint(0, 9999))
+    sections = [("ASSISTANT", "Hi — I’m ProfessorBot.\n\nBefore we begin: **What is your Penn ID ?**"),
+                ("USER", f"{10_000_000 + n}"),
+                ("ASSISTANT", "Thanks! Tell me your age, gender, where you are from and your hobbies."),
+                ("USER", f"{fill['age']}\n{fill['gender']}\n{fill['town']}\n{fill['hobby']}")]
+    for _ in range(turns):
+        sections.append(("ASSISTANT", FILLER))
+        detail = random.choice(DETAILS).format(**fill) if random.random() < 0.3 else ""
+        sections.append(("USER", f"{FILLER} {detail}".strip()))
+    return "\n---\n".join(f"{role}:\n{text}\n" for role, text in sections)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=5000)
+    ap.add_argument("--turns", type=int, default=12)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = ap.parse_args()
+
+    from professorbot import scrub
+
+    work = tempfile.mkdtemp(prefix="bench-scrub-")
+    src = os.path.join(work, "submissions")
+    random.seed(0)
+    for n in range(args.files):
+        folder = os.path.join(src, f"section-{n % 20:02d}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"Machine I__{n}_transcript.txt"), "w", encoding="utf-8") as f:
+            f.write(transcript(n, args.turns))
+
+    started, size = time.perf_counter(), 0
+    for dirpath, _, names in os.walk(src):
+        for name in names:
+            with open(os.path.join(dirpath, name), encoding="utf-8") as f:
+                size += len(f.read())
+    read_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    shutil.copytree(src, os.path.join(work, "copy"))
+    copy_s = time.perf_counter() - started
+
+    runs = []
+    for workers in args.workers:
+        out, keymap = os.path.join(work, f"out-{workers}"), os.path.join(work, f"keymap-{workers}.sqlite3")
+        started = time.perf_counter()
+        files, _, tokens = scrub.scrub_tree(src, out, keymap, workers)
+        elapsed = time.perf_counter() - started
+        runs.append({"workers": workers, "seconds": round(elapsed, 2), "mb_per_s": round(size / 1e6 / elapsed, 1),
+                     "tokens": tokens})
+    shutil.rmtree(work)
+
+    print(json.dumps({"files": args.files, "mb": round(size / 1e6, 1), "cpus": os.cpu_count(),
+                      "read_mb_per_s": round(size / 1e6 / read_s, 1), "copy_mb_per_s": round(size / 1e6 / copy_s, 1),
+                      "scrub": runs}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import streamlit as st
+
+from professorbot import backends, cancel, chatlog, config, jobs, metrics, speculate, stateful
+
+st.set_page_config(page_title="ProfessorBot - Dashboard", page_icon="📊", layout="wide")
+st.title("📊 ProfessorBot - Dashboard")
+
+# ---------- Instructor access ----------
+password = config.get("PROFESSORBOT_DASHBOARD_PASSWORD")
+if not password:
+    st.info("The dashboard is disabled. Set PROFESSORBOT_DASHBOARD_PASSWORD in Streamlit secrets to enable it.")
+    st.stop()
+if not st.session_state.get("dashboard_ok"):
+    if st.text_input("Password", type="password") != password:
+        st.stop()
+    st.session_state.dashboard_ok = True
+    st.rerun()
+
+WINDOWS = {"Last 5 minutes": 300, "Last hour": 3600, "Last 24 hours": 86400, "Everything retained": None}
+window = WINDOWS[st.selectbox("Window", list(WINDOWS), index=1)]
+
+
+# ---------- Live view (refreshes every 2 seconds) ----------
+@st.fragment(run_every=2)
+def live():
+    summary = metrics.turns.summary(window)
+    active, spilled = chatlog.live_count()
+
+    cols = st.columns(5)
+    cols[0].metric("Active sessions", active - spilled, help=f"{spilled} idle sessions spilled to disk")
+    cols[1].metric("Completions in flight", jobs.running())
+    cols[2].metric("Turns / minute", f"{metrics.turns.rate():.1f}")
+    cols[3].metric("Turns in window", sum(s["turns"] for s in summary.values()))
+    cols[4].metric("Spend in window", f"${sum(s['spend_usd'] for s in summary.values()):,.2f}")
+
+    if not summary:
+        st.info("No completions recorded in this window yet.")
+        return
+    st.markdown("#### Per module")
+    st.dataframe(
+        [{"module": m, **{k: round(v, 3) for k, v in s.items()}} for m, s in sorted(summary.items())],
+        hide_index=True,
+        width="stretch",
+    )
+
+    st.markdown("#### Per backend")
+    by_backend = metrics.turns.summary(window, by="backend")
+    st.dataframe(
+        [{**b, **{k: round(v, 3) for k, v in by_backend.get(b["backend"], {}).items()}} for b in backends.statuses()],
+        hide_index=True,
+        width="stretch",
+    )
+
+    keys = backends.key_statuses()
+    if len(keys) > 1:
+        st.markdown("#### Per API key (remaining quota as last reported by the provider)")
+        st.dataframe(keys, hide_index=True, width="stretch")
+
+    spec = speculate.stats()
+    if spec:
+        st.markdown("#### Speculative replies")
+        st.dataframe([{"module": m, **s} for m, s in sorted(spec.items())], hide_index=True)
+
+    stopped = cancel.stats()
+    if stopped:
+        st.markdown("#### Cancelled completions (deadline passed or student left)")
+        st.dataframe([{"module": m, **s} for m, s in sorted(stopped.items())], hide_index=True)
+
+    chained = stateful.stats()
+    if chained:
+        st.markdown("#### Stateful conversations (bytes sent per turn)")
+        st.dataframe([{"module": m, **{k: round(v, 1) for k, v in s.items()}} for m, s in sorted(chained.items())],
+                     hide_index=True)
+
+
+live()
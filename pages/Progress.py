@@ -0,0 +1,41 @@
+import streamlit as st
+
+from professorbot import config, procedure, progress
+
+st.set_page_config(page_title="ProfessorBot - Progress", page_icon="📈", layout="wide")
+st.title("📈 ProfessorBot - Progress")
+
+# ---------- Instructor access ----------
+password = config.get("PROFESSORBOT_DASHBOARD_PASSWORD")
+if not password:
+    st.info("The progress board is disabled. Set PROFESSORBOT_DASHBOARD_PASSWORD in Streamlit secrets to enable it.")
+    st.stop()
+if not st.session_state.get("dashboard_ok"):
+    if st.text_input("Password", type="password") != password:
+        st.stop()
+    st.session_state.dashboard_ok = True
+    st.rerun()
+
+module = st.selectbox("Module", sorted(procedure.page_steps()))
+
+
+# ---------- Live board (counts are kept by professorbot.progress; this only reads them) ----------
+@st.fragment(run_every=progress.INTERVAL * 2)
+def live():
+    board = progress.board(module).snapshot()
+
+    cols = st.columns(4)
+    cols[0].metric("Students", board["students"])
+    cols[1].metric("In progress", board["in_progress"])
+    cols[2].metric("Approved", board["approved"])
+    cols[3].metric("Stuck", board["stuck_count"])
+
+    st.markdown("#### Students per step")
+    st.bar_chart({s["step"]: s["students"] for s in board["steps"]}, horizontal=True)
+
+    if board["stuck"]:
+        st.markdown("#### Stuck")
+        st.dataframe(board["stuck"], hide_index=True, width="stretch")
+
+
+live()
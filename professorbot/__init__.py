@@ -0,0 +1 @@
+"""Shared helpers for the ProfessorBot module pages."""
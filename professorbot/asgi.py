@@ -0,0 +1,496 @@
+"""Minimal async HTTP frontend: the module conversations over server-sent events.
+
+The Streamlit pages rerun their whole script on every interaction and hold a
+thread and a websocket per session. This frontend runs the same conversations
+(``professorbot.engine``, built from the page scripts without running them)
+as a plain ASGI app: a session is a dict in memory, an idle session costs no
+thread, and the reply streams to the browser as it arrives. Run it with any
+ASGI server:
+
+    uvicorn professorbot.asgi:app --port 8000
+    python -m professorbot.asgi --port 8000
+
+Routes, where ``<m>`` is the module name in lower case with dashes (``behavior-iii``):
+
+    GET  /                                  module list
+    GET  /m/<m>                             chat page
+    POST /api/<m>/sessions                  start a conversation; returns its state
+    GET  /api/<m>/sessions/<id>             state: messages, turn_count, conversation_done, pending
+    POST /api/<m>/sessions/<id>/messages    {"text": ...}; the reply as an event stream
+    GET  /api/<m>/sessions/<id>/reply       reattach to a reply still owed (after a reload)
+    POST /api/<m>/sessions/<id>/contest     the last off-topic refusal was about the course
+    GET  /api/<m>/sessions/<id>/transcript  after approval
+    GET  /board/<m>?key=...                 live progress board (instructors)
+    GET  /api/<m>/board?key=...             the board as JSON
+    GET  /api/<m>/board/events?key=...      the board, pushed on every change
+
+Boards (``professorbot.progress``) need ``key`` to match
+PROFESSORBOT_DASHBOARD_PASSWORD and are disabled when it is unset.
+
+Events: ``note`` (input or quota feedback), ``delta`` (a piece of the reply),
+``done`` (the whole reply, ``approved``, ``refused``, ``rejected``) and
+``error``. Sessions live in this process and expire after
+PROFESSORBOT_ASGI_SESSION_TTL idle seconds (default 4 hours); with several
+workers, route each session to one worker. A reply whose client went away is
+cancelled after PROFESSORBOT_DISCONNECT_GRACE seconds unless a client
+reattaches.
+
+Engine calls that touch disk (the quota ledger, spilled message files, the
+archive) or start speculative replies run in worker threads via
+``asyncio.to_thread``, so one slow turn never stalls the event loop; a
+per-session lock keeps two requests from updating one conversation at once.
+"""
+import asyncio
+import hmac
+import json
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import CancelledError
+from html import escape
+from urllib.parse import parse_qs
+
+from professorbot import cancel, config, engine, jobs, limits, llm, progress, quota
+from professorbot.students import student_key
+
+SESSION_TTL = config.get_float("PROFESSORBOT_ASGI_SESSION_TTL", 4 * 3600)
+MAX_SESSIONS = config.get_int("PROFESSORBOT_ASGI_SESSIONS", 50_000)
+BOARD_HEARTBEAT = 5.0  # seconds between pushes of an unchanged board (idle students turn stuck)
+
+_engines = None
+_sessions = OrderedDict()  # session id -> conversation state, least recently used first
+_DONE = object()
+
+
+def slug(module):
+    return module.lower().replace(" ", "-")
+
+
+def engines():
+    """Engines of every module page, by slug."""
+    global _engines
+    if _engines is None:
+        from professorbot import warmup
+
+        found = {}
+        for path in warmup.pages():
+            try:
+                e = engine.Engine.from_page(path)
+            except KeyError:
+                continue  # not a module page
+            found[slug(e.module)] = e
+        _engines = found
+    return _engines
+
+
+# ---------- sessions ----------
+def new_session(e):
+    _expire()
+    sid = uuid.uuid4().hex
+    state = {"session_id": sid, "module": e.module, "watchers": 0, "seen": time.monotonic(), "lock": asyncio.Lock()}
+    engine.init_state(state)
+    e.start(state)
+    _sessions[sid] = state
+    return state
+
+
+def session(sid, module):
+    state = _sessions.get(sid)
+    if state is None or state["module"] != module:
+        return None
+    _sessions.move_to_end(sid)
+    state["seen"] = time.monotonic()
+    return state
+
+
+def _expire():
+    cutoff = time.monotonic() - SESSION_TTL
+    while _sessions:
+        state = next(iter(_sessions.values()))
+        if state["seen"] >= cutoff and len(_sessions) < MAX_SESSIONS:
+            break
+        del _sessions[state["session_id"]]
+
+
+def view(state):
+    return {
+        "session": state["session_id"],
+        "module": state["module"],
+        "messages": [{"role": m["role"], "content": m.full_text} for m in state["messages"]],
+        "turn_count": state["turn_count"],
+        "conversation_done": state["conversation_done"],
+        "pending": state["pending"] is not None,
+        "prefiltered": state["prefiltered"] is not None,
+    }
+
+
+# ---------- HTTP ----------
+async def _respond(send, status, body, content_type="application/json", headers=()):
+    if not isinstance(body, bytes):
+        body = (json.dumps(body) if content_type == "application/json" else body).encode("utf-8")
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", content_type.encode() + (b"; charset=utf-8" if content_type.startswith("text/") else b"")),
+        (b"content-length", str(len(body)).encode()), *headers]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_json(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(b"".join(chunks) or b"{}")
+    except ValueError:
+        return {}
+
+
+async def _open_events(send):
+    await send({"type": "http.response.start", "status": 200, "headers": [
+        (b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]})
+
+
+async def _event(send, name, data):
+    payload = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+    await send({"type": "http.response.body", "body": payload, "more_body": True})
+
+
+async def _close_events(send):
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _disconnected(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                engines()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    method, parts = scope["method"], [p for p in scope["path"].split("/") if p]
+    if method == "GET" and not parts:
+        return await _respond(send, 200, _index(), "text/html")
+    if method == "GET" and len(parts) == 2 and parts[0] == "m" and parts[1] in engines():
+        return await _respond(send, 200, _page(engines()[parts[1]]), "text/html")
+    if method == "GET" and len(parts) == 2 and parts[0] == "board" and parts[1] in engines():
+        if not _instructor(scope):
+            return await _respond(send, 403, {"error": "board key required"})
+        return await _respond(send, 200, _board_page(engines()[parts[1]]), "text/html")
+    if method == "GET" and len(parts) in (3, 4) and parts[0] == "api" and parts[2] == "board" \
+            and parts[1] in engines() and parts[3:] in ([], ["events"]):
+        if not _instructor(scope):
+            return await _respond(send, 403, {"error": "board key required"})
+        module = engines()[parts[1]].module
+        if len(parts) == 3:
+            return await _respond(send, 200, progress.board(module).snapshot())
+        return await _board_events(module, receive, send)
+    if len(parts) < 3 or parts[0] != "api" or parts[2] != "sessions" or parts[1] not in engines():
+        return await _respond(send, 404, {"error": "not found"})
+
+    e = engines()[parts[1]]
+    if len(parts) == 3:
+        if method != "POST":
+            return await _respond(send, 405, {"error": "use POST to start a conversation"})
+        return await _respond(send, 201, view(new_session(e)))
+    state = session(parts[3], e.module)
+    if state is None:
+        return await _respond(send, 404, {"error": "unknown or expired session"})
+    action = parts[4] if len(parts) > 4 else None
+
+    if method == "GET" and action is None:
+        return await _respond(send, 200, await asyncio.to_thread(view, state))
+    if method == "POST" and action == "messages":
+        text = (await _read_json(receive)).get("text")
+        if not isinstance(text, str) or not text.strip():
+            return await _respond(send, 400, {"error": "text is required"})
+        return await _message(e, state, text, receive, send)
+    if method == "GET" and action == "reply":
+        await _open_events(send)
+        if state["pending"] is not None:
+            await _relay(e, state, student_key(state["messages"], state["session_id"]), receive, send)
+        else:
+            await _event(send, "done", {"text": None, "approved": state["conversation_done"]})
+        return await _close_events(send)
+    if method == "POST" and action == "contest":
+        if state["prefiltered"] is None:
+            return await _respond(send, 409, {"error": "nothing to contest"})
+        async with state["lock"]:
+            await asyncio.to_thread(e.contest, state)
+        return await _respond(send, 200, await asyncio.to_thread(view, state))
+    if method == "GET" and action == "transcript":
+        if not state["conversation_done"]:
+            return await _respond(send, 403, {"error": "available after approval"})
+        text = await asyncio.to_thread(engine.transcript, state["messages"])
+        return await _respond(send, 200, text, "text/plain", [
+            (b"content-disposition", f'attachment; filename="transcript_{time.strftime("%Y%m%d_%H%M%S")}.txt"'.encode())])
+    return await _respond(send, 404, {"error": "not found"})
+
+
+# ---------- turns ----------
+async def _message(e, state, text, receive, send):
+    async with state["lock"]:  # a second message waits for this one to become the pending turn
+        if state["conversation_done"] or state["pending"] is not None:
+            return await _respond(send, 409, {
+                "error": "a reply is still owed" if state["pending"] else "conversation is over"})
+        student = student_key(state["messages"], state["session_id"])
+        status, note = await asyncio.to_thread(quota.check, student, e.module)
+        if status == quota.BLOCK:
+            return await _respond(send, 429, {"error": note})
+
+        await _open_events(send)
+        if note:
+            await _event(send, "note", {"note": note})
+        accepted = await asyncio.to_thread(e.accept, state, text)
+    if state["input_note"]:
+        await _event(send, "note", {"note": state["input_note"]})
+        state["input_note"] = None
+    if not accepted:
+        await _event(send, "done", {"text": None, "approved": False, "rejected": True})
+    elif state["pending"] is None:  # answered locally: the off-topic refusal
+        refusal = state["messages"][-1].full_text
+        await _event(send, "delta", {"text": refusal})
+        await _event(send, "done", {"text": refusal, "approved": False, "refused": True})
+    else:
+        await _relay(e, state, student, receive, send)
+    await _close_events(send)
+
+
+async def _relay(e, state, student, receive, send):
+    """Stream the pending turn's reply as it arrives, then record it."""
+    turn = state["pending"]
+    job = e.reply_job(state, student)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def piece(text):
+        loop.call_soon_threadsafe(queue.put_nowait, text)
+
+    job.token.watch(piece)
+    job.add_done_callback(lambda _: loop.call_soon_threadsafe(queue.put_nowait, _DONE))
+    gone = asyncio.ensure_future(_disconnected(receive))
+    state["watchers"] += 1
+    streamed = False
+    try:
+        while True:
+            get = asyncio.ensure_future(queue.get())
+            await asyncio.wait((get, gone), return_when=asyncio.FIRST_COMPLETED)
+            if not get.done():
+                get.cancel()
+                return  # the client left; the reply is kept for a reattach, or cancelled below
+            item = get.result()
+            if item is _DONE:
+                break
+            await _event(send, "delta", {"text": item})
+            streamed = True
+    finally:
+        job.token.unwatch(piece)
+        gone.cancel()
+        state["watchers"] -= 1
+        if not state["watchers"] and state["pending"] == turn and not job.done():
+            loop.call_later(cancel.DISCONNECT_GRACE, _abandon, state, turn)
+
+    try:
+        text = job.result()
+    except (cancel.Cancelled, CancelledError) as exc:
+        return await _event(send, "error", {"error": f"reply cancelled ({getattr(exc, 'reason', 'requested')})",
+                                            "retry": True})
+    except Exception:
+        return await _event(send, "error", {"error": "ProfessorBot could not answer. Please try again.",
+                                            "retry": True})
+    async with state["lock"]:
+        if state["pending"] == turn:  # another client may have recorded it already
+            await asyncio.to_thread(e.finish, state, job, text, student)
+    if isinstance(text, llm.Unanswered):  # the deadline passed or a quota cap was reached
+        state["input_note"] = None
+        return await _event(send, "error", {"error": text, "retry": text.retry})
+    if not streamed:
+        await _event(send, "delta", {"text": text})
+    await _event(send, "done", {"text": text, "approved": state["conversation_done"]})
+
+
+def _abandon(state, turn):
+    """Nobody reattached to the reply in time: stop paying for it."""
+    if not state["watchers"] and state["pending"] == turn:
+        jobs.cancel((jobs.session_key(state), turn), "disconnected")
+
+
+# ---------- progress board ----------
+def _instructor(scope):
+    password = config.get("PROFESSORBOT_DASHBOARD_PASSWORD")
+    key = parse_qs(scope.get("query_string", b"").decode()).get("key", [""])[0]
+    return bool(password) and hmac.compare_digest(key.encode(), password.encode())
+
+
+async def _board_events(module, receive, send):
+    """Push the board when it changes: at once after a quiet spell, at most every ``progress.INTERVAL``."""
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+
+    def notify(changed_module):
+        if changed_module == module:
+            loop.call_soon_threadsafe(changed.set)
+
+    unsubscribe = progress.subscribe(notify)
+    gone = asyncio.ensure_future(_disconnected(receive))
+    await _open_events(send)
+    try:
+        while True:
+            changed.clear()
+            await _event(send, "board", progress.board(module).snapshot())
+            sent = loop.time()
+            waiter = asyncio.ensure_future(changed.wait())
+            await asyncio.wait((waiter, gone), timeout=BOARD_HEARTBEAT, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            if gone.done():
+                return
+            await asyncio.sleep(max(0.0, sent + progress.INTERVAL - loop.time()))
+    finally:
+        unsubscribe()
+        gone.cancel()
+
+
+# ---------- HTML ----------
+def _index():
+    links = "".join(f'<li><a href="/m/{s}">{escape(e.module)}</a></li>' for s, e in sorted(engines().items()))
+    return f'<!doctype html><meta charset="utf-8"><title>ProfessorBot</title><h1>💬 ProfessorBot</h1><ul>{links}</ul>'
+
+
+def _page(e):
+    return (_PAGE.replace("{module}", escape(e.module)).replace("{slug}", slug(e.module))
+            .replace("{max_chars}", str(limits.max_chars(e.module) or 100_000)))
+
+
+def _board_page(e):
+    return _BOARD.replace("{module}", escape(e.module)).replace("{slug}", slug(e.module))
+
+
+_BOARD = """<!doctype html>
+<meta charset="utf-8">
+<title>Progress - {module}</title>
+<style>
+body { font: 16px system-ui, sans-serif; max-width: 60rem; margin: 2rem auto; padding: 0 1rem; }
+.row { display: flex; align-items: center; gap: .5rem; margin: .2rem 0; }
+.row span:first-child { width: 4rem; text-align: right; } .bar { background: #4c78a8; height: 1.1rem; }
+table { border-collapse: collapse; } td, th { padding: .2rem .8rem; text-align: left; border-bottom: 1px solid #ddd; }
+</style>
+<h1>📈 Progress - {module}</h1>
+<p id="totals"></p>
+<div id="steps"></div>
+<h3>Stuck</h3>
+<table><thead><tr><th>Student</th><th>Step</th><th>Replies on step</th><th>Idle (s)</th><th>Why</th></tr></thead>
+<tbody id="stuck"></tbody></table>
+<script>
+const $ = id => document.getElementById(id);
+const source = new EventSource("/api/{slug}/board/events" + location.search);
+source.addEventListener("board", ev => {
+  const b = JSON.parse(ev.data), top = Math.max(1, ...b.steps.map(s => s.students));
+  $("totals").textContent = `${b.students} students · ${b.in_progress} in progress · ${b.approved} approved · ${b.stuck_count} stuck`;
+  $("steps").innerHTML = b.steps.map(s =>
+    `<div class="row"><span>${s.step}</span><div class="bar" style="width:${30 * s.students / top}rem"></div><span>${s.students}</span></div>`
+  ).join("");
+  $("stuck").innerHTML = b.stuck.map(r =>
+    `<tr><td>${r.student}</td><td>${r.step}</td><td>${r.turns_on_step}</td><td>${r.idle_s}</td><td>${r.reason}</td></tr>`
+  ).join("");
+});
+</script>
+"""
+
+
+_PAGE = """<!doctype html>
+<meta charset="utf-8">
+<title>ProfessorBot - {module}</title>
+<style>
+body { font: 16px system-ui, sans-serif; max-width: 46rem; margin: 2rem auto; padding: 0 1rem; }
+.m { white-space: pre-wrap; margin: .6rem 0; padding: .6rem .8rem; border-radius: .5rem; }
+.assistant { background: #f0f2f6; } .user { background: #e8f4ea; } #note { color: #a15c00; }
+form { display: flex; gap: .5rem; } #t { flex: 1; padding: .5rem; }
+</style>
+<h1>💬 ProfessorBot - {module}</h1>
+<div id="log"></div>
+<p id="note"></p>
+<p><button id="contest" hidden>My last message was about the course</button></p>
+<form id="f"><input id="t" placeholder="Type your response..." maxlength="{max_chars}" autocomplete="off"><button>Send</button></form>
+<p id="dl"></p>
+<script>
+const api = "/api/{slug}/sessions", $ = id => document.getElementById(id);
+let sid = sessionStorage.getItem(api), done = false;
+function add(role, text) {
+  const d = document.createElement("div"); d.className = "m " + role; d.textContent = text; $("log").appendChild(d); return d;
+}
+function close(approved) {
+  done = approved; $("t").disabled = approved;
+  if (approved) $("dl").innerHTML = '<a href="' + api + "/" + sid + '/transcript">Download transcript (TXT)</a>';
+}
+async function events(resp) {
+  if (!resp.ok) { $("note").textContent = (await resp.json()).error; return; }
+  const reader = resp.body.getReader(), decoder = new TextDecoder();
+  let buffer = "", reply = null;
+  for (;;) {
+    const {value, done: end} = await reader.read();
+    if (end) break;
+    buffer += decoder.decode(value, {stream: true});
+    let i;
+    while ((i = buffer.indexOf("\\n\\n")) >= 0) {
+      const block = buffer.slice(0, i); buffer = buffer.slice(i + 2);
+      const name = block.match(/^event: (.*)$/m)[1], data = JSON.parse(block.match(/^data: (.*)$/m)[1]);
+      if (name === "note" || name === "error") $("note").textContent = data.note || data.error;
+      else if (name === "delta") { reply = reply || add("assistant", ""); reply.textContent += data.text; }
+      else if (name === "done") {
+        if (data.rejected) $("log").lastChild.remove();
+        $("contest").hidden = !data.refused;
+        close(data.approved);
+      }
+    }
+  }
+}
+async function start() {
+  let r = sid ? await fetch(api + "/" + sid) : null;
+  if (!r || !r.ok) r = await fetch(api, {method: "POST"});
+  const s = await r.json();
+  sid = s.session; sessionStorage.setItem(api, sid);
+  s.messages.forEach(m => add(m.role, m.content));
+  $("contest").hidden = !s.prefiltered || s.conversation_done;
+  close(s.conversation_done);
+  if (s.pending) await events(await fetch(api + "/" + sid + "/reply"));
+}
+$("f").onsubmit = async ev => {
+  ev.preventDefault();
+  const text = $("t").value.trim();
+  if (!text) return;
+  $("t").value = ""; $("note").textContent = ""; $("t").disabled = true;
+  add("user", text);
+  await events(await fetch(api + "/" + sid + "/messages",
+    {method: "POST", headers: {"content-type": "application/json"}, body: JSON.stringify({text})}));
+  $("t").disabled = done;
+};
+$("contest").onclick = async () => {
+  await fetch(api + "/" + sid + "/contest", {method: "POST"});
+  $("contest").hidden = true; $("note").textContent = "Thanks — please send your message again.";
+};
+start();
+</script>
+"""
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import uvicorn
+
+    ap = argparse.ArgumentParser(description="Serve the module conversations over HTTP with server-sent events.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    args = ap.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,383 @@
+"""Completion backends and how each module's traffic is split between them.
+
+A backend is any OpenAI-compatible chat-completions endpoint. Configure them
+with PROFESSORBOT_BACKENDS, a JSON object like
+
+    {"backends": {"openai": {"model": "gpt-4.1"},
+                  "lab": {"base_url": "http://10.0.0.5:8000/v1", "model": "llama-3.1-8b-instruct",
+                          "api_key_setting": "LAB_API_KEY"},
+                  "practice": {"base_url": "http://127.0.0.1:8800/v1", "api_key": "local",
+                               "metered": false}},
+     "modules": {"*": {"openai": 1},
+                 "Brain II": {"openai": 3, "lab": 1},
+                 "Risk IV": {"practice": 1}}}
+
+``modules`` maps a module (or ``*`` for the rest) to backend weights; each
+completion goes to a backend drawn by weight. Backend fields: ``base_url``
+(default: the OpenAI API, or OPENAI_BASE_URL), ``model`` (default
+``llm.MODEL``), ``api_key`` or ``api_key_setting`` (default OPENAI_API_KEY)
+and ``metered`` (default true; false skips the token quota, e.g. for an
+unlimited practice mode on ``professorbot.localserver``). Without the
+setting there is one backend, "openai", exactly as before.
+
+A backend can spread its traffic over a pool of API keys (or organizations
+and projects), each with its own rate limits, with a ``keys`` list:
+
+    {"backends": {"openai": {"keys": [
+        {"name": "course", "api_key_setting": "OPENAI_API_KEY_COURSE", "rpm": 500, "tpm": 200000},
+        {"name": "lab", "api_key_setting": "OPENAI_API_KEY_LAB", "organization": "org-...",
+         "project": "proj_..."}]}}}
+
+(a key may also name its own ``base_url``, e.g. one deployment per key)
+
+or, for the default backend, by listing the keys themselves in
+OPENAI_API_KEYS (a secrets list or a comma-separated string). Each key keeps
+a request and a token bucket, sized by its ``rpm``/``tpm`` or, when those
+are not given, by the ``x-ratelimit-limit-*`` headers of its responses; the
+``x-ratelimit-remaining-*`` headers of every response overwrite the local
+estimate. A completion reserves its prompt plus
+PROFESSORBOT_KEY_COMPLETION_ESTIMATE tokens (default 400) on the key with
+the most headroom, and the reservation is settled with the tokens actually
+used. A key answering 429 waits out the reset its headers give; a key that
+is rejected (401/403) or out of quota is out of rotation for
+PROFESSORBOT_KEY_RETRY seconds (default 3600). Either way the request moves
+on to the backend's next key; when every key is out, it waits up to
+PROFESSORBOT_KEY_WAIT seconds (default 5) for the first one back. Usage and remaining quota per key are shown on
+the dashboard.
+
+A backend whose request fails with a connection, timeout or server error is
+taken out of rotation for PROFESSORBOT_BACKEND_COOLDOWN seconds (default 30)
+and the request fails over to the module's next backend. Check them all with
+
+    python -m professorbot.backends
+"""
+import json
+import random
+import re
+import threading
+import time
+
+from professorbot import config
+
+COOLDOWN = config.get_float("PROFESSORBOT_BACKEND_COOLDOWN", 30.0)
+KEY_RETRY = config.get_float("PROFESSORBOT_KEY_RETRY", 3600.0)
+KEY_WAIT = config.get_float("PROFESSORBOT_KEY_WAIT", 5.0)
+COMPLETION_ESTIMATE = config.get_int("PROFESSORBOT_KEY_COMPLETION_ESTIMATE", 400)
+_CONFIG = json.loads(config.get("PROFESSORBOT_BACKENDS", '{"backends": {"openai": {}}}'))
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def seconds(value):
+    """Seconds in a reset header ("6m0s", "1.5s", "20ms", or a bare number); None when absent."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return sum(float(n) * _UNITS[unit] for n, unit in _DURATION.findall(value))
+
+
+def _number(value):
+    try:
+        return None if value is None else float(value)
+    except ValueError:
+        return None
+
+
+# ---------- keys ----------
+class Bucket:
+    """Token bucket refilled at ``capacity`` per minute; no capacity means no known limit."""
+
+    def __init__(self, per_minute=None):
+        self.configured = per_minute
+        self.capacity = per_minute
+        self.level = float(per_minute or 0)
+        self.at = time.time()
+
+    def fill(self, now):
+        if self.capacity:
+            self.level = min(self.capacity, self.level + (now - self.at) * self.capacity / 60.0)
+        self.at = now
+
+    def headroom(self, amount, now):
+        """Fraction of the capacity left after taking ``amount`` (negative when it does not fit)."""
+        if not self.capacity:
+            return 1.0
+        self.fill(now)
+        return (self.level - amount) / self.capacity
+
+    def take(self, amount, now):
+        self.fill(now)
+        self.level -= amount
+
+    def sync(self, limit, remaining, now):
+        """Adopt what the provider reports; a configured capacity below its limit is kept."""
+        if limit:
+            self.capacity = min(limit, self.configured) if self.configured else limit
+        if remaining is not None and self.capacity:
+            self.level = min(remaining, self.capacity)
+            self.at = now
+
+
+class Key:
+    def __init__(self, backend, name, api_key=None, api_key_setting="OPENAI_API_KEY", organization=None,
+                 project=None, rpm=None, tpm=None, base_url=None):
+        self.backend = backend
+        self.name = name
+        self.base_url = base_url or backend.base_url
+        self.organization = organization
+        self.project = project
+        self._api_key = api_key
+        self._api_key_setting = api_key_setting
+        self.requests = Bucket(rpm)
+        self.tokens = Bucket(tpm)
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.down_until = 0.0
+        self.disabled = None  # why the key is out of rotation for KEY_RETRY
+        self.last_error = None
+
+    @property
+    def api_key(self):
+        return self._api_key or config.get(self._api_key_setting)
+
+    def usable(self, now):
+        return bool(self.api_key) and now >= self.down_until
+
+    def headroom(self, cost, now):
+        return min(self.requests.headroom(1, now), self.tokens.headroom(cost, now))
+
+    def client(self):
+        """OpenAI client for this key; its responses update the key's buckets.
+
+        A pooled key does not retry a 429 itself: the next key is tried instead.
+        """
+        from professorbot import llm
+
+        retries = 0 if len(self.backend.keys) > 1 else llm.openai.DEFAULT_MAX_RETRIES
+        return llm.client(self.api_key, self.base_url, self.organization, self.project, self.observe,
+                          retries)
+
+    def observe(self, response):
+        """httpx response hook: track the limits and remaining quota the provider reports."""
+        h = response.headers
+        now = time.time()
+        with _lock:
+            self.requests.sync(_number(h.get("x-ratelimit-limit-requests")),
+                               _number(h.get("x-ratelimit-remaining-requests")), now)
+            self.tokens.sync(_number(h.get("x-ratelimit-limit-tokens")),
+                             _number(h.get("x-ratelimit-remaining-tokens")), now)
+
+    def acquire(self, cost):
+        """Reserve a request and ``cost`` tokens for a completion about to be sent."""
+        with _lock:
+            now = time.time()
+            self.requests.take(1, now)
+            self.tokens.take(cost, now)
+            self.in_flight += 1
+            self.calls += 1
+
+    def release(self, cost, usage=None, error=None):
+        """Settle a reservation with the tokens actually used; an ``error`` may take the key out of rotation."""
+        with _lock:
+            now = time.time()
+            self.in_flight -= 1
+            if usage is not None:
+                self.prompt_tokens += usage.prompt_tokens
+                self.completion_tokens += usage.completion_tokens
+                self.tokens.take(usage.total_tokens - cost, now)
+            else:
+                self.tokens.take(-cost, now)
+        if error is not None:
+            self.fail(error)
+
+    def fail(self, error):
+        """Count a failed request; rejections, exhausted quota and 429s take the key out of rotation."""
+        with _lock:
+            now = time.time()
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+            status = getattr(error, "status_code", None)
+            if status in (401, 403) or (status == 429 and "insufficient_quota" in (error.code, error.type)):
+                self.disabled = "quota" if status == 429 else "rejected"
+                self.down_until = now + KEY_RETRY
+            elif status == 429:
+                h = error.response.headers
+                wait = seconds(h.get("retry-after")) or max(
+                    seconds(h.get("x-ratelimit-reset-requests")) or 0.0, seconds(h.get("x-ratelimit-reset-tokens")) or 0.0)
+                self.disabled = None
+                self.down_until = now + (wait or COOLDOWN)
+
+    def status(self):
+        now = time.time()
+        secret = self.api_key or ""
+        if not secret:
+            state = "missing"
+        elif now < self.down_until:
+            state = f"{self.disabled or 'rate limited'} ({self.down_until - now:.0f}s)"
+        else:
+            state = "ok"
+        self.requests.fill(now)
+        self.tokens.fill(now)
+        return {"backend": self.backend.name, "key": self.name, "secret": f"…{secret[-4:]}" if secret else "",
+                "state": state, "in_flight": self.in_flight, "calls": self.calls, "failures": self.failures,
+                "prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens,
+                "requests_left": self.requests.capacity and round(self.requests.level),
+                "rpm": self.requests.capacity, "tokens_left": self.tokens.capacity and round(self.tokens.level),
+                "tpm": self.tokens.capacity, "last_error": self.last_error}
+
+
+# ---------- backends ----------
+class Backend:
+    def __init__(self, name, base_url=None, model=None, api_key=None, api_key_setting="OPENAI_API_KEY",
+                 metered=True, keys=None):
+        self.name = name
+        self.base_url = base_url
+        self.model = model
+        self.metered = metered
+        if keys is None:
+            self.keys = [Key(self, name, api_key, api_key_setting)]
+        else:
+            self.keys = [Key(self, f"{name}:{spec.get('name', i + 1)}", **{k: v for k, v in spec.items() if k != "name"})
+                         for i, spec in enumerate(keys)]
+        self.calls = 0
+        self.failures = 0
+        self.down_until = 0.0
+        self.last_error = None
+
+    @property
+    def api_key(self):
+        return next((k.api_key for k in self.keys if k.api_key), None)
+
+    def up(self):
+        return time.time() >= self.down_until
+
+    def healthy(self):
+        now = time.time()
+        return self.up() and any(k.usable(now) for k in self.keys)
+
+    def pick(self, cost, exclude=(), prefer=None):
+        """The usable key with the most headroom for ``cost`` tokens, or None.
+
+        A key ``prefer`` accepts (one holding the session's stateful chain) wins while it has room.
+        """
+        now = time.time()
+        with _lock:
+            keys = [(k.headroom(cost, now), k) for k in self.keys if k not in exclude and k.usable(now)]
+        if not keys:
+            return None
+        return min(keys, key=lambda hk: (not (prefer and hk[0] >= 0 and prefer(hk[1])), -hk[0],
+                                         hk[1].in_flight, hk[1].calls))[1]
+
+    def mark(self, error=None):
+        """Count a call; an ``error`` takes the backend out of rotation for COOLDOWN seconds."""
+        with _lock:
+            self.calls += 1
+            if error is not None:
+                self.failures += 1
+                self.last_error = f"{type(error).__name__}: {error}"
+                self.down_until = time.time() + COOLDOWN
+
+    def status(self):
+        now = time.time()
+        return {"backend": self.name, "model": self.model or "(default)", "base_url": self.base_url or "(default)",
+                "healthy": self.healthy(), "keys": f"{sum(k.usable(now) for k in self.keys)}/{len(self.keys)}",
+                "calls": self.calls, "failures": self.failures, "last_error": self.last_error}
+
+
+def _pooled(spec):
+    """The default backend takes its key pool from OPENAI_API_KEYS when that is set."""
+    if spec.keys() & {"keys", "api_key", "api_key_setting"}:
+        return spec
+    listed = config.get("OPENAI_API_KEYS")
+    if not listed:
+        return spec
+    if isinstance(listed, str):
+        listed = [k.strip() for k in listed.split(",") if k.strip()]
+    return {**spec, "keys": [{"api_key": k} for k in listed]}
+
+
+_lock = threading.Lock()
+BACKENDS = {name: Backend(name, **_pooled(spec)) for name, spec in _CONFIG["backends"].items()}
+WEIGHTS = _CONFIG.get("modules") or {"*": {next(iter(BACKENDS)): 1}}
+
+
+def candidates(module):
+    """The module's backends in the order to try them: one drawn by weight, then the other healthy ones."""
+    weights = WEIGHTS.get(module) or WEIGHTS.get("*") or {next(iter(BACKENDS)): 1}
+    pool = [(BACKENDS[name], w) for name, w in weights.items() if w > 0]
+    healthy = [(b, w) for b, w in pool if b.healthy()] or pool  # all down: try anyway
+    first = random.choices([b for b, _ in healthy], [w for _, w in healthy])[0]
+    return [first] + sorted((b for b, _ in healthy if b is not first), key=lambda b: -weights[b.name])
+
+
+def attempts(backends, cost, prefer=None):
+    """``(backend, key)`` pairs to try in order: each backend's least-loaded key, then its next one after a
+    failure, until the backend itself goes down. With no usable key anywhere, the key back soonest."""
+    tried = False
+    for backend in backends:
+        used = set()
+        while not used or backend.up():
+            key = backend.pick(cost, used, prefer)
+            if key is None:
+                break
+            used.add(key)
+            tried = True
+            yield backend, key
+    if not tried:  # all down: wait for the first key back if that is soon, else try anyway
+        keys = [k for b in backends for k in b.keys if k.api_key] or [backends[0].keys[0]]
+        key = min(keys, key=lambda k: max(k.down_until, k.backend.down_until))
+        wait = max(key.down_until, key.backend.down_until) - time.time()
+        if 0 < wait <= KEY_WAIT:
+            time.sleep(wait)
+        yield key.backend, key
+
+
+def probe(backend, timeout=5.0):
+    """Active health check of every key (lists the endpoint's models); returns ``(ok, seconds)``.
+
+    A key that passes is back in rotation; the backend is up when any key passes.
+    """
+    started = time.perf_counter()
+    ok = False
+    for key in backend.keys:
+        if not key.api_key:
+            continue
+        try:
+            key.client().with_options(timeout=timeout, max_retries=0).models.list()
+        except Exception as exc:
+            if getattr(exc, "status_code", None) in (401, 403, 429):
+                key.fail(exc)
+                continue
+            backend.mark(exc)
+            return False, time.perf_counter() - started
+        key.down_until, key.disabled = 0.0, None
+        ok = True
+    if ok:
+        backend.down_until = 0.0
+    return ok, time.perf_counter() - started
+
+
+def statuses():
+    return [b.status() for b in BACKENDS.values()]
+
+
+def key_statuses():
+    return [k.status() for b in BACKENDS.values() for k in b.keys]
+
+
+if __name__ == "__main__":
+    for b in BACKENDS.values():
+        ok, elapsed = probe(b)
+        print(f"{b.name:<12} {'ok' if ok else 'DOWN':<5} {elapsed * 1000:7.1f} ms  {b.base_url or '(default)'}"
+              f"  {b.model or '(default)'}" + ("" if ok else f"  {b.last_error}"))
+        if len(b.keys) > 1:
+            for k in b.keys:
+                s = k.status()
+                print(f"  {k.name:<18} {s['secret']:<6} {s['state']:<22} requests left {s['requests_left']}"
+                      f"/{s['rpm']}  tokens left {s['tokens_left']}/{s['tpm']}")
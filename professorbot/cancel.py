@@ -0,0 +1,143 @@
+"""Deadlines and cancellation for completions running as background jobs.
+
+Every job started through ``professorbot.jobs`` gets a ``Token`` carrying an
+end-to-end deadline of PROFESSORBOT_TURN_DEADLINE seconds (default 90) and the
+Streamlit sessions waiting on it. While a job runs, ``llm.complete`` streams the
+completion and checks the token between chunks; the request is closed as soon
+as the token is cancelled, so the provider stops generating. A token is
+cancelled when
+
+- the deadline passes (the HTTP timeout is also set to the time remaining),
+- every session waiting on the job has been disconnected for longer than
+  PROFESSORBOT_DISCONNECT_GRACE seconds (default 5; long enough for a refresh
+  to reattach to the job), or
+- ``jobs.cancel(key)`` is called.
+
+In stateful mode (``professorbot.stateful``) the completion is not streamed:
+the deadline still applies as the HTTP timeout, but a disconnect or
+``jobs.cancel`` only stops a job that has not sent its request yet.
+
+Prompt tokens and the completion tokens received before the stop are counted
+per module and reason in ``stats()``. The token also carries the streamed
+reply as it arrives, for frontends that relay it (``watch``).
+"""
+import threading
+import time
+from collections import defaultdict
+
+from professorbot import config
+
+TURN_DEADLINE = config.get_float("PROFESSORBOT_TURN_DEADLINE", 90.0)
+DISCONNECT_GRACE = config.get_float("PROFESSORBOT_DISCONNECT_GRACE", 5.0)
+CHECK_EVERY = 0.25  # seconds between session liveness checks
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats = defaultdict(lambda: {"cancelled": 0, "deadline": 0, "disconnected": 0, "requested": 0,
+                              "prompt_tokens": 0, "completion_tokens": 0})
+
+
+class Cancelled(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _active(session_id):
+    from streamlit.runtime import Runtime
+
+    if not Runtime.exists():
+        return True  # bare mode (tests, CLI): nobody can disconnect
+    return Runtime.instance().is_active_session(session_id)
+
+
+class Token:
+    def __init__(self, deadline=TURN_DEADLINE, grace=DISCONNECT_GRACE):
+        self.deadline = time.monotonic() + deadline if deadline else None
+        self.grace = grace
+        self.listeners = set()
+        self._reason = None
+        self._seen = time.monotonic()  # last time a listener was known to be connected
+        self._checked = 0.0
+        self.pieces = []  # streamed reply so far
+        self._watchers = []
+        self._pieces_lock = threading.Lock()
+
+    def listen(self, session_id):
+        if session_id:
+            self.listeners.add(session_id)
+            self._seen = time.monotonic()
+
+    def watch(self, callback):
+        """Call ``callback(piece)`` for every streamed piece, starting with those already received."""
+        with self._pieces_lock:
+            for piece in self.pieces:
+                callback(piece)
+            self._watchers.append(callback)
+
+    def unwatch(self, callback):
+        with self._pieces_lock:
+            if callback in self._watchers:
+                self._watchers.remove(callback)
+
+    def emit(self, piece):
+        with self._pieces_lock:
+            self.pieces.append(piece)
+            for callback in self._watchers:
+                callback(piece)
+
+    def cancel(self, reason="requested"):
+        if self._reason is None:
+            self._reason = reason
+
+    def remaining(self):
+        return None if self.deadline is None else max(self.deadline - time.monotonic(), 0.0)
+
+    def reason(self):
+        """Why the job should stop, or None to keep going."""
+        if self._reason is not None:
+            return self._reason
+        now = time.monotonic()
+        if self.deadline is not None and now >= self.deadline:
+            self._reason = "deadline"
+        elif self.listeners and now - self._checked >= CHECK_EVERY:
+            self._checked = now
+            if any(_active(s) for s in list(self.listeners)):
+                self._seen = now
+            elif now - self._seen > self.grace:
+                self._reason = "disconnected"
+        return self._reason
+
+    def check(self):
+        reason = self.reason()
+        if reason is not None:
+            raise Cancelled(reason)
+
+
+def current():
+    """The token of the job running on this thread, or None outside jobs."""
+    return getattr(_local, "token", None)
+
+
+def run(token, fn, *args, **kwargs):
+    """Run ``fn`` with ``token`` as the current token (the job wrapper)."""
+    _local.token = token
+    try:
+        token.check()  # cancelled while queued
+        return fn(*args, **kwargs)
+    finally:
+        _local.token = None
+
+
+def record(module, reason, prompt_tokens, completion_tokens):
+    with _lock:
+        s = _stats[module or "unknown"]
+        s["cancelled"] += 1
+        s[reason] = s.get(reason, 0) + 1
+        s["prompt_tokens"] += prompt_tokens
+        s["completion_tokens"] += completion_tokens
+
+
+def stats():
+    with _lock:
+        return {m: dict(s) for m, s in _stats.items()}
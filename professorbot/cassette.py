@@ -0,0 +1,154 @@
+"""Record and replay model traffic for deterministic offline runs.
+
+    PROFESSORBOT_CASSETTE_MODE      "off" (default), "record" or "replay"
+    PROFESSORBOT_CASSETTE_DIR       default "cassettes"; one JSONL file per module
+    PROFESSORBOT_CASSETTE_LATENCY   replay delay: "recorded" (default) or seconds
+
+Recording appends every completion (request, full response including usage,
+wall time, session and turn) to ``<dir>/<module>.jsonl``. Replay serves the
+recorded response whose normalized request matches, so token counts are exactly
+those of the live run. Identical requests are served in recorded order. A
+request with no recording raises ``CassetteMiss`` rather than going to the
+network.
+
+Requests are normalized by collapsing whitespace in every message, so edits
+that only reflow a prompt still match.
+"""
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+
+from openai.types.chat import ChatCompletion
+
+from professorbot import config
+
+MODE = config.get("PROFESSORBOT_CASSETTE_MODE", "off")
+CASSETTE_DIR = config.get("PROFESSORBOT_CASSETTE_DIR", "cassettes")
+LATENCY = config.get("PROFESSORBOT_CASSETTE_LATENCY", "recorded")
+
+_WS = re.compile(r"\s+")
+
+
+class CassetteMiss(LookupError):
+    pass
+
+
+def normalize(model, temperature, messages):
+    return {
+        "model": model,
+        "temperature": temperature,
+        "messages": [[m["role"], _WS.sub(" ", m["content"]).strip()] for m in messages],
+    }
+
+
+def request_key(model, temperature, messages):
+    raw = json.dumps(normalize(model, temperature, messages), separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _path(module, directory):
+    return os.path.join(directory, f"{module or 'unknown'}.jsonl")
+
+
+class Recorder:
+    def __init__(self, directory=CASSETTE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def record(self, module, session, model, temperature, messages, resp, elapsed):
+        entry = {
+            "key": request_key(model, temperature, messages),
+            "module": module,
+            "session": session,
+            "turn": sum(1 for m in messages if m["role"] == "user"),
+            "request": {"model": model, "temperature": temperature,
+                        "messages": [{"role": m["role"], "content": m["content"]} for m in messages]},
+            "response": resp.model_dump(mode="json"),
+            "elapsed": elapsed,
+        }
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(_path(module, self.directory), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+class Player:
+    def __init__(self, directory=CASSETTE_DIR, latency=LATENCY):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._by_key = defaultdict(deque)
+        for entry in load(directory):
+            self._by_key[entry["key"]].append(entry)
+
+    def replay(self, model, temperature, messages):
+        key = request_key(model, temperature, messages)
+        with self._lock:
+            queue = self._by_key.get(key)
+            if not queue:
+                raise CassetteMiss(f"no recorded response for request {key[:12]}")
+            entry = queue[0]
+            if len(queue) > 1:
+                queue.rotate(-1)
+        delay = entry["elapsed"] if self.latency == "recorded" else float(self.latency)
+        if delay > 0:
+            time.sleep(delay)
+        return ChatCompletion.model_validate(entry["response"])
+
+
+def load(directory=CASSETTE_DIR, module=None):
+    """Every recorded entry, optionally for one module only."""
+    pattern = _path(module, directory) if module else os.path.join(directory, "*.jsonl")
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def conversations(directory=CASSETTE_DIR, module=None):
+    """Recorded student turns grouped per session: ``{(module, session): [text, ...]}``."""
+    turns = defaultdict(dict)
+    for entry in load(directory, module):
+        user = [m for m in entry["request"]["messages"] if m["role"] == "user"]
+        if user:
+            turns[entry["module"], entry["session"]][entry["turn"]] = user[-1]["content"]
+    return {k: [v[t] for t in sorted(v)] for k, v in turns.items()}
+
+
+_recorder = Recorder() if MODE == "record" else None
+_player = None
+
+
+def recorder():
+    return _recorder
+
+
+def player():
+    global _player
+    if MODE == "replay" and _player is None:
+        _player = Player()
+    return _player
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Summarize recorded cassettes.")
+    ap.add_argument("--dir", default=CASSETTE_DIR)
+    args = ap.parse_args()
+    totals = defaultdict(lambda: [0, 0, 0, 0.0])
+    for entry in load(args.dir):
+        t = totals[entry["module"]]
+        usage = entry["response"].get("usage") or {}
+        t[0] += 1
+        t[1] += usage.get("prompt_tokens", 0)
+        t[2] += usage.get("completion_tokens", 0)
+        t[3] += entry["elapsed"]
+    print(f"{'module':<16} {'calls':>6} {'prompt':>9} {'completion':>10} {'mean s':>7}")
+    for module, (n, p, c, s) in sorted(totals.items()):
+        print(f"{module:<16} {n:>6} {p:>9} {c:>10} {s / n:>7.2f}")
@@ -0,0 +1,261 @@
+"""Compact, append-only conversation log kept in ``st.session_state.messages``.
+
+Each message is a slotted record with an interned role, and the system prompts
+are shared by every session instead of being rebuilt per turn. Requests are
+assembled as a read-only view over (prompt prefix, control message, history) so
+the history is never copied. Logs that sit idle longer than
+``PROFESSORBOT_SPILL_TTL`` seconds are spilled to disk and reloaded on next use,
+into ``PROFESSORBOT_SPILL_DIR`` or else a private temporary directory removed at
+exit. Spilled transcripts carry Penn IDs, so the directory is 0700 and the files
+0600.
+"""
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+from itertools import islice
+
+SPILL_TTL = float(os.getenv("PROFESSORBOT_SPILL_TTL", "1800"))  # seconds; 0 disables spilling
+SPILL_DIR = os.getenv("PROFESSORBOT_SPILL_DIR")  # default: a private temporary directory
+SWEEP_EVERY = 60.0  # seconds between sweeps of idle logs
+
+_ROLES = {r: sys.intern(r) for r in ("system", "user", "assistant")}
+
+
+def _role(role):
+    return _ROLES.get(role) or sys.intern(role)
+
+
+class Message(Mapping):
+    """One chat message. Behaves like ``{"role": ..., "content": ...}``.
+
+    ``content`` is what the model sees. When that was clipped (see
+    ``professorbot.limits``) the original is kept in ``full_text`` for display
+    and the transcript.
+    """
+
+    __slots__ = ("role", "content", "_full")
+
+    def __init__(self, role, content, full=None):
+        self.role = _role(role)
+        self.content = content
+        self._full = full
+
+    @property
+    def full_text(self):
+        return self.content if self._full is None else self._full
+
+    def __getitem__(self, key):
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def __iter__(self):
+        yield "role"
+        yield "content"
+
+    def __len__(self):
+        return 2
+
+    def __repr__(self):
+        return f"Message({self.role!r}, {self.content!r})"
+
+
+@lru_cache(maxsize=64)
+def prompt_prefix(*prompts):
+    """System messages for a page's prompts (compiled), shared across every session and rerun."""
+    from professorbot.prompts import compile_prompt
+
+    return tuple(Message("system", compile_prompt(p)) for p in prompts)
+
+
+class RequestView(Sequence):
+    """Read-only view of prefix + control + history, built without copying the history.
+
+    Each part is frozen at its length when the view is made, so later appends to
+    the history do not leak into a request that is still in flight.
+    """
+
+    __slots__ = ("_parts", "_len")
+
+    def __init__(self, *parts):
+        self._parts = tuple((p, len(p)) for p in parts)
+        self._len = sum(n for _, n in self._parts)
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._len))]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError(i)
+        for part, n in self._parts:
+            if i < n:
+                return part[i]
+            i -= n
+
+    def __iter__(self):
+        for part, n in self._parts:
+            yield from islice(part, n)
+
+    @property
+    def parts(self):
+        """The frozen parts as lists, e.g. ``(prefix, control, history, then)`` for ``ChatLog.request``."""
+        return tuple(list(islice(part, n)) for part, n in self._parts)
+
+
+class ChatLog(Sequence):
+    """Append-only message history for one session."""
+
+    def __init__(self):
+        self._records = []
+        self._lock = threading.Lock()
+        self._touched = time.monotonic()
+        self._spill_path = None
+        self._spill_file = None  # one file per log, removed with it
+        _LIVE.add(self)
+        maybe_sweep()
+
+    # ---------- access ----------
+    def _load(self):
+        # caller holds self._lock
+        self._touched = time.monotonic()
+        if self._spill_path is not None:
+            with open(self._spill_path, encoding="utf-8") as f:
+                self._records = [Message(r["role"], r["content"], r.get("full")) for r in map(json.loads, f)]
+            os.remove(self._spill_path)
+            self._spill_path = None
+        return self._records
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
+
+    def __getitem__(self, i):
+        with self._lock:
+            return self._load()[i]
+
+    def __iter__(self):
+        with self._lock:
+            records = self._load()
+        return iter(records)
+
+    def append(self, role, content, prompt=None):
+        """Add a message; ``prompt`` replaces ``content`` in requests when given."""
+        with self._lock:
+            self._load().append(Message(role, content) if prompt is None else Message(role, prompt, content))
+        maybe_sweep()
+
+    def request(self, prefix, control=None, then=()):
+        """Messages to send to the model: shared prefix, optional control text, the history,
+        then any hypothetical ``then`` messages that are not part of the log."""
+        with self._lock:
+            records = self._load()
+        control = (Message("system", control),) if control else ()
+        return RequestView(prefix, control, records, tuple(Message(r, c) for r, c in then))
+
+    # ---------- serialization ----------
+    def to_rows(self):
+        """Plain ``[role, content, full]`` rows for external storage."""
+        with self._lock:
+            return [[m.role, m.content, m._full] for m in self._load()]
+
+    @classmethod
+    def from_rows(cls, rows):
+        log = cls()
+        log._records = [Message(role, content, full) for role, content, full in rows]
+        return log
+
+    # ---------- spilling ----------
+    def spill(self):
+        """Write the history to disk and release it from memory."""
+        with self._lock:
+            if self._spill_path is not None or not self._records:
+                return
+            if self._spill_file is None:
+                self._spill_file = os.path.join(spill_dir(), f"{uuid.uuid4().hex}.jsonl")
+                weakref.finalize(self, _remove_quietly, self._spill_file)
+            path = self._spill_file
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, "w", encoding="utf-8") as f:
+                for m in self._records:
+                    record = {"role": m.role, "content": m.content}
+                    if m._full is not None:
+                        record["full"] = m._full
+                    f.write(json.dumps(record) + "\n")
+            self._records = []
+            self._spill_path = path
+
+    def idle_for(self, now=None):
+        return (now or time.monotonic()) - self._touched
+
+    @property
+    def spilled(self):
+        return self._spill_path is not None
+
+
+_spill_dir = []
+_spill_dir_lock = threading.Lock()
+
+
+def spill_dir():
+    """The directory spilled logs go to, created (owner-only) on first use."""
+    with _spill_dir_lock:
+        if not _spill_dir:
+            if SPILL_DIR:
+                os.makedirs(SPILL_DIR, mode=0o700, exist_ok=True)
+                os.chmod(SPILL_DIR, 0o700)
+                _spill_dir.append(SPILL_DIR)
+            else:
+                path = tempfile.mkdtemp(prefix="professorbot-spill-")
+                atexit.register(shutil.rmtree, path, True)
+                _spill_dir.append(path)
+        return _spill_dir[0]
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# ---------- idle sweep ----------
+_LIVE = weakref.WeakSet()
+_last_sweep = [time.monotonic()]
+
+
+def sweep(ttl=SPILL_TTL):
+    """Spill every live log that has been idle for at least ``ttl`` seconds."""
+    now = time.monotonic()
+    _last_sweep[0] = now
+    if ttl <= 0:
+        return 0
+    idle = [log for log in list(_LIVE) if not log.spilled and log.idle_for(now) >= ttl]
+    for log in idle:
+        log.spill()
+    return len(idle)
+
+
+def live_count():
+    """Sessions whose log is alive in this process, and how many of them are spilled."""
+    logs = list(_LIVE)
+    return len(logs), sum(1 for log in logs if log.spilled)
+
+
+def maybe_sweep():
+    if SPILL_TTL > 0 and time.monotonic() - _last_sweep[0] >= SWEEP_EVERY:
+        sweep()
@@ -0,0 +1,162 @@
+"""Local check of a procedure's stop criteria, so the model closes on time.
+
+Every procedure has a step like "Stop once the student clearly articulates (a)
+..., (b) ... and (c) ...". ``criteria`` splits that sentence into its parts and
+keeps each part's content words. ``met`` then checks, in well under a
+millisecond, whether the student's messages so far cover every part: each
+part needs at least PROFESSORBOT_CLOSE_THRESHOLD (default 0.5) of its words,
+matched on a crude stem, in a substantive student message. The check only
+starts once the student has had a turn for each step before the stop step.
+
+With PROFESSORBOT_CLOSE_SIGNAL=1 the pages append ``signal()`` to the
+per-turn control message, telling the model the criteria look satisfied so it
+closes instead of asking another probing question. The model still makes
+the call.
+
+Measure it on the transcript archive: the turn at which the check would have
+fired against the turn the conversation actually ended, and agreement with an
+LLM judge over a sample of turns:
+
+    python -m professorbot.closing "Machine II" --judge 100
+"""
+import re
+from functools import lru_cache
+
+from professorbot import config, procedure
+
+ENABLED = config.get("PROFESSORBOT_CLOSE_SIGNAL", "") in ("1", "true", "yes")
+THRESHOLD = config.get_float("PROFESSORBOT_CLOSE_THRESHOLD", 0.5)
+MIN_ANSWER_WORDS = 8
+
+_STOP = re.compile(r"^Stop\s+(?:as soon as|once|when)\s+(.*)", re.IGNORECASE | re.DOTALL)
+_FALLBACK = re.compile(r"\.\s+If\b|;\s*if\b", re.IGNORECASE)
+_MARKER = re.compile(r"\([a-e]\)")
+_WORD = re.compile(r"[a-z]+")
+_GENERIC = frozenset(
+    "the a an and or of to in on for with about at by from as is are be been being that this these those it its "
+    "student students they their them own clearly clear articulate articulates articulated articulating "
+    "demonstrates understanding makes make has have able reflect reflects least one concrete both how what whether "
+    "why which who think thinks said say says explains explain describe describes recognizes recognize "
+    "still does do not only also then after before way ways but can would all where see between versus well "
+    "based".split())
+
+
+def _stem(word):
+    return word[:6]
+
+
+def _keywords(text):
+    return frozenset(_stem(w) for w in _WORD.findall(text.lower()) if len(w) > 2 and w not in _GENERIC)
+
+
+@lru_cache(maxsize=64)
+def criteria(procedure_prompt):
+    """``(step number, (keyword set, ...))`` of the procedure's stop step, or None."""
+    for number, text in procedure.steps(procedure_prompt):
+        m = _STOP.match(text)
+        if not m:
+            continue
+        clause = _FALLBACK.split(m.group(1), 1)[0]
+        if _MARKER.search(clause):
+            parts = _MARKER.split(clause)[1:]
+        else:
+            parts = re.split(r",\s*(?:and\s+)?|\band\b|:", clause.split(":", 1)[-1])
+        kept = tuple(k for k in map(_keywords, parts) if k)
+        return int(re.match(r"\d+", number).group()), kept
+    return None
+
+
+def met(procedure_prompt, student_messages):
+    """True when the student's messages cover every stop criterion of the procedure."""
+    found = criteria(procedure_prompt)
+    if not found or not found[1]:
+        return False
+    stop_step, parts = found
+    if len(student_messages) < max(2, stop_step - 1):
+        return False
+    said = frozenset().union(*(_keywords(t) for t in student_messages if len(t.split()) >= MIN_ANSWER_WORDS))
+    return all(len(part & said) >= max(1, THRESHOLD * len(part)) for part in parts)
+
+
+def signal(procedure_prompt, log):
+    """Text appended to the control message when the criteria are met ("" otherwise)."""
+    if not ENABLED:
+        return ""
+    student = [m["content"] for m in log if m["role"] == "user"]
+    if not met(procedure_prompt, student):
+        return ""
+    return (" Completion check: the student's messages appear to satisfy the stop criteria. "
+            "Unless something essential is clearly missing, do not ask another question; close now.")
+
+
+# ---------- offline evaluation ----------
+JUDGE_PROMPT = (
+    "You check whether a student has met the stop criteria of a tutoring conversation. Criteria:\n{criteria}\n\n"
+    "Answer YES if the student's messages below clearly satisfy all of them, otherwise NO. Answer with one word."
+)
+
+
+def evaluate(db, module, procedure_prompt, judge=0):
+    """Turns saved and judge agreement over a module's archived conversations."""
+    import random
+
+    from professorbot import llm
+
+    conversations = {}
+    for cid, turn, role, content in db.execute(
+            """SELECT m.conversation, m.turn, m.role, m.content FROM messages m JOIN conversations c
+               ON c.id = m.conversation WHERE c.module = ? ORDER BY m.conversation, m.idx""", (module,)):
+        conversations.setdefault(cid, []).append((turn, role, content))
+    out = {"conversations": len(conversations), "fired": 0, "turns": 0, "turns_saved": 0}
+    points = []
+    for messages in conversations.values():
+        ended = max(t for t, _, _ in messages)
+        out["turns"] += ended
+        student = []
+        for turn, role, content in messages:
+            if role != "user":
+                continue
+            student.append(content)
+            verdict = met(procedure_prompt, student)
+            points.append((list(student), verdict))
+            if verdict:
+                out["fired"] += 1
+                out["turns_saved"] += ended - turn
+                break
+    if judge:
+        rules = [m.group(1) for _, t in procedure.steps(procedure_prompt) for m in [_STOP.match(t)] if m]
+        sample = random.Random(0).sample(points, min(judge, len(points)))
+        agree = tp = fp = fn = 0
+        for student, verdict in sample:
+            text, _ = llm.complete([
+                {"role": "system", "content": JUDGE_PROMPT.format(criteria="\n".join(rules))},
+                {"role": "user", "content": "\n\n".join(f"STUDENT: {s}" for s in student)},
+            ], f"{module} close-judge")
+            judged = text.strip().upper().startswith("YES")
+            agree += judged == verdict
+            tp += judged and verdict
+            fp += verdict and not judged
+            fn += judged and not verdict
+        out.update(judged=len(sample), agreement=agree / max(len(sample), 1),
+                   precision=tp / max(tp + fp, 1), recall=tp / max(tp + fn, 1))
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+
+    from professorbot import ingest, warmup
+
+    ap = argparse.ArgumentParser(description="Evaluate the local stop-criteria check on archived conversations.")
+    ap.add_argument("module")
+    ap.add_argument("--db", default=ingest.ARCHIVE_PATH)
+    ap.add_argument("--judge", type=int, default=0, help="turns to have the LLM judge (0 = no judge)")
+    args = ap.parse_args()
+    prompt = next(c["PROCEDURE_PROMPT"] for c in map(warmup.page_constants, warmup.pages())
+                  if c.get("MODULE") == args.module)
+    print("criteria:", [sorted(p) for p in criteria(prompt)[1]])
+    started = time.perf_counter()
+    print(json.dumps(evaluate(ingest.connect(args.db), args.module, prompt, args.judge), indent=2))
+    print(f"{time.perf_counter() - started:.2f}s")
@@ -0,0 +1,226 @@
+"""Clusters of student answers per procedure step, for reviewing a module.
+
+Works on the transcript archive (``professorbot.ingest``): the student's
+messages at each procedure step are embedded and grouped with mini-batch
+k-means, and each cluster is reported with its size and the answers closest
+to its centre as representative quotes.
+
+The default embedder hashes word unigrams and bigrams into a fixed number of
+signed buckets. It is stateless, so answers embedded today and next week live
+in the same space and the clustering can be updated incrementally: each run
+only embeds messages added since the last one and folds them into the saved
+centres (``--refit`` starts over). Another embedder can be plugged in with
+PROFESSORBOT_EMBEDDER, a ``package.module:function`` path to a callable that
+takes a list of strings and returns an ``(n, d)`` array.
+
+    python -m professorbot.clusters "Machine II" --k 5
+    python -m professorbot.clusters "Rationality II" --step 3 --quotes 5
+"""
+import importlib
+import re
+import zlib
+
+import numpy as np
+
+from professorbot import config, ingest
+from professorbot.students import penn_id
+
+EMBEDDER = config.get("PROFESSORBOT_EMBEDDER", "hashing")
+MIN_WORDS = 3  # "Next", "yes" and Penn IDs are not positions
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cluster_models (
+    module TEXT, step TEXT, embedder TEXT, centers BLOB, counts BLOB, dim INTEGER, last_rowid INTEGER,
+    PRIMARY KEY (module, step));
+CREATE TABLE IF NOT EXISTS cluster_members (
+    message INTEGER PRIMARY KEY, module TEXT, step TEXT, cluster INTEGER, similarity REAL);
+CREATE INDEX IF NOT EXISTS cluster_members_step ON cluster_members (module, step, cluster);
+"""
+
+_WORD = re.compile(r"[a-z0-9']+")
+_STOP = frozenset(
+    "a an and are as at be but by do does for from had has have i if in is it its it's i'm me my not of on "
+    "or so that the their them there they this to was we were what when which who will with would you".split())
+
+
+# ---------- embedders ----------
+def hashing_embedder(texts, dim=1 << 12):
+    """Signed hashed unigram + bigram counts (sublinear), L2-normalized."""
+    rows, cols, vals = [], [], []
+    for i, text in enumerate(texts):
+        words = [w for w in _WORD.findall(text.lower()) if w not in _STOP]
+        for gram in words + [a + " " + b for a, b in zip(words, words[1:])]:
+            h = zlib.crc32(gram.encode())
+            rows.append(i)
+            cols.append(h % dim)
+            vals.append(1.0 if h >> 31 else -1.0)
+    x = np.zeros((len(texts), dim), np.float32)
+    np.add.at(x, (np.asarray(rows, np.int64), np.asarray(cols, np.int64)), np.asarray(vals, np.float32))
+    x = np.sign(x) * np.log1p(np.abs(x))
+    return _normalize(x)
+
+
+def embedder(name=EMBEDDER):
+    if name == "hashing":
+        return hashing_embedder
+    module, _, attr = name.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def _normalize(x):
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+# ---------- spherical mini-batch k-means ----------
+class MiniBatchKMeans:
+    """Mini-batch k-means on unit vectors (cosine similarity), with per-centre learning rates."""
+
+    def __init__(self, k, batch_size=256, seed=0, centers=None, counts=None):
+        self.k = k
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+        self.centers = centers
+        self.counts = counts
+
+    def _init(self, x):
+        # k-means++ seeding on cosine distance
+        k = min(self.k, len(x))
+        chosen = [self.rng.integers(len(x))]
+        dist = 1.0 - x @ x[chosen[0]]
+        for _ in range(1, k):
+            p = np.maximum(dist, 0.0)
+            total = p.sum()
+            chosen.append(self.rng.choice(len(x), p=p / total) if total > 0 else self.rng.integers(len(x)))
+            dist = np.minimum(dist, 1.0 - x @ x[chosen[-1]])
+        self.centers = x[chosen].copy()
+        self.counts = np.zeros(k, np.float64)
+
+    def partial_fit(self, x, epochs=1):
+        if not len(x):
+            return self
+        if self.centers is None:
+            self._init(x)
+        for _ in range(epochs):
+            order = self.rng.permutation(len(x))
+            for start in range(0, len(x), self.batch_size):
+                batch = x[order[start:start + self.batch_size]]
+                labels = np.argmax(batch @ self.centers.T, axis=1)
+                onehot = np.zeros((len(self.centers), len(batch)), np.float32)
+                onehot[labels, np.arange(len(batch))] = 1.0
+                n = onehot.sum(axis=1, dtype=np.float64)
+                sums = onehot @ batch
+                self.counts += n
+                moved = n > 0
+                # each centre moves towards its batch mean with rate n / count
+                self.centers[moved] += (sums[moved] - n[moved, None] * self.centers[moved]) / self.counts[moved, None]
+                self.centers = _normalize(self.centers)
+        return self
+
+    def predict(self, x):
+        """``(labels, similarity to the assigned centre)``."""
+        sims = x @ self.centers.T
+        labels = np.argmax(sims, axis=1)
+        return labels, sims[np.arange(len(x)), labels]
+
+
+# ---------- archive ----------
+def connect(path=ingest.ARCHIVE_PATH):
+    db = ingest.connect(path)
+    db.executescript(SCHEMA)
+    return db
+
+
+def answers(db, module, step=None, after=0):
+    """``[(rowid, step, text), ...]`` of student answers to the module's procedure steps."""
+    sql = """SELECT m.rowid, m.step, m.content FROM messages m JOIN conversations c ON c.id = m.conversation
+             WHERE c.module = ? AND m.role = 'user' AND m.step IS NOT NULL AND m.rowid > ?"""
+    params = [module, after]
+    if step is not None:
+        sql += " AND m.step = ?"
+        params.append(step)
+    return [(rowid, s, text) for rowid, s, text in db.execute(sql + " ORDER BY m.rowid", params)
+            if len(text.split()) >= MIN_WORDS and not penn_id(text)]
+
+
+def _load(db, module, step, k):
+    row = db.execute("SELECT embedder, centers, counts, dim, last_rowid FROM cluster_models WHERE module = ? AND step = ?",
+                     (module, step)).fetchone()
+    if row is None or row[0] != EMBEDDER:
+        return MiniBatchKMeans(k), 0
+    _, centers, counts, dim, last = row
+    centers = np.frombuffer(centers, np.float32).reshape(-1, dim).copy()
+    return MiniBatchKMeans(len(centers), centers=centers, counts=np.frombuffer(counts, np.float64).copy()), last
+
+
+def update(db, module, step=None, k=5, refit=False, embed=None):
+    """Fold new answers into each step's clusters; return ``{step: answers added}``."""
+    embed = embed or embedder()
+    if refit:
+        with db:
+            where, params = ("module = ?", [module]) if step is None else ("module = ? AND step = ?", [module, step])
+            db.execute(f"DELETE FROM cluster_models WHERE {where}", params)
+            db.execute(f"DELETE FROM cluster_members WHERE {where}", params)
+    steps = [step] if step is not None else [s for s, in db.execute(
+        "SELECT DISTINCT m.step FROM messages m JOIN conversations c ON c.id = m.conversation "
+        "WHERE c.module = ? AND m.step IS NOT NULL", (module,))]
+    added = {}
+    for s in steps:
+        model, last = _load(db, module, s, k)
+        rows = answers(db, module, s, after=last)
+        if not rows:
+            continue
+        x = np.asarray(embed([text for _, _, text in rows]), np.float32)
+        # a new model gets ~100 mini-batches (several passes over a small step), updates one pass
+        epochs = min(10, max(1, 100 * model.batch_size // len(x))) if model.centers is None else 1
+        model.partial_fit(x, epochs)
+        labels, sims = model.predict(x)
+        with db:
+            db.executemany("INSERT OR REPLACE INTO cluster_members VALUES (?, ?, ?, ?, ?)",
+                           ((r[0], module, s, int(c), float(v)) for r, c, v in zip(rows, labels, sims)))
+            db.execute("INSERT OR REPLACE INTO cluster_models VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (module, s, EMBEDDER, model.centers.astype(np.float32).tobytes(), model.counts.tobytes(),
+                        model.centers.shape[1], rows[-1][0]))
+        added[s] = len(rows)
+    return added
+
+
+def report(db, module, step=None, quotes=3):
+    """``{step: [{"cluster", "size", "quotes"}, ...]}``, largest clusters first."""
+    sql = "SELECT step, cluster, count(*) FROM cluster_members WHERE module = ?"
+    params = [module]
+    if step is not None:
+        sql += " AND step = ?"
+        params.append(step)
+    out = {}
+    for s, cluster, size in db.execute(sql + " GROUP BY step, cluster ORDER BY step, 3 DESC", params).fetchall():
+        texts = [t for t, in db.execute(
+            """SELECT m.content FROM cluster_members cm JOIN messages m ON m.rowid = cm.message
+               WHERE cm.module = ? AND cm.step = ? AND cm.cluster = ? ORDER BY cm.similarity DESC LIMIT ?""",
+            (module, s, cluster, quotes))]
+        out.setdefault(s, []).append({"cluster": cluster, "size": size, "quotes": texts})
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    ap = argparse.ArgumentParser(description="Cluster student answers per procedure step.")
+    ap.add_argument("module")
+    ap.add_argument("--db", default=ingest.ARCHIVE_PATH)
+    ap.add_argument("--step")
+    ap.add_argument("--k", type=int, default=5, help="clusters per step (used when a step is first fitted)")
+    ap.add_argument("--quotes", type=int, default=3)
+    ap.add_argument("--refit", action="store_true", help="discard saved clusters and fit from scratch")
+    args = ap.parse_args()
+    db = connect(args.db)
+    started = time.perf_counter()
+    added = update(db, args.module, args.step, args.k, args.refit)
+    print(f"{sum(added.values())} new answers clustered in {time.perf_counter() - started:.2f}s")
+    for s, clusters in report(db, args.module, args.step, args.quotes).items():
+        print(f"\nstep {s}")
+        for c in clusters:
+            print(f"  cluster {c['cluster']} ({c['size']} answers)")
+            for q in c["quotes"]:
+                print("    > " + " ".join(q.split())[:160])
@@ -0,0 +1,26 @@
+"""Settings lookup shared by the pages and the offline tools.
+
+Values come from Streamlit secrets first and environment variables second,
+the same order the pages use for ``OPENAI_API_KEY``.
+"""
+import os
+
+
+def get(name, default=None):
+    try:
+        import streamlit as st
+
+        value = st.secrets.get(name, None)
+    except (ImportError, FileNotFoundError):
+        value = None
+    if value is None:
+        value = os.getenv(name)
+    return default if value is None else value
+
+
+def get_float(name, default):
+    return float(get(name, default))
+
+
+def get_int(name, default):
+    return int(get(name, default))
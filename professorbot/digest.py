@@ -0,0 +1,162 @@
+"""One-page digest of how a module went, by map-reduce over archived conversations.
+
+Map: each conversation in the transcript archive (``professorbot.ingest``) is
+summarized on its own. Reduce: the summaries are merged FANOUT at a time,
+level by level, until one digest is left.
+
+Every summary is cached in the archive, keyed by a hash of its input (the
+conversation id, which is itself the transcript's content hash, or the keys of
+the summaries it merges) and the prompt. Conversations are taken in the order
+they were archived, so a late submission lands in the last group: re-running
+costs one map call plus one reduce call per level, everything else is a cache
+hit. Map and reduce calls run PROFESSORBOT_DIGEST_WORKERS (default 8) at a time
+through ``llm.complete``, so they show up in metrics and the quota ledger as
+module "<module> digest". When some calls of a level fail, the rest are cached
+and ``Incomplete`` names the failures; the next run retries only those.
+
+    python -m professorbot.digest "Behavior III" --since 2026-09-01 > digest.md
+"""
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from professorbot import config, ingest, llm
+
+WORKERS = config.get_int("PROFESSORBOT_DIGEST_WORKERS", 8)
+FANOUT = 8
+
+MAP_PROMPT = (
+    "You summarize one student's conversation with ProfessorBot, a course chatbot that walks students "
+    "through a fixed discussion procedure. In at most 120 words, state the position the student took at "
+    "each step, any misconception or especially original idea, and whether they finished. Quote the "
+    "student briefly where it helps. Do not include their Penn ID."
+)
+REDUCE_PROMPT = (
+    "You merge summaries of student conversations about the same course module into one summary for the "
+    "professor. Keep the distinct positions students took and roughly how common each was, recurring "
+    "misconceptions, notable original ideas with short quotes, and where students got stuck. At most 300 "
+    "words; do not list students individually."
+)
+FINAL_PROMPT = (
+    "Turn these merged summaries into a one-page digest for the professor to read before the next lecture, "
+    "in Markdown: the main positions and how common they were, misconceptions worth addressing in class, "
+    "two or three striking quotes, and suggested talking points."
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key TEXT PRIMARY KEY, kind TEXT, module TEXT, text TEXT, created REAL);
+"""
+
+
+class Incomplete(Exception):
+    """Some summaries of a level failed; the rest are cached."""
+
+    def __init__(self, kind, total, failed):
+        first = next(iter(failed.values()))
+        super().__init__(f"{len(failed)} of {total} {kind} summaries failed (first: {type(first).__name__}: {first})")
+        self.failed = failed  # key -> exception
+
+
+def _key(*parts):
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+def transcript(db, conversation):
+    return "\n---\n".join(f"{role.upper()}:\n{content}" for role, content in db.execute(
+        "SELECT role, content FROM messages WHERE conversation = ? ORDER BY idx", (conversation,)))
+
+
+class Digest:
+    def __init__(self, db, module, workers=WORKERS, fanout=FANOUT):
+        self.db = db
+        self.module = module
+        self.fanout = fanout
+        self.workers = workers
+        self.calls = 0
+        self.hits = 0
+        db.executescript(SCHEMA)
+
+    def _cached(self, keys):
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            found.update(self.db.execute(
+                f"SELECT key, text FROM summaries WHERE key IN ({','.join('?' * len(chunk))})", chunk))
+        return found
+
+    def _complete(self, system, user):
+        text, usage = llm.complete([{"role": "system", "content": system}, {"role": "user", "content": user}],
+                                   f"{self.module} digest")
+        if usage is None:  # quota note or missing key; never cache it
+            raise RuntimeError(text)
+        return text
+
+    def _run(self, kind, jobs):
+        """``jobs`` is ``[(key, system prompt, input thunk)]``; returns summaries in the same order.
+
+        Every summary that succeeds is cached before ``Incomplete`` reports the ones that failed,
+        so a re-run only pays for those.
+        """
+        found = self._cached([k for k, _, _ in jobs])
+        self.hits += len(found)
+        todo = [(k, system, thunk()) for k, system, thunk in jobs if k not in found]  # sqlite reads on this thread
+        done, failed = {}, {}
+        with ThreadPoolExecutor(self.workers) as pool:
+            futures = {pool.submit(self._complete, system, text): k for k, system, text in todo}
+            for future in as_completed(futures):
+                try:
+                    done[futures[future]] = future.result()
+                except Exception as exc:
+                    failed[futures[future]] = exc
+        self.calls += len(todo)
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?)",
+                                ((k, kind, self.module, text, time.time()) for k, text in done.items()))
+        if failed:
+            raise Incomplete(kind, len(jobs), failed)
+        found.update(done)
+        return [(k, found[k]) for k, _, _ in jobs]
+
+    def build(self, since=None, until=None):
+        """The module digest in Markdown, or None when nothing is archived."""
+        sql = "SELECT id FROM conversations WHERE module = ? AND day >= ? AND day <= ? ORDER BY rowid"
+        ids = [i for i, in self.db.execute(sql, (self.module, since or "", until or "9999"))]
+        if not ids:
+            return None
+        level = self._run("map", [(_key("map", MAP_PROMPT, cid), MAP_PROMPT, lambda cid=cid: transcript(self.db, cid))
+                                  for cid in ids])
+        while True:
+            final = len(level) <= self.fanout
+            system = FINAL_PROMPT if final else REDUCE_PROMPT
+            groups = [level[i:i + self.fanout] for i in range(0, len(level), self.fanout)]
+            level = self._run("final" if final else "reduce", [
+                (_key("reduce", system, *(k for k, _ in group)), system,
+                 lambda group=group: "\n\n=====\n\n".join(text for _, text in group))
+                for group in groups])
+            if final:
+                return level[0][1]
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    ap = argparse.ArgumentParser(description="Map-reduce digest of a module's archived conversations.")
+    ap.add_argument("module")
+    ap.add_argument("--db", default=ingest.ARCHIVE_PATH)
+    ap.add_argument("--since", help="YYYY-MM-DD")
+    ap.add_argument("--until", help="YYYY-MM-DD")
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    args = ap.parse_args()
+    digest = Digest(ingest.connect(args.db), args.module, args.workers)
+    started = time.perf_counter()
+    try:
+        text = digest.build(args.since, args.until)
+    except Incomplete as exc:
+        print(f"{exc}; the others are cached, run again to retry", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        print(f"{digest.calls} completions, {digest.hits} cached summaries, {time.perf_counter() - started:.1f}s",
+              file=sys.stderr)
+    print(text or f"No archived conversations for {args.module}.")
@@ -0,0 +1,150 @@
+"""Conversation engine shared by the Streamlit pages and ``professorbot.asgi``.
+
+A module is its two prompts plus the rules every page follows: the opening
+message, the per-turn control message (turn count and completion check),
+the reply job, approval detection, progress events and the transcript
+format. The state of one conversation is a mapping with the keys set by
+``init_state``: ``st.session_state`` on the pages, a plain dict in the ASGI
+frontend. Both frontends therefore run the same conversation and differ only
+in how they render it.
+"""
+from professorbot import closing, ingest, jobs, limits, llm, prefilter, procedure, progress, speculate
+from professorbot.chatlog import ChatLog, prompt_prefix
+from professorbot.students import student_key
+
+MAX_TURNS = 15
+APPROVAL = "approved to download transcript"
+OPENING = "Hi — I’m ProfessorBot.\n\nBefore we begin: **What is your Penn ID ?**"
+
+DEFAULTS = {
+    "turn_count": 0,  # counts user turns
+    "conversation_done": False,
+    "prefiltered": None,  # last message answered with the off-topic refusal
+    "prefilter_bypass": False,
+    "input_note": None,  # feedback about the last over-long message
+    "pending": None,  # user turn still waiting for a reply
+}
+
+
+def init_state(state):
+    """Add the conversation keys a fresh session does not have yet."""
+    if "messages" not in state:
+        state["messages"] = ChatLog()
+    for key, value in DEFAULTS.items():
+        if key not in state:
+            state[key] = value
+
+
+def approved(text):
+    return APPROVAL in text
+
+
+def transcript(log):
+    """Plain-text transcript, as students download it."""
+    return "\n---\n".join(f"{m.get('role', 'unknown').upper()}:\n{m.full_text}\n" for m in log)
+
+
+class Engine:
+    def __init__(self, module, system_prompt, procedure_prompt, opening=OPENING):
+        self.module = module
+        self.system_prompt = system_prompt
+        self.procedure_prompt = procedure_prompt
+        self.opening = opening
+        self.prefix = prompt_prefix(system_prompt, procedure_prompt)
+
+    @classmethod
+    def from_page(cls, path):
+        """Engine for a page script, read without running it."""
+        from professorbot import warmup
+
+        c = warmup.page_constants(path, ("MODULE", "SYSTEM_PROMPT", "PROCEDURE_PROMPT", "OPENING"))
+        return cls(c["MODULE"], c["SYSTEM_PROMPT"], c["PROCEDURE_PROMPT"], c.get("OPENING", OPENING))
+
+    def control(self, turn_count, log):
+        """Per-turn system message: the turn count and, once the criteria are met, the completion check."""
+        return (f"User turn count so far: {turn_count}. If >= {MAX_TURNS}, you must end now."
+                + closing.signal(self.procedure_prompt, log))
+
+    def start(self, state):
+        """Post the opening message to an empty conversation; True if it did."""
+        if len(state["messages"]):
+            return False
+        state["messages"].append("assistant", self.opening)
+        session = jobs.session_key(state)
+        first = next(iter(procedure.steps(self.procedure_prompt)), (None, None))[0]
+        progress.publish(self.module, session, student_key(state["messages"], session), first, 0)
+        return True
+
+    def accept(self, state, user_text):
+        """Take a student message; False when it is rejected (``state["input_note"]`` says why).
+
+        Off-topic messages are answered locally; anything else becomes the pending turn.
+        """
+        bounded = limits.check(user_text, self.module)
+        state["input_note"] = bounded.note
+        if bounded.rejected:
+            return False
+        log = state["messages"]
+        if len(log) and log[-1]["role"] == "user" and log[-1].full_text == user_text:
+            state["pending"] = state["turn_count"]  # sent again after a timed-out reply: same turn, no duplicate
+            return True
+        log.append("user", user_text, prompt=bounded.prompt)
+
+        if state["prefilter_bypass"]:
+            state["prefilter_bypass"] = False
+            off_topic = False
+        else:
+            off_topic = prefilter.check(bounded.prompt or user_text, self.module).blocked
+        if off_topic:  # answered locally: not one of the student's turns
+            log.append("assistant", prefilter.REFUSAL)
+            state["prefiltered"] = user_text
+            return True
+        state["prefiltered"] = None
+        state["turn_count"] += 1
+        speculate.resolve(jobs.session_key(state), self.module, state["turn_count"], user_text)
+        state["pending"] = state["turn_count"]
+        return True
+
+    def contest(self, state):
+        """The student says the refused message was about the course: log it and let the resend through."""
+        prefilter.record_false_positive(self.module, state["prefiltered"])
+        state["prefiltered"] = None
+        state["prefilter_bypass"] = True
+
+    def reply_job(self, state, student):
+        """Background job answering the pending turn; reruns and refreshes reattach to the same one."""
+        session = jobs.session_key(state)
+        log = state["messages"]
+        return jobs.submit(
+            (session, state["pending"]),
+            llm.call_llm,
+            log.request(self.prefix, self.control(state["turn_count"], log)),
+            self.module,
+            student,
+            session,
+        )
+
+    def finish(self, state, job, text, student):
+        """Record the reply to the pending turn, then precompute likely next replies.
+
+        An ``llm.Unanswered`` notice (the deadline passed, or a quota cap was reached) becomes
+        ``state["input_note"]`` and leaves the turn unanswered, so the student can send it again.
+        """
+        state["pending"] = None
+        jobs.forget(job)
+        if isinstance(text, llm.Unanswered):
+            state["input_note"] = str(text)
+            return
+        speculate.charge(job, student)
+        log = state["messages"]
+        log.append("assistant", text)
+        if approved(text):
+            state["conversation_done"] = True
+            ingest.archive(self.module, log)
+        session = jobs.session_key(state)
+        step = None if state["conversation_done"] else procedure.match(self.module, text)
+        progress.publish(self.module, session, student, step, state["turn_count"], state["conversation_done"])
+
+        # replies to closed-choice questions are generated while the student reads
+        if not state["conversation_done"]:
+            speculate.launch(session, self.module, log, self.prefix, self.control(state["turn_count"] + 1, log))
@@ -0,0 +1,339 @@
+"""Term forecast: API spend and capacity from recorded conversations.
+
+    python -m professorbot.forecast --enrollment 450 --schedule schedule.json \\
+        [--cassettes cassettes/] [--archive transcripts.sqlite3] [--runs 200] [--workers 32] [--rpm 500 --tpm 200000]
+
+Conversation profiles (per completion: prompt tokens, completion tokens,
+latency) come from cassettes (recorded or replayed runs: exact usage and
+wall time) and from the ingest archive, where tokens are estimated from the
+text (the module's prompts plus the history so far) and latency is
+PROFESSORBOT_FORECAST_LATENCY seconds (default 0.8) plus the completion at
+PROFESSORBOT_FORECAST_TOKENS_PER_S (default 60). A module with cassettes
+uses only those; a module with no recordings at all uses the whole course's.
+
+The schedule is a JSON list with one entry per assignment (``students``
+overrides the enrollment for that entry):
+
+    [{"module": "Machine I", "assigned": "2026-01-20T09:00", "due": "2026-01-27T23:59",
+      "bursts": [{"at": "2026-01-22T10:30", "minutes": 50, "share": 0.3}]}]
+
+In each Monte Carlo run every student starts each assignment once: a
+``share`` of them in each burst (a class session working on it together),
+PROFESSORBOT_FORECAST_EARLY (default 0.2) soon after it is assigned
+(exponential, mean a tenth of the window) and the rest rushing the deadline
+(density rising as the window's elapsed fraction to the power
+PROFESSORBOT_FORECAST_RUSH, default 2), at hours of the day weighted by
+``DIURNAL``. The student replays a sampled conversation, thinking a
+lognormal PROFESSORBOT_FORECAST_THINK seconds (median, default 40) before
+each message. Runs are simulated together as flat arrays, about
+PROFESSORBOT_FORECAST_BATCH completions (default 2,000,000) per pass; runs
+are laid end to end with a gap that drains every queue, so one sort and one
+cumulative sum cover all of them.
+
+Reported per module and for the whole course, as the mean and the 95th
+percentile over runs:
+
+- spend in USD (``metrics.PRICES``);
+- peak concurrent completions, which PROFESSORBOT_JOB_WORKERS must cover;
+- required rate limits: requests and tokens in the busiest minute;
+- p95 queue wait of a completion, given ``--workers`` completion slots and
+  the ``--rpm``/``--tpm`` limits. Each limit is a fluid FIFO queue (the
+  rate limits with a minute's burst), whose backlog is a running sum minus
+  its running minimum; that matches an exact multi-server queue while it is
+  busy and errs high when it is nearly idle.
+"""
+import json
+import os
+import sqlite3
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+
+from professorbot import config, jobs, limits, metrics
+
+LATENCY = config.get_float("PROFESSORBOT_FORECAST_LATENCY", 0.8)
+TOKENS_PER_S = config.get_float("PROFESSORBOT_FORECAST_TOKENS_PER_S", 60.0)
+THINK = config.get_float("PROFESSORBOT_FORECAST_THINK", 40.0)
+THINK_SIGMA = 0.8
+EARLY = config.get_float("PROFESSORBOT_FORECAST_EARLY", 0.2)
+RUSH = config.get_float("PROFESSORBOT_FORECAST_RUSH", 2.0)
+BATCH = config.get_int("PROFESSORBOT_FORECAST_BATCH", 2_000_000)
+CONTROL_TOKENS = 30  # the per-turn control message
+
+# relative share of conversations started in each hour of the day, midnight first
+DIURNAL = np.array([3, 2, 1, 0.5, 0.3, 0.3, 0.5, 1, 2, 3, 4, 4, 4, 4, 4, 4, 4, 5, 5, 6, 7, 7, 6, 5], np.float64)
+# queue wait histogram: [0, 10 ms) then log-spaced up to a day
+WAIT_EDGES = np.concatenate(([0.0], np.logspace(-2, np.log10(86400), 160)))
+
+
+# ---------- profiles ----------
+def from_cassettes(directory):
+    """``{module: [[(prompt, completion, seconds), ...] per conversation]}`` from recorded completions."""
+    from professorbot import cassette
+
+    turns = defaultdict(dict)
+    for entry in cassette.load(directory):
+        usage = entry["response"].get("usage") or {}
+        turns[entry["module"], entry["session"]][entry["turn"]] = (
+            usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), entry["elapsed"])
+    out = defaultdict(list)
+    for (module, _), by_turn in turns.items():
+        out[module].append([by_turn[t] for t in sorted(by_turn)])
+    return dict(out)
+
+
+def from_archive(path):
+    """Same shape from archived transcripts, with estimated tokens and modeled latency."""
+    from professorbot import warmup
+
+    prefix = {}
+    for page in warmup.pages():
+        c = warmup.page_constants(page)
+        if "MODULE" in c:
+            prefix[c["MODULE"]] = limits.estimate_tokens(c.get("SYSTEM_PROMPT", "") + c.get("PROCEDURE_PROMPT", ""))
+    db = sqlite3.connect(path)
+    rows = db.execute("SELECT m.conversation, c.module, m.role, m.content FROM messages m"
+                      " JOIN conversations c ON c.id = m.conversation ORDER BY m.conversation, m.idx")
+    out, current, history, turns, module, asked = defaultdict(list), None, 0, [], None, None
+    for conv, mod, role, content in rows:
+        if conv != current:
+            if turns:
+                out[module].append(turns)
+            current, history, turns, module, asked = conv, 0, [], mod, None
+        tokens = limits.estimate_tokens(content)
+        history += tokens
+        if role == "user":
+            asked = prefix.get(module, 0) + history + CONTROL_TOKENS
+        elif role == "assistant" and asked is not None:
+            turns.append((asked, tokens, LATENCY + tokens / TOKENS_PER_S))
+            asked = None
+    if turns:
+        out[module].append(turns)
+    db.close()
+    return dict(out)
+
+
+class Profile:
+    """One module's conversations as padded ``conversations x turns`` arrays."""
+
+    def __init__(self, conversations):
+        conversations = [c for c in conversations if c]
+        if not conversations:
+            raise ValueError("no recorded completions")
+        shape = (len(conversations), max(len(c) for c in conversations))
+        self.turns = np.array([len(c) for c in conversations])
+        self.prompt, self.completion, self.latency = (np.zeros(shape) for _ in range(3))
+        for i, c in enumerate(conversations):
+            self.prompt[i, :len(c)], self.completion[i, :len(c)], self.latency[i, :len(c)] = zip(*c)
+
+    def __len__(self):
+        return len(self.turns)
+
+
+def profiles(cassettes=None, archive=None):
+    found = from_archive(archive) if archive else {}
+    found.update(from_cassettes(cassettes) if cassettes else {})  # exact usage wins over estimates
+    if not found:
+        raise ValueError("no recorded conversations: give --cassettes or --archive")
+    return {module: Profile(convs) for module, convs in found.items()}
+
+
+def load_schedule(path):
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    stamp = lambda value: datetime.fromisoformat(value).timestamp()  # noqa: E731
+    return [{**e, "assigned": stamp(e["assigned"]), "due": stamp(e["due"]),
+             "bursts": [{**b, "at": stamp(b["at"])} for b in e.get("bursts", ())]} for e in entries]
+
+
+# ---------- simulation ----------
+def _starts(rng, n, entry):
+    """Start times of ``n`` students for one assignment."""
+    t0, t1 = entry["assigned"], entry["due"]
+    early = rng.random(n) < EARLY
+    frac = np.where(early, np.minimum(rng.exponential(0.1, n), 1.0), rng.random(n) ** (1.0 / (RUSH + 1.0)))
+    t = t0 + frac * (t1 - t0)
+    # keep the day, redraw the hour from the daily pattern (unless that leaves the window)
+    midnight = datetime.fromtimestamp(t0).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    day = np.floor((t - midnight) / 86400.0)
+    hour = rng.choice(24, n, p=DIURNAL / DIURNAL.sum())
+    shaped = midnight + day * 86400.0 + (hour + rng.random(n)) * 3600.0
+    t = np.where((shaped >= t0) & (shaped <= t1), shaped, t)
+    for burst in entry.get("bursts", ()):
+        t = np.where(rng.random(n) < burst["share"], burst["at"] + rng.random(n) * burst["minutes"] * 60.0, t)
+    return t
+
+
+def _completions(rng, runs, schedule, enrollment, profile_of, think):
+    """Every completion of ``runs`` runs: ``(run, module index, sent at, prompt, completion, latency)``."""
+    parts = []
+    for m, entry in enumerate(schedule):
+        students = entry.get("students", enrollment)
+        n = runs * students
+        p = profile_of[entry["module"]]
+        conv = rng.integers(0, len(p), n)
+        latency = p.latency[conv]
+        gaps = rng.lognormal(np.log(think), THINK_SIGMA, latency.shape)
+        # message k goes out once reply k-1 has arrived and the student has thought it over
+        sent = _starts(rng, n, entry)[:, None] + np.cumsum(gaps, axis=1) + np.cumsum(latency, axis=1) - latency
+        mask = np.arange(latency.shape[1]) < p.turns[conv][:, None]
+        run = np.broadcast_to(np.repeat(np.arange(runs), students)[:, None], mask.shape)
+        parts.append((run[mask], np.full(mask.sum(), m), sent[mask], p.prompt[conv][mask],
+                      p.completion[conv][mask], latency[mask]))
+    return [np.concatenate(column) for column in zip(*parts)]
+
+
+def _group_max(values, group, groups):
+    """Largest value per group, for ``group`` sorted ascending; 0 for groups with no values."""
+    out = np.zeros(groups)
+    if len(values):
+        starts = np.flatnonzero(np.concatenate(([True], group[1:] != group[:-1])))
+        out[group[starts]] = np.maximum.reduceat(values, starts)
+    return out
+
+
+def _peaks(keys, latency, group, groups):
+    """Most completions in flight at once per group; groups must not overlap in ``keys``."""
+    ones = np.ones(len(keys))
+    events = np.concatenate((keys + latency, keys))
+    order = np.argsort(events, kind="stable")  # at a tie the finished completion (listed first) leaves first
+    level = np.cumsum(np.concatenate((-ones, ones))[order])  # every group starts and ends at zero
+    return _group_max(level, np.concatenate((group, group))[order], groups)
+
+
+def _busiest_minute(keys, tokens, group, groups):
+    """Requests and tokens in the busiest 60 s per group; ``keys`` sorted and groups apart."""
+    i = np.arange(len(keys))
+    j = np.searchsorted(keys, keys + 60.0, side="left")
+    cum = np.concatenate(([0.0], np.cumsum(tokens)))
+    return _group_max(j - i, group, groups), _group_max(cum[j] - cum[i], group, groups)
+
+
+def _wait(t, work, rate, burst=0.0):
+    """Queue wait before each arrival at a fluid FIFO server draining ``rate`` per second (``t`` sorted)."""
+    s = np.cumsum(work) - work - rate * t
+    backlog = s - np.minimum.accumulate(s)
+    return np.maximum(backlog - burst, 0.0) / rate
+
+
+def simulate(profile_of, schedule, enrollment, runs=200, workers=jobs.MAX_WORKERS, rpm=None, tpm=None,
+             think=THINK, seed=None):
+    """Monte Carlo forecast; returns ``{module: stats, "all": stats}`` (see the module docstring)."""
+    rng = np.random.default_rng(seed)
+    fallback = None
+    for entry in schedule:
+        if entry["module"] not in profile_of:
+            if fallback is None:
+                fallback = Profile([c for p in profile_of.values() for c in _rows(p)])
+            profile_of = {**profile_of, entry["module"]: fallback}
+    modules = sorted({e["module"] for e in schedule})
+    index = [modules.index(e["module"]) for e in schedule]
+    M = len(modules)
+    per_run = sum(e.get("students", enrollment) * profile_of[e["module"]].turns.mean() for e in schedule)
+    batch = max(1, min(runs, int(BATCH // max(per_run, 1))))
+    price = np.array([metrics.PRICES["prompt"], metrics.PRICES["completion"]]) / 1e6
+
+    spend, completions, peak, minute_req, minute_tok = (np.zeros((runs, M)) for _ in range(5))
+    peak_all, minute_req_all, minute_tok_all = (np.zeros(runs) for _ in range(3))
+    hist = np.zeros((M, len(WAIT_EDGES)), np.int64)
+    for first in range(0, runs, batch):
+        r = min(batch, runs - first)
+        run, entry, sent, prompt, completion, latency = _completions(rng, r, schedule, enrollment, profile_of, think)
+        module = np.asarray(index)[entry]
+        tokens = prompt + completion
+        origin = sent.min()
+        gap = 86400.0 + latency.sum() / workers + (len(sent) * 60.0 / rpm if rpm else 0.0) \
+            + (tokens.sum() * 60.0 / tpm if tpm else 0.0)
+        stride = sent.max() - origin + latency.max() + gap  # every queue drains between runs
+        local = sent - origin
+        rows = slice(first, first + r)
+
+        cell = run * M + module
+        spend[rows] = np.bincount(cell, prompt * price[0] + completion * price[1], r * M).reshape(r, M)
+        completions[rows] = np.bincount(cell, minlength=r * M).reshape(r, M)
+
+        keys = cell * stride + local
+        order = np.argsort(keys, kind="stable")
+        peak[rows] = _peaks(keys, latency, cell, r * M).reshape(r, M)
+        requests, toks = _busiest_minute(keys[order], tokens[order], cell[order], r * M)
+        minute_req[rows], minute_tok[rows] = requests.reshape(r, M), toks.reshape(r, M)
+
+        t = run * stride + local  # the course as a whole: all modules share workers and keys
+        order = np.argsort(t, kind="stable")
+        t, run, module, latency, tokens = t[order], run[order], module[order], latency[order], tokens[order]
+        peak_all[rows] = _peaks(t, latency, run, r)
+        minute_req_all[rows], minute_tok_all[rows] = _busiest_minute(t, tokens, run, r)
+        wait = _wait(t, latency, float(workers))
+        if rpm:
+            wait = np.maximum(wait, _wait(t, np.ones(len(t)), rpm / 60.0, rpm))
+        if tpm:
+            wait = np.maximum(wait, _wait(t, tokens, tpm / 60.0, tpm))
+        bins = np.searchsorted(WAIT_EDGES, wait, side="right") - 1
+        hist += np.bincount(module * len(WAIT_EDGES) + bins, minlength=hist.size).reshape(hist.shape)
+
+    def stats(spend, completions, peak, req, tok, hist):
+        return {
+            "completions": round(float(completions.mean()), 1),
+            "spend_usd": round(float(spend.mean()), 2), "spend_usd_p95": round(float(np.percentile(spend, 95)), 2),
+            "peak_concurrent": round(float(peak.mean()), 1),
+            "peak_concurrent_p95": round(float(np.percentile(peak, 95)), 1),
+            "required_rpm_p95": round(float(np.percentile(req, 95)), 1),
+            "required_tpm_p95": round(float(np.percentile(tok, 95))),
+            "wait_p95_s": _percentile(hist, 95),
+        }
+
+    out = {m: {"students": sum(e.get("students", enrollment) for e in schedule if e["module"] == m),
+               "profiles": "course" if profile_of[m] is fallback else len(profile_of[m]),
+               **stats(spend[:, i], completions[:, i], peak[:, i], minute_req[:, i], minute_tok[:, i], hist[i])}
+           for i, m in enumerate(modules)}
+    out["all"] = {"students": sum(e.get("students", enrollment) for e in schedule), "profiles": "",
+                  **stats(spend.sum(1), completions.sum(1), peak_all, minute_req_all, minute_tok_all, hist.sum(0))}
+    return out
+
+
+def _rows(p):
+    return [list(zip(p.prompt[i, :n], p.completion[i, :n], p.latency[i, :n])) for i, n in enumerate(p.turns)]
+
+
+def _percentile(hist, q):
+    """Upper edge of the histogram bin holding the ``q``-th percentile (0 below 10 ms)."""
+    total = hist.sum()
+    if not total:
+        return 0.0
+    b = int(np.searchsorted(np.cumsum(hist), q / 100.0 * total))
+    return 0.0 if b == 0 else round(float(WAIT_EDGES[min(b + 1, len(WAIT_EDGES) - 1)]), 2)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from professorbot import cassette, ingest
+
+    ap = argparse.ArgumentParser(description="Forecast a term's API spend and capacity from recorded conversations.")
+    ap.add_argument("--enrollment", type=int, required=True)
+    ap.add_argument("--schedule", required=True, help="JSON list of {module, assigned, due, bursts?, students?}")
+    ap.add_argument("--cassettes", default=cassette.CASSETTE_DIR if os.path.isdir(cassette.CASSETTE_DIR) else None)
+    ap.add_argument("--archive", default=ingest.ARCHIVE_PATH if os.path.exists(ingest.ARCHIVE_PATH) else None)
+    ap.add_argument("--runs", type=int, default=200)
+    ap.add_argument("--workers", type=int, default=jobs.MAX_WORKERS, help="completion slots (PROFESSORBOT_JOB_WORKERS)")
+    ap.add_argument("--rpm", type=float, help="requests per minute across the key pool")
+    ap.add_argument("--tpm", type=float, help="tokens per minute across the key pool")
+    ap.add_argument("--think", type=float, default=THINK, help="median seconds a student takes per message")
+    ap.add_argument("--seed", type=int)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    started = time.perf_counter()
+    result = simulate(profiles(args.cassettes, args.archive), load_schedule(args.schedule), args.enrollment,
+                      args.runs, args.workers, args.rpm, args.tpm, args.think, args.seed)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        columns = ("students", "profiles", "completions", "spend_usd", "spend_usd_p95", "peak_concurrent_p95",
+                   "required_rpm_p95", "required_tpm_p95", "wait_p95_s")
+        print(f"{'module':<16}" + "".join(f"{c:>20}" for c in columns))
+        for module, row in result.items():
+            print(f"{module:<16}" + "".join(f"{row[c]!s:>20}" for c in columns))
+        print(f"{args.runs} runs in {time.perf_counter() - started:.1f}s")
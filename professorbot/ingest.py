@@ -0,0 +1,286 @@
+"""Bulk ingestion of the TXT transcripts students submit to Canvas.
+
+Files are the ones written by the pages' download block: ``ROLE:\\ncontent``
+sections joined by ``\\n---\\n``, named ``transcript_YYYYmmdd_HHMMSS.txt``
+(Canvas may add its own prefix). Each file is parsed in a worker process into
+normalized messages. The module is detected from the conversation content, and
+the student from the Penn ID in the first user message. Everything is loaded
+into a SQLite archive indexed on module, student and date, with an FTS5
+full-text index over the messages (see ``professorbot.search``). Each message
+is labelled with the procedure step it belongs to (``professorbot.procedure``).
+
+A name whose timestamp is malformed falls back to the file's mtime; a file
+that cannot be read or parsed is logged and recorded without a conversation,
+so one bad submission never stops the run.
+
+Ingestion is idempotent and incremental: files whose size and mtime are
+unchanged are skipped without being read, and a conversation is keyed by the
+hash of its content, so the same transcript under two names is stored once.
+A file that changed replaces the conversation it was ingested as, unless
+another file holds that conversation too. With PROFESSORBOT_ARCHIVE_LIVE=1 the pages also archive each conversation the
+moment it is approved (``archive``); the file the student submits later has
+the same content hash and is skipped.
+
+    python -m professorbot.ingest ~/Downloads/canvas-submissions --db transcripts.sqlite3
+"""
+import hashlib
+import logging
+import math
+import os
+import re
+import sqlite3
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from professorbot import config, procedure
+from professorbot.students import penn_id
+
+ARCHIVE_PATH = config.get("PROFESSORBOT_ARCHIVE", "transcripts.sqlite3")
+ARCHIVE_LIVE = config.get("PROFESSORBOT_ARCHIVE_LIVE", "") in ("1", "true", "yes")
+ROLES = ("ASSISTANT", "USER", "SYSTEM", "UNKNOWN")
+
+_SECTION = re.compile(r"\n---\n(?=(?:%s):\n)" % "|".join(ROLES))
+_STAMP = re.compile(r"transcript_(\d{8}_\d{6})")
+_WORD = re.compile(r"[a-z]{3,}")
+_log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, size INTEGER, mtime REAL, conversation TEXT);
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY, module TEXT, module_score REAL, student TEXT,
+    started TEXT, day TEXT, turns INTEGER, approved INTEGER, source TEXT);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation TEXT, idx INTEGER, turn INTEGER, role TEXT, content TEXT, step TEXT,
+    PRIMARY KEY (conversation, idx));
+CREATE INDEX IF NOT EXISTS conversations_module ON conversations (module, day);
+CREATE INDEX IF NOT EXISTS conversations_student ON conversations (student, day);
+CREATE INDEX IF NOT EXISTS conversations_day ON conversations (day);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='rowid', tokenize='porter unicode61');
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.rowid, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+END;
+"""
+
+
+def parse(text):
+    """``[(role, content), ...]`` from one transcript file's text."""
+    out = []
+    for section in _SECTION.split(text.replace("\r\n", "\n")):
+        head, _, body = section.partition("\n")
+        role = head.rstrip(":").strip().lower()
+        if head.endswith(":") and role.upper() in ROLES:
+            out.append((role, body.rstrip("\n")))
+    return out
+
+
+# ---------- module detection ----------
+_profiles = None
+
+
+def _words(text):
+    return Counter(_WORD.findall(text.lower()))
+
+
+def module_profiles():
+    """TF-IDF unit vectors of each page's prompts, keyed by module name."""
+    global _profiles
+    if _profiles is None:
+        from professorbot import warmup
+
+        docs = {}
+        for path in warmup.pages():
+            c = warmup.page_constants(path)
+            if "SYSTEM_PROMPT" in c and "PROCEDURE_PROMPT" in c:
+                docs[c.get("MODULE", os.path.basename(path))] = _words(c["SYSTEM_PROMPT"] + c["PROCEDURE_PROMPT"])
+        df = Counter(w for counts in docs.values() for w in counts)
+        idf = {w: math.log((1 + len(docs)) / (1 + n)) for w, n in df.items()}
+        _profiles = {}
+        for module, counts in docs.items():
+            vec = {w: c * idf[w] for w, c in counts.items() if idf[w] > 0}
+            norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+            _profiles[module] = {w: v / norm for w, v in vec.items()}
+    return _profiles
+
+
+def detect_module(messages):
+    """``(module, cosine score)`` for the profile closest to the assistant's messages."""
+    counts = _words(" ".join(c for r, c in messages if r == "assistant"))
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    best, score = None, 0.0
+    for module, profile in module_profiles().items():
+        s = sum(profile.get(w, 0.0) * c for w, c in counts.items()) / norm
+        if s > score:
+            best, score = module, s
+    return best, score
+
+
+# ---------- per-file work (runs in worker processes) ----------
+def process_file(path):
+    """``(path, conversation record)``; the record is None when the file cannot be parsed."""
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        messages = parse(text)
+        if not messages:
+            return path, None
+        return path, conversation(text, messages, _started(path))
+    except (OSError, ValueError) as exc:  # one bad file must not stop the run
+        _log.warning("skipping %s: %s", path, exc)
+        return path, None
+
+
+def _started(path):
+    """Start time from the ``transcript_YYYYmmdd_HHMMSS`` name, else the file's mtime."""
+    m = _STAMP.search(os.path.basename(path))
+    if m:
+        try:
+            return datetime.strptime(m.group(1), "%Y%m%d_%H%M%S")
+        except ValueError:
+            _log.warning("%s: malformed timestamp %s, using the file time", path, m.group(1))
+    return datetime.fromtimestamp(os.path.getmtime(path))
+
+
+def render(pairs):
+    """Transcript file text of ``(role, content)`` pairs, as the pages' download block writes it."""
+    return "\n---\n".join(f"{role.upper()}:\n{content}\n" for role, content in pairs)
+
+
+def conversation(text, messages, started, module=None):
+    """The archive record of one transcript; ``module`` is detected when not given."""
+    score = 1.0
+    if module is None:
+        module, score = detect_module(messages)
+    student = next((pid for r, c in messages if r == "user" for pid in [penn_id(c)] if pid), None)
+    rows, turn, step = [], 0, None
+    for idx, (role, content) in enumerate(messages):
+        turn += role == "user"
+        if role == "assistant":
+            step = procedure.match(module, content)
+        rows.append((idx, turn, role, content, step))  # answers share their question's step
+    return {
+        "id": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        "module": module,
+        "module_score": round(score, 4),
+        "student": student,
+        "started": started.isoformat(),
+        "day": started.date().isoformat(),
+        "turns": turn,
+        "approved": int(any(r == "assistant" and "approved to download transcript" in c for r, c in messages)),
+        "messages": rows,
+    }
+
+
+# ---------- loading ----------
+def connect(path=ARCHIVE_PATH):
+    db = sqlite3.connect(path, timeout=30)
+    columns = [row[1] for row in db.execute("PRAGMA table_info(messages)")]
+    if columns and "step" not in columns:  # archives from before steps were labelled
+        db.execute("ALTER TABLE messages ADD COLUMN step TEXT")
+    indexed = db.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone()
+    db.executescript(SCHEMA)
+    if columns and not indexed:
+        with db:
+            db.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+    return db
+
+
+def insert(db, conv, source):
+    """Store one conversation record; False if it is already archived."""
+    cur = db.execute(
+        "INSERT OR IGNORE INTO conversations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (conv["id"], conv["module"], conv["module_score"], conv["student"], conv["started"],
+         conv["day"], conv["turns"], conv["approved"], source))
+    if cur.rowcount:
+        db.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                       ((conv["id"], *row) for row in conv["messages"]))
+    return bool(cur.rowcount)
+
+
+def drop(db, path, keep=None):
+    """Delete the conversation ingested from ``path`` (unless it is ``keep`` or another file holds it too)."""
+    row = db.execute("SELECT conversation FROM files WHERE path = ?", (path,)).fetchone()
+    old = row and row[0]
+    if not old or old == keep:
+        return False
+    if db.execute("SELECT 1 FROM files WHERE conversation = ? AND path != ?", (old, path)).fetchone():
+        return False
+    db.execute("DELETE FROM messages WHERE conversation = ?", (old,))  # the FTS rows go with them
+    db.execute("DELETE FROM conversations WHERE id = ?", (old,))
+    return True
+
+
+def archive(module, messages, db_path=ARCHIVE_PATH):
+    """Archive a finished conversation from a page, as its downloaded transcript would be."""
+    if not ARCHIVE_LIVE:
+        return False
+    pairs = [(m.get("role", "unknown"), getattr(m, "full_text", m["content"])) for m in messages]
+    text = render(pairs)
+    db = connect(db_path)
+    try:
+        with db:
+            return insert(db, conversation(text, pairs, datetime.now(), module), "live")
+    finally:
+        db.close()
+
+
+def iter_files(root):
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(".txt"):
+                yield os.path.join(dirpath, name)
+
+
+def changed_files(db, paths):
+    """Paths whose size or mtime differ from what was ingested, with their stat."""
+    known = dict(((p, (s, m)) for p, s, m in db.execute("SELECT path, size, mtime FROM files")))
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError as exc:  # removed or unreadable since it was listed
+            _log.warning("skipping %s: %s", path, exc)
+            continue
+        if known.get(path) != (st.st_size, st.st_mtime):
+            yield path, st
+
+
+def ingest(root, db_path=ARCHIVE_PATH, workers=None, batch=500):
+    """Ingest every new or changed ``.txt`` under ``root``; return ``(files seen, conversations added)``."""
+    db = connect(db_path)
+    pending = dict(changed_files(db, (os.path.abspath(p) for p in iter_files(root))))
+    added = 0
+    with ProcessPoolExecutor(workers) as pool:
+        results = pool.map(process_file, pending, chunksize=32)
+        while True:
+            chunk = [r for _, r in zip(range(batch), results)]
+            if not chunk:
+                break
+            with db:
+                for path, conv in chunk:
+                    st = pending[path]
+                    drop(db, path, conv and conv["id"])
+                    if conv is not None:
+                        added += insert(db, conv, path)
+                    db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                               (path, st.st_size, st.st_mtime, conv and conv["id"]))
+    db.close()
+    return len(pending), added
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    ap = argparse.ArgumentParser(description="Ingest Canvas transcript TXT files.")
+    ap.add_argument("root", help="directory with submitted transcripts (searched recursively)")
+    ap.add_argument("--db", default=ARCHIVE_PATH)
+    ap.add_argument("--workers", type=int)
+    args = ap.parse_args()
+    started = time.perf_counter()
+    seen, added = ingest(args.root, args.db, args.workers)
+    print(f"{seen} new or changed files, {added} conversations added in {time.perf_counter() - started:.1f}s")
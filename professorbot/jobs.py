@@ -0,0 +1,97 @@
+"""Completions as background jobs that outlive the script run that started them.
+
+A job is keyed by (session, user turn). Submitting the same key again returns
+the existing job, so a double submit or a rerun never pays for a second
+completion, and a session that reconnects after a refresh reattaches to the job
+that is still running or already finished. Finished jobs are kept for
+PROFESSORBOT_JOB_TTL seconds (default 15 minutes) or until they are consumed.
+
+Each job carries a ``cancel.Token`` with a deadline and the sessions waiting
+on it, so a turn nobody is waiting for any more stops early (see
+``professorbot.cancel``).
+
+Jobs live in this process; across several workers the session store's
+``pending`` field tells the next worker that a reply is owed.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from professorbot import config
+from professorbot.cancel import Token, run as run_with_token
+from professorbot.students import current_session_id
+
+MAX_WORKERS = config.get_int("PROFESSORBOT_JOB_WORKERS", 32)
+JOB_TTL = config.get_float("PROFESSORBOT_JOB_TTL", 900)
+
+
+class Jobs:
+    def __init__(self, max_workers=MAX_WORKERS, ttl=JOB_TTL):
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="professorbot-job")
+        self._lock = threading.Lock()
+        self._jobs = {}  # key -> (future, submitted at)
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Start ``fn`` for ``key`` unless a job for it already exists; return its future."""
+        with self._lock:
+            self._expire()
+            entry = self._jobs.get(key)
+            if entry and not (entry[0].done() and (entry[0].cancelled() or entry[0].exception())):
+                entry[0].token.listen(current_session_id())
+                return entry[0]  # failed and cancelled jobs are retried, everything else is coalesced
+            token = Token()
+            token.listen(current_session_id())
+            future = self._pool.submit(run_with_token, token, fn, *args, **kwargs)
+            future.key = key
+            future.token = token
+            self._jobs[key] = (future, time.monotonic())
+            return future
+
+    def get(self, key):
+        with self._lock:
+            entry = self._jobs.get(key)
+        return entry[0] if entry else None
+
+    def adopt(self, key, future):
+        """Serve ``key`` from an existing job (e.g. a speculative one) instead of starting a new one."""
+        with self._lock:
+            self._jobs.pop(getattr(future, "key", None), None)
+            future.key = key
+            self._jobs[key] = (future, time.monotonic())
+
+    def cancel(self, key, reason="requested"):
+        """Stop the job for ``key``: drop it if still queued, otherwise end its request early."""
+        with self._lock:
+            entry = self._jobs.pop(key, None)
+        if entry:
+            entry[0].token.cancel(reason)
+            entry[0].cancel()
+
+    def forget(self, future):
+        """Drop a finished job once its result has been stored."""
+        with self._lock:
+            self._jobs.pop(future.key, None)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        stale = [k for k, (f, t) in self._jobs.items() if f.done() and t < cutoff]
+        for k in stale:
+            del self._jobs[k]
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def running(self):
+        with self._lock:
+            return sum(1 for f, _ in self._jobs.values() if not f.done())
+
+
+_jobs = Jobs()
+submit, get, adopt, cancel, forget, running = (
+    _jobs.submit, _jobs.get, _jobs.adopt, _jobs.cancel, _jobs.forget, _jobs.running)
+
+
+def session_key(session_state):
+    """Stable id for job keys: the shared-store sid when there is one (the ASGI frontend's own id otherwise)."""
+    return session_state.get("store_sid") or session_state.get("session_id") or current_session_id()
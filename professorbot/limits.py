@@ -0,0 +1,70 @@
+"""Per-turn size limits for student input.
+
+The whole history is resent every turn, so one pasted article makes every later
+request slower and more expensive. Each user turn is bounded by a character
+limit and an estimated-token limit:
+
+    PROFESSORBOT_INPUT_MAX_CHARS    default 4000
+    PROFESSORBOT_INPUT_MAX_TOKENS   default 1000
+    PROFESSORBOT_INPUT_LIMITS       per-module overrides, JSON like
+                                    {"Machine I": {"chars": 6000, "tokens": 1500}}
+    PROFESSORBOT_INPUT_MODE         "truncate" (default) or "reject"
+
+In truncate mode the model only sees a clipped version while the full text stays
+in the session log and the downloaded transcript. In reject mode the message is
+not sent and the student is asked to shorten it.
+"""
+import json
+import math
+from collections import namedtuple
+
+from professorbot import config
+
+MAX_CHARS = config.get_int("PROFESSORBOT_INPUT_MAX_CHARS", 4000)
+MAX_TOKENS = config.get_int("PROFESSORBOT_INPUT_MAX_TOKENS", 1000)
+MODULE_LIMITS = json.loads(config.get("PROFESSORBOT_INPUT_LIMITS", "{}"))
+MODE = config.get("PROFESSORBOT_INPUT_MODE", "truncate")
+
+CHARS_PER_TOKEN = 4  # rough average for English prose
+
+Bounded = namedtuple("Bounded", "prompt note rejected")
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def limits_for(module):
+    override = MODULE_LIMITS.get(module, {})
+    return override.get("chars", MAX_CHARS), override.get("tokens", MAX_TOKENS)
+
+
+def max_chars(module):
+    """Client-side ``st.chat_input`` limit; only enforced in reject mode."""
+    return limits_for(module)[0] if MODE == "reject" else None
+
+
+def check(text, module):
+    """Bound one user turn.
+
+    ``prompt`` is the text to send to the model, or None when it is the same as
+    ``text``. ``note`` is feedback for the student, or None.
+    """
+    chars, tokens = limits_for(module)
+    budget = min(chars, tokens * CHARS_PER_TOKEN)
+    if len(text) <= budget:
+        return Bounded(None, None, False)
+    if MODE == "reject":
+        return Bounded(None, (
+            f"⚠️ Your message is too long ({len(text):,} characters, about {estimate_tokens(text):,} tokens). "
+            f"Please shorten it to under {budget:,} characters and send it again."
+        ), True)
+    return Bounded(clip(text, budget), (
+        f"Your message was long, so ProfessorBot only read the first {budget:,} characters. "
+        "The full text is kept in your transcript."
+    ), False)
+
+
+def clip(text, budget):
+    omitted = len(text) - budget
+    return f"{text[:budget].rstrip()}\n\n[… {omitted:,} characters omitted …]"
@@ -0,0 +1,208 @@
+"""Completion call shared by every module page."""
+import time
+from functools import lru_cache
+
+import openai
+from openai import OpenAI
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion
+
+from professorbot import backends, cancel, cassette, limits, metrics, quota, stateful
+from professorbot.students import current_session_id
+
+MODEL = "gpt-4.1"
+TEMPERATURE = 0.4
+SPECULATIVE = "{} (speculative)"  # metrics bucket for speculative completions of a module
+
+
+# errors that say the key is unavailable (rejected, out of quota, rate limited): try the backend's next key
+_KEY_ERRORS = (openai.AuthenticationError, openai.PermissionDeniedError, openai.RateLimitError)
+# errors that say the backend is unavailable, rather than that the request was bad
+_FAILOVER = (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError) + _KEY_ERRORS
+
+
+@lru_cache(maxsize=64)
+def client(api_key, base_url=None, organization=None, project=None, on_response=None,
+           max_retries=openai.DEFAULT_MAX_RETRIES):
+    """One client per key and endpoint, so pooled connections are reused across turns and sessions.
+
+    ``on_response`` is called with every HTTP response (``backends.Key.observe`` reads its rate-limit headers).
+    """
+    http_client = openai.DefaultHttpxClient(event_hooks={"response": [on_response]}) if on_response else None
+    return OpenAI(api_key=api_key, base_url=base_url, organization=organization, project=project,
+                  max_retries=max_retries, http_client=http_client)
+
+
+class Unanswered(str):
+    """A notice shown to the student in place of a reply; never stored as an assistant message.
+
+    ``retry`` says whether sending the message again may get it answered.
+    """
+
+    def __new__(cls, text, retry=True):
+        notice = super().__new__(cls, text)
+        notice.retry = retry
+        return notice
+
+
+TIMED_OUT = Unanswered("⚠️ ProfessorBot took too long to answer. Please send your message again.")
+
+
+def call_llm(chat_messages, module=None, student=None, session=None):
+    """The reply text, ``TIMED_OUT`` when the turn's deadline passed, or the quota notice when a cap is reached."""
+    try:
+        return complete(chat_messages, module, student, session)[0]
+    except cancel.Cancelled as exc:
+        if exc.reason == "deadline":
+            return TIMED_OUT
+        raise
+
+
+def complete(chat_messages, module=None, student=None, session=None, speculative=False):
+    """Like ``call_llm`` but returns ``(text, usage)``; usage is None when no completion was made, and
+    the text is an ``Unanswered`` notice when the student has reached a quota cap.
+
+    Inside a job the completion is streamed and raises ``cancel.Cancelled`` when the job's token is
+    cancelled; the tokens spent up to then are still counted.
+
+    A ``speculative`` completion is charged to nobody and counted in the module's ``SPECULATIVE``
+    metrics bucket. It returns ``(text, usage, adopt)``: ``adopt(student)`` charges it to the student
+    and records it as the module's turn once it is used as a reply.
+    """
+    tried = backends.candidates(module)
+    if tried[0].metered and not speculative:
+        status, note = quota.check(student, module)
+        if status == quota.BLOCK:
+            return Unanswered(note, retry=False), None
+
+    player = cassette.player()
+    if player is not None:
+        started = time.perf_counter()
+        resp = _replay(player, tried, chat_messages)
+        return _account(resp, module, student, speculative, time.perf_counter() - started, None, "cassette", True)
+
+    token = cancel.current()
+    ttft = None
+    chained = stateful.ENABLED and session is not None and hasattr(chat_messages, "parts")
+    cost = _prompt_tokens(chat_messages) + backends.COMPLETION_ESTIMATE
+    prefer = (lambda key: stateful.holds((session, key.name))) if chained else None
+    for backend, key in backends.attempts(tried, cost, prefer):
+        if not key.api_key:
+            return "⚠️ Missing OPENAI_API_KEY. Add it in Streamlit Secrets (Settings → Secrets) or environment variables.", None
+        api = key.client()
+        model = _model(backend)
+        key.acquire(cost)
+        started = time.perf_counter()
+        try:
+            if chained:
+                if token is not None:  # not streamed: only the deadline applies, as the HTTP timeout
+                    api = api.with_options(max_retries=0, timeout=token.remaining())
+                resp = stateful.create(api, model, TEMPERATURE, chat_messages, (session, key.name), module)
+            elif token is not None:
+                resp, ttft = _stream(api, model, chat_messages, token)
+            else:
+                resp = api.chat.completions.create(
+                    model=model,
+                    messages=chat_messages,
+                    temperature=TEMPERATURE,
+                )
+        except cancel.Cancelled as exc:
+            key.release(cost, exc.usage)
+            cancel.record(module, exc.reason, exc.usage.prompt_tokens, exc.usage.completion_tokens)
+            if backend.metered and not speculative:
+                quota.record(student, module, exc.usage)
+            raise
+        except _FAILOVER as exc:
+            if token is not None and token.reason() is not None:  # timed out at the deadline
+                key.release(cost)
+                cancel.record(module, token.reason(), _prompt_tokens(chat_messages), 0)
+                raise cancel.Cancelled(token.reason()) from exc
+            key.release(cost, error=exc)
+            if not isinstance(exc, _KEY_ERRORS):
+                backend.mark(exc)
+            error = exc
+            continue
+        except BaseException:
+            key.release(cost)
+            raise
+        key.release(cost, resp.usage)
+        backend.mark()
+        break
+    else:
+        raise error
+    elapsed = time.perf_counter() - started
+    recorder = cassette.recorder()
+    if recorder is not None:
+        recorder.record(module, session or current_session_id(), model, TEMPERATURE, chat_messages, resp, elapsed)
+    return _account(resp, module, student, speculative, elapsed, ttft, backend.name, backend.metered)
+
+
+def _account(resp, module, student, speculative, elapsed, ttft, backend, metered):
+    """Record the turn in the metrics and charge it to ``student``; deferred to ``adopt`` when speculative."""
+    def adopt(student):
+        metrics.record_turn(module, elapsed, resp.usage, ttft, backend=backend)
+        if metered:
+            quota.record(student, module, resp.usage)
+
+    text = resp.choices[0].message.content
+    if not speculative:
+        adopt(student)
+        return text, resp.usage
+    metrics.record_turn(SPECULATIVE.format(module), elapsed, resp.usage, ttft, backend=backend)
+    return text, resp.usage, adopt
+
+
+def _model(backend):
+    return backend.model or MODEL
+
+
+def _replay(player, tried, chat_messages):
+    """The recorded response, keyed by the model of whichever candidate backend served it when recording."""
+    for backend in tried:
+        try:
+            return player.replay(_model(backend), TEMPERATURE, chat_messages)
+        except cassette.CassetteMiss as exc:
+            miss = exc
+    raise miss
+
+
+def _prompt_tokens(chat_messages):
+    return sum(limits.estimate_tokens(m["content"]) for m in chat_messages)
+
+
+def _stream(api, model, chat_messages, token):
+    """Streamed completion that stops reading as soon as ``token`` is cancelled; returns ``(resp, ttft)``."""
+    started = time.perf_counter()
+    ttft, parts, usage, reason, chunk = None, [], None, None, None
+    stream = api.with_options(max_retries=0).chat.completions.create(
+        model=model,
+        messages=chat_messages,
+        temperature=TEMPERATURE,
+        stream=True,
+        stream_options={"include_usage": True},
+        timeout=token.remaining(),
+    )
+    with stream:  # leaving the block closes the connection, which stops generation upstream
+        for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                parts.append(chunk.choices[0].delta.content)
+                token.emit(parts[-1])
+            reason = token.reason()
+            if reason is not None:
+                break
+    text = "".join(parts)
+    if reason is not None:
+        exc = cancel.Cancelled(reason)
+        prompt, completion = _prompt_tokens(chat_messages), limits.estimate_tokens(text)
+        exc.usage = CompletionUsage(prompt_tokens=prompt, completion_tokens=completion, total_tokens=prompt + completion)
+        raise exc
+    return ChatCompletion.model_validate({
+        "id": getattr(chunk, "id", ""), "object": "chat.completion", "created": getattr(chunk, "created", 0),
+        "model": getattr(chunk, "model", model),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+        "usage": usage and usage.model_dump(),
+    }), ttft
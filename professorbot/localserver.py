@@ -0,0 +1,343 @@
+"""OpenAI-compatible chat server that runs on a CPU, for practice mode and tests.
+
+Serves ``/v1/chat/completions`` (plain and ``stream=true``), stateful
+``/v1/responses`` (chained with ``previous_response_id``; stored responses
+expire after PROFESSORBOT_LOCAL_RESPONSE_TTL seconds, default 3600),
+``/v1/models`` and ``/health`` with one of two engines:
+
+- ``script`` (default) needs no model. It walks the numbered procedure found
+  in the request's system messages, one step per turn, and gives the exact
+  approval message once it reaches the stop step, when the control message
+  says the conversation must end, or when ``professorbot.closing`` says the
+  criteria are met. Conversations therefore follow the same shape as with the
+  hosted model, which makes it a stand-in for the page tests and an unlimited
+  practice mode.
+- a local GGUF model through llama-cpp-python, when PROFESSORBOT_LOCAL_GGUF
+  points at a model file (``pip install llama-cpp-python``).
+
+Point a backend at it (see ``professorbot.backends``):
+
+    python -m professorbot.localserver --port 8800
+    PROFESSORBOT_BACKENDS='{"backends": {"practice": {"base_url": "http://127.0.0.1:8800/v1",
+        "api_key": "local", "metered": false}}}'
+
+With ``--rpm``/``--tpm``/``--quota``/``--api-key`` it stands in for one key of
+a pool: it answers with the hosted API's ``x-ratelimit-*`` headers, returns
+429 once a minute's requests or tokens run out (or ``insufficient_quota``
+once ``--quota`` tokens are spent) and 401 for any other key.
+"""
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from professorbot import config, limits, procedure
+
+GGUF_PATH = config.get("PROFESSORBOT_LOCAL_GGUF")
+RESPONSE_TTL = config.get_float("PROFESSORBOT_LOCAL_RESPONSE_TTL", 3600.0)
+TOKEN_DELAY = config.get_float("PROFESSORBOT_LOCAL_TOKEN_DELAY", 0.0)  # seconds per streamed word
+MODEL_NAME = "professorbot-local"
+APPROVAL = "You are approved to download transcript and submit to canvas."
+
+STREAMS = {"started": 0, "finished": 0, "aborted": 0, "words_sent": 0, "words_unsent": 0}
+
+_TURN = re.compile(r"User turn count so far: (\d+)\. If >= (\d+), you must end now")
+
+
+# ---------- engines ----------
+def script_reply(messages):
+    """Next procedure step, or the approval message once the procedure is done."""
+    steps = next((s for m in messages if m["role"] == "system" for s in [procedure.steps(m["content"])] if len(s) > 2), [])
+    control = next((m["content"] for m in reversed(messages)
+                    if m["role"] == "system" and m["content"].startswith("User turn count so far:")), "")
+    turn = _TURN.search(control)
+    if (turn and int(turn.group(1)) >= int(turn.group(2))) or "Completion check:" in control:
+        return f"{APPROVAL} Thanks for the thoughtful conversation (practice mode)."
+    stop = next((i for i, (_, text) in enumerate(steps) if text.lower().startswith("stop")), len(steps))
+    done = sum(1 for m in messages if m["role"] == "assistant")
+    if done >= stop:
+        return f"{APPROVAL} Thanks for the thoughtful conversation (practice mode)."
+    number, text = steps[done]
+    return f"(Practice mode, step {number}) {text}"
+
+
+class GGUFEngine:
+    def __init__(self, path):
+        from llama_cpp import Llama
+
+        self._llm = Llama(model_path=path, n_ctx=16384, verbose=False)
+        self._lock = threading.Lock()  # one generation at a time on the CPU
+
+    def __call__(self, messages, temperature):
+        with self._lock:
+            out = self._llm.create_chat_completion(messages=messages, temperature=temperature)
+        return out["choices"][0]["message"]["content"]
+
+
+_engine = None
+
+
+def generate(messages, temperature=0.4):
+    global _engine
+    if GGUF_PATH:
+        if _engine is None:
+            _engine = GGUFEngine(GGUF_PATH)
+        return _engine(messages, temperature)
+    return script_reply(messages)
+
+
+# ---------- stored responses ----------
+_responses = {}  # response id -> (stored at, conversation including the reply)
+_responses_lock = threading.Lock()
+
+
+def _conversation(previous_id):
+    """Stored messages of ``previous_id``; None when unknown or expired."""
+    now = time.time()
+    with _responses_lock:
+        for rid in [r for r, (at, _) in _responses.items() if now - at > RESPONSE_TTL]:
+            del _responses[rid]
+        found = _responses.get(previous_id)
+    return None if found is None else found[1]
+
+
+# ---------- rate limits ----------
+class Limits:
+    """Requests and tokens per minute as token buckets, a total token quota and an accepted key."""
+
+    def __init__(self, rpm=None, tpm=None, quota=None, api_key=None):
+        self.rpm, self.tpm, self.quota, self.api_key = rpm, tpm, quota, api_key
+        self.requests, self.tokens = float(rpm or 0), float(tpm or 0)
+        self.at = time.time()
+        self.spent = 0
+        self.stats = {"requests": 0, "limited": 0, "rejected": 0, "exhausted": 0}
+        self._lock = threading.Lock()
+
+    def _fill(self):
+        now = time.time()
+        if self.rpm:
+            self.requests = min(self.rpm, self.requests + (now - self.at) * self.rpm / 60.0)
+        if self.tpm:
+            self.tokens = min(self.tpm, self.tokens + (now - self.at) * self.tpm / 60.0)
+        self.at = now
+
+    def authorized(self, authorization):
+        return self.api_key is None or authorization == f"Bearer {self.api_key}"
+
+    def admit(self, authorization, prompt_tokens):
+        """None when the request may go ahead, else ``(status, error, retry after seconds)``."""
+        with self._lock:
+            self._fill()
+            self.stats["requests"] += 1
+            if not self.authorized(authorization):
+                self.stats["rejected"] += 1
+                return 401, {"message": "Incorrect API key provided.", "type": "invalid_request_error",
+                             "code": "invalid_api_key"}, None
+            if self.quota is not None and self.spent >= self.quota:
+                self.stats["exhausted"] += 1
+                return 429, {"message": "You exceeded your current quota.", "type": "insufficient_quota",
+                             "code": "insufficient_quota"}, None
+            short = ("requests" if self.rpm and self.requests < 1 else
+                     "tokens" if self.tpm and self.tokens < prompt_tokens else None)
+            if short:
+                self.stats["limited"] += 1
+                rate, level, need = (self.rpm, self.requests, 1) if short == "requests" else (self.tpm, self.tokens,
+                                                                                               prompt_tokens)
+                return 429, {"message": f"Rate limit reached for {short} per minute.", "type": short,
+                             "code": "rate_limit_exceeded"}, (need - level) * 60.0 / rate
+            self.requests -= 1
+            self.tokens -= prompt_tokens
+            self.spent += prompt_tokens
+
+    def spend(self, completion_tokens):
+        with self._lock:
+            self.tokens -= completion_tokens
+            self.spent += completion_tokens
+
+    def headers(self):
+        with self._lock:
+            self._fill()
+            for name, limit, level in (("requests", self.rpm, self.requests), ("tokens", self.tpm, self.tokens)):
+                if limit:
+                    yield f"x-ratelimit-limit-{name}", str(limit)
+                    yield f"x-ratelimit-remaining-{name}", str(max(0, int(level)))
+                    yield f"x-ratelimit-reset-{name}", f"{(limit - max(level, 0)) * 60.0 / limit:.3f}s"
+
+
+def _usage(messages, text):
+    usage = {"prompt_tokens": sum(limits.estimate_tokens(m.get("content") or "") for m in messages),
+             "completion_tokens": limits.estimate_tokens(text)}
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    return usage
+
+
+# ---------- HTTP ----------
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def end_headers(self):
+        gate = getattr(self.server, "limits", None)
+        if gate is not None:
+            for name, value in gate.headers():
+                self.send_header(name, value)
+        super().end_headers()
+
+    def _admit(self, messages):
+        """False after answering a request the server's limits refuse."""
+        gate = getattr(self.server, "limits", None)
+        if gate is None:
+            return True
+        refused = gate.admit(self.headers.get("Authorization"), _usage(messages, "")["prompt_tokens"])
+        if refused is None:
+            return True
+        status, error, retry = refused
+        body = json.dumps({"error": {**error, "param": None}}).encode("utf-8")
+        self.send_response(status)
+        if retry is not None:
+            self.send_header("retry-after", f"{retry:.3f}")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return False
+
+    def _spend(self, usage):
+        gate = getattr(self.server, "limits", None)
+        if gate is not None:
+            gate.spend(usage["completion_tokens"])
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def do_GET(self):
+        gate = getattr(self.server, "limits", None)
+        if gate is not None and not gate.authorized(self.headers.get("Authorization")):
+            self._send(401, {"error": {"message": "Incorrect API key provided.", "type": "invalid_request_error",
+                                       "code": "invalid_api_key", "param": None}})
+        elif self.path == "/health":
+            self._send(200, {"status": "ok"})
+        elif self.path.rstrip("/").endswith("/models"):
+            self._send(200, {"object": "list", "data": [{"id": MODEL_NAME, "object": "model", "owned_by": "local"}]})
+        elif "/models/" in self.path:
+            self._send(200, {"id": self.path.rsplit("/", 1)[-1], "object": "model", "owned_by": "local"})
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.rstrip("/").endswith("/responses"):
+            return self._respond(request)
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send(404, {"error": {"message": "not found"}})
+        messages = request.get("messages", [])
+        if not self._admit(messages):
+            return
+        text = generate(messages, request.get("temperature", 0.4))
+        usage = _usage(messages, text)
+        self._spend(usage)
+        head = {"id": f"chatcmpl-{uuid.uuid4().hex[:24]}", "created": int(time.time()),
+                "model": request.get("model", MODEL_NAME)}
+        if not request.get("stream"):
+            return self._send(200, {**head, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}]})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = re.findall(r"\S+\s*", text) or [""]
+        STREAMS["started"] += 1
+        try:
+            for i, piece in enumerate(pieces):
+                time.sleep(TOKEN_DELAY)
+                delta = {"content": piece, **({"role": "assistant"} if i == 0 else {})}
+                chunk = {**head, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                self._chunk(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+                self.wfile.flush()
+                STREAMS["words_sent"] += 1
+            final = {**head, "object": "chat.completion.chunk", "usage": usage,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            self._chunk(b"data: " + json.dumps(final).encode("utf-8") + b"\n\n")
+            self._chunk(b"data: [DONE]\n\n")
+            self._chunk(b"")
+            STREAMS["finished"] += 1
+        except (BrokenPipeError, ConnectionResetError):  # the client hung up: stop generating
+            STREAMS["aborted"] += 1
+            STREAMS["words_unsent"] += len(pieces) - i
+            self.close_connection = True
+
+    def _respond(self, request):
+        items = request.get("input", [])
+        if isinstance(items, str):
+            items = [{"role": "user", "content": items}]
+        previous = request.get("previous_response_id")
+        history = _conversation(previous) if previous else []
+        if history is None:
+            return self._send(400, {"error": {
+                "message": f"Previous response with id '{previous}' not found.", "type": "invalid_request_error",
+                "param": "previous_response_id", "code": "previous_response_not_found"}})
+        messages = history + [{"role": m["role"], "content": m["content"]} for m in items]
+        # instructions lead the context of this response only; they are not stored with it
+        instructions = [{"role": "system", "content": request["instructions"]}] if request.get("instructions") else []
+        if not self._admit(instructions + messages):
+            return
+        text = generate(instructions + messages, request.get("temperature", 0.4))
+        rid = f"resp_{uuid.uuid4().hex}"
+        if request.get("store", True):
+            with _responses_lock:
+                _responses[rid] = (time.time(), messages + [{"role": "assistant", "content": text}])
+        usage = _usage(instructions + messages, text)
+        self._spend(usage)
+        self._send(200, {
+            "id": rid, "object": "response", "created_at": time.time(), "status": "completed",
+            "model": request.get("model", MODEL_NAME), "previous_response_id": previous,
+            "output": [{"type": "message", "id": f"msg_{uuid.uuid4().hex}", "status": "completed",
+                        "role": "assistant", "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+            "usage": {"input_tokens": usage["prompt_tokens"], "output_tokens": usage["completion_tokens"],
+                      "total_tokens": usage["total_tokens"], "input_tokens_details": {"cached_tokens": 0},
+                      "output_tokens_details": {"reasoning_tokens": 0}},
+            "parallel_tool_calls": False, "tool_choice": "none", "tools": [],
+        })
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=8800, limits=None):
+    """Start the server on a daemon thread; returns it (``server.server_port`` is the bound port).
+
+    ``limits`` (a ``Limits``) makes it behave like one rate-limited API key.
+    """
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.limits = limits
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Local OpenAI-compatible chat server for practice mode.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8800)
+    ap.add_argument("--rpm", type=int, help="requests per minute before 429")
+    ap.add_argument("--tpm", type=int, help="tokens per minute before 429")
+    ap.add_argument("--quota", type=int, help="total tokens before insufficient_quota")
+    ap.add_argument("--api-key", help="the only key accepted (others get 401)")
+    args = ap.parse_args()
+    print(f"serving {'GGUF ' + GGUF_PATH if GGUF_PATH else 'scripted procedure'} on http://{args.host}:{args.port}/v1")
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    if any(v is not None for v in (args.rpm, args.tpm, args.quota, args.api_key)):
+        server.limits = Limits(args.rpm, args.tpm, args.quota, args.api_key)
+    server.serve_forever()
@@ -0,0 +1,125 @@
+"""Per-turn latency, token and spend metrics in preallocated NumPy ring buffers.
+
+``record_turn`` is called by ``llm.complete`` for every completion and writes
+one row into fixed-size column arrays, so memory stays flat however long the
+server runs (PROFESSORBOT_METRICS_CAPACITY rows, default 1,000,000, about
+30 MB). Summaries are computed with vectorized masks and a single sort per
+refresh, which keeps the dashboard fast with millions of rows.
+
+Rows are tagged with the module and the completion backend that served them
+(``professorbot.backends``); summaries group by either.
+
+Spend uses PROFESSORBOT_PRICE_PER_MTOK, a JSON object with USD per million
+prompt and completion tokens (default gpt-4.1 list prices).
+"""
+import json
+import threading
+import time
+
+import numpy as np
+
+from professorbot import config
+
+CAPACITY = config.get_int("PROFESSORBOT_METRICS_CAPACITY", 1_000_000)
+PRICES = json.loads(config.get("PROFESSORBOT_PRICE_PER_MTOK", '{"prompt": 2.0, "completion": 8.0}'))
+
+
+class TurnBuffer:
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, np.float64)
+        self.module = np.zeros(capacity, np.int16)
+        self.backend = np.zeros(capacity, np.int16)
+        self.latency = np.zeros(capacity, np.float32)
+        self.ttft = np.zeros(capacity, np.float32)
+        self.prompt_tokens = np.zeros(capacity, np.int32)
+        self.completion_tokens = np.zeros(capacity, np.int32)
+        self.modules = []  # index -> module name
+        self.backends = []  # index -> backend name
+        self._index = {}
+        self._backend_index = {}
+        self._next = 0  # total rows ever written
+        self._lock = threading.Lock()
+
+    def record(self, module, latency, ttft=None, prompt_tokens=0, completion_tokens=0, ts=None, backend="default"):
+        with self._lock:
+            m = self._index.get(module)
+            if m is None:
+                m = self._index[module] = len(self.modules)
+                self.modules.append(module)
+            b = self._backend_index.get(backend)
+            if b is None:
+                b = self._backend_index[backend] = len(self.backends)
+                self.backends.append(backend)
+            i = self._next % self.capacity
+            self.ts[i] = time.time() if ts is None else ts
+            self.module[i] = m
+            self.backend[i] = b
+            self.latency[i] = latency
+            self.ttft[i] = latency if ttft is None else ttft
+            self.prompt_tokens[i] = prompt_tokens
+            self.completion_tokens[i] = completion_tokens
+            self._next += 1
+
+    def __len__(self):
+        return min(self._next, self.capacity)
+
+    def summary(self, window=None, percentiles=(50, 90, 99), by="module"):
+        """Per-module (or per-backend) stats over the last ``window`` seconds (all retained rows when None)."""
+        with self._lock:  # a consistent copy: rows keep arriving while the summary is computed
+            n = len(self)
+            ts = self.ts[:n].copy()
+            names = list(self.modules if by == "module" else self.backends)
+            module = (self.module if by == "module" else self.backend)[:n].copy()
+            latency, ttft = self.latency[:n].copy(), self.ttft[:n].copy()
+            prompt, completion = self.prompt_tokens[:n].copy(), self.completion_tokens[:n].copy()
+        if window:
+            mask = ts >= time.time() - window
+            module, latency, ttft = module[mask], latency[mask], ttft[mask]
+            prompt, completion = prompt[mask], completion[mask]
+        if not module.size:
+            return {}
+
+        counts = np.bincount(module, minlength=len(names))
+        prompt_sum = np.bincount(module, prompt, minlength=len(names))
+        completion_sum = np.bincount(module, completion, minlength=len(names))
+        spend = (prompt_sum * PRICES["prompt"] + completion_sum * PRICES["completion"]) / 1e6
+
+        # one sort of (module, value) packed into a float64 key gives every module's
+        # order statistics at once; values are seconds, far below the 1e6 stride
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        q = np.asarray(percentiles) / 100.0
+        idx = starts[:, None] + np.floor(q[None, :] * np.maximum(counts - 1, 0)[:, None]).astype(np.int64)
+        idx = np.minimum(idx, module.size - 1)
+
+        def grouped_percentiles(values):
+            ordered = np.sort(module * 1e6 + values.astype(np.float64))
+            return ordered[idx] - np.arange(len(names))[:, None] * 1e6
+
+        lat_p, ttft_p = grouped_percentiles(latency), grouped_percentiles(ttft)
+        out = {}
+        for m, name in enumerate(names):
+            if counts[m]:
+                out[name] = {
+                    "turns": int(counts[m]),
+                    **{f"latency_p{p}": float(lat_p[m, j]) for j, p in enumerate(percentiles)},
+                    **{f"ttft_p{p}": float(ttft_p[m, j]) for j, p in enumerate(percentiles)},
+                    "tokens_per_turn": float((prompt_sum[m] + completion_sum[m]) / counts[m]),
+                    "spend_usd": float(spend[m]),
+                }
+        return out
+
+    def rate(self, window=60.0):
+        """Turns per minute over the last ``window`` seconds."""
+        with self._lock:
+            recent = np.count_nonzero(self.ts[:len(self)] >= time.time() - window)
+        return float(recent) * 60.0 / window
+
+
+turns = TurnBuffer()
+
+
+def record_turn(module, latency, usage, ttft=None, backend="default"):
+    turns.record(module or "unknown", latency, ttft,
+                 getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0,
+                 backend=backend)
@@ -0,0 +1,184 @@
+"""Local off-topic filter that answers clear misuse before the model is called.
+
+A message is scored by a few conservative regex rules (requests for code,
+essays, translations, prompt injection ... phrased as requests) and, when a
+trained model file is present, by a logistic regression over hashed word and
+bigram features. Scoring is pure Python and takes well under a millisecond.
+Messages scoring at or above the module's threshold get a canned refusal
+instead of a completion; the refused message does not count as a turn.
+
+Thresholds: PROFESSORBOT_PREFILTER_THRESHOLD (default 0.9), overridden per module
+with PROFESSORBOT_PREFILTER_THRESHOLDS, a JSON object like {"Machine I": 0.97}.
+Set the threshold above 1 to disable the filter. A rule match scores
+PROFESSORBOT_PREFILTER_RULE_SCORE (default 1.0), so a module whose threshold
+is above that score is filtered by the model alone.
+
+Every refusal is appended to PROFESSORBOT_PREFILTER_LOG. When a student says a
+refusal was wrong, the false positive is logged too, so thresholds can be tuned
+from real rates (``python -m professorbot.prefilter stats``).
+
+Train a model from labeled student messages, one JSON object per line with
+``text`` and ``label`` (1 = off-topic, 0 = on-topic):
+
+    python -m professorbot.prefilter train labeled.jsonl --out prefilter_model.json
+"""
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter, namedtuple
+
+from professorbot import config
+
+MODEL_PATH = config.get("PROFESSORBOT_PREFILTER_MODEL", "prefilter_model.json")
+LOG_PATH = config.get("PROFESSORBOT_PREFILTER_LOG", "prefilter_log.jsonl")
+DEFAULT_THRESHOLD = config.get_float("PROFESSORBOT_PREFILTER_THRESHOLD", 0.9)
+RULE_SCORE = config.get_float("PROFESSORBOT_PREFILTER_RULE_SCORE", 1.0)
+THRESHOLDS = json.loads(config.get("PROFESSORBOT_PREFILTER_THRESHOLDS", "{}"))
+
+MIN_WORDS = 4  # "Next", "Choose A", "yes" and Penn IDs are never filtered
+N_BUCKETS = 1 << 18
+
+REFUSAL = (
+    "That’s outside what we’re discussing here, so I can’t help with it. "
+    "Let’s get back to our conversation — could you respond to my last question?"
+)
+
+# Rules only fire on a request: the verb opens a sentence or follows "can you",
+# "please", "help me" ..., so course answers that merely use the verb
+# ("firms translate your clicks to prices") are left to the model.
+_ASK = r"(?:^|[.!?:;]\s+|\b(?:can|could|would|will)\s+you\s+(?:please\s+)?|\bplease\s+|\bhelp\s+me\s+|\bi\s+(?:need|want)\s+you\s+to\s+)(?:(?:now|also|just|then)\s+)?"
+_RULES = re.compile(
+    _ASK + "(?:" + "|".join([
+        r"(?:write|generate|fix|debug|refactor)\s+(?:me\s+)?(?:a|an|the|my|this|some)\s+(?:[\w-]+\s+){0,2}?(?:code|function|script|program|sql|regex|class)\b",
+        r"(?:write|draft)\s+(?:me\s+)?(?:a|an|my|this|the)\s+(?:[\w-]+\s+){0,2}?(?:essay|cover letter|poem|story|email|resume|speech)\b",
+        r"translate\s+(?:this|that|it|the following|these|my)\b.{0,60}\b(?:into|to)\s+\w+",
+        r"(?:solve|do|finish)\s+(?:my|this)\s+(?:[\w-]+\s+)?(?:homework|problem set|pset|assignment|exam)\s+for\s+me\b",
+        r"(?:ignore|disregard|forget)\s+(?:all\s+(?:of\s+)?)?(?:your\s+(?:[\w-]+\s+)?|(?:the\s+)?(?:previous|prior|above|earlier)\s+)(?:instructions|prompt|rules)\b",
+        r"(?:give\s+me\s+)?(?:a\s+recipe\s+for|how\s+do\s+i\s+cook|stock\s+tips|which\s+stocks?\s+should\s+i\s+buy)\b",
+    ]) + ")",
+    re.IGNORECASE | re.DOTALL,
+)
+_WORD = re.compile(r"[a-z0-9']+")
+
+Verdict = namedtuple("Verdict", "blocked score reason")
+
+
+def features(text):
+    """Hashed unigram and bigram bucket ids."""
+    words = _WORD.findall(text.lower())
+    grams = words + [a + " " + b for a, b in zip(words, words[1:])]
+    return [zlib.crc32(g.encode()) % N_BUCKETS for g in grams]
+
+
+class HashedLogReg:
+    def __init__(self, weights=None, bias=0.0):
+        self.weights = weights or {}
+        self.bias = bias
+
+    def score(self, text):
+        z = self.bias + sum(self.weights.get(f, 0.0) for f in features(text))
+        return 1.0 / (1.0 + math.exp(-max(min(z, 30.0), -30.0)))
+
+    @classmethod
+    def train(cls, examples, epochs=8, lr=0.2, l2=1e-5, seed=0):
+        """Plain SGD over ``(text, label)`` pairs."""
+        model = cls()
+        data = [(features(t), y) for t, y in examples]
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(data)
+            for feats, y in data:
+                z = model.bias + sum(model.weights.get(f, 0.0) for f in feats)
+                g = 1.0 / (1.0 + math.exp(-max(min(z, 30.0), -30.0))) - y
+                model.bias -= lr * g
+                for f in feats:
+                    w = model.weights.get(f, 0.0)
+                    model.weights[f] = w - lr * (g + l2 * w)
+        return model
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"bias": self.bias, "weights": {str(k): round(v, 5) for k, v in self.weights.items() if v}}, fh)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as fh:
+            raw = json.load(fh)
+        return cls({int(k): v for k, v in raw["weights"].items()}, raw["bias"])
+
+
+_model = HashedLogReg.load(MODEL_PATH) if os.path.exists(MODEL_PATH) else None
+_log_lock = threading.Lock()
+
+
+def threshold(module):
+    return float(THRESHOLDS.get(module, DEFAULT_THRESHOLD))
+
+
+def check(text, module):
+    """Score one student message; ``blocked`` is True when it should get REFUSAL."""
+    limit = threshold(module)
+    if limit > 1.0 or len(text.split()) < MIN_WORDS:
+        return Verdict(False, 0.0, None)
+    if _RULES.search(text):
+        score, reason = RULE_SCORE, "rule"
+    elif _model is not None:
+        score, reason = _model.score(text), "model"
+    else:
+        return Verdict(False, 0.0, None)
+    verdict = Verdict(score >= limit, score, reason)
+    if verdict.blocked:
+        _log({"event": "blocked", "module": module, "score": round(score, 4), "reason": reason, "text": text})
+    return verdict
+
+
+def record_false_positive(module, text):
+    _log({"event": "false_positive", "module": module, "text": text})
+
+
+def _log(entry):
+    entry["ts"] = time.time()
+    with _log_lock, open(LOG_PATH, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(entry) + "\n")
+
+
+def stats(path=LOG_PATH):
+    """Per-module counts of refusals and reported false positives."""
+    counts = Counter()
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                e = json.loads(line)
+                counts[e["module"], e["event"]] += 1
+    modules = sorted({m for m, _ in counts})
+    return {m: {"blocked": counts[m, "blocked"], "false_positive": counts[m, "false_positive"]} for m in modules}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Train or inspect the off-topic pre-filter.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    tr = sub.add_parser("train")
+    tr.add_argument("labeled", help="JSONL with 'text' and 'label' (1 = off-topic)")
+    tr.add_argument("--out", default=MODEL_PATH)
+    tr.add_argument("--epochs", type=int, default=8)
+    sub.add_parser("stats")
+    args = ap.parse_args()
+
+    if args.cmd == "train":
+        with open(args.labeled, encoding="utf-8") as fh:
+            rows = [json.loads(line) for line in fh if line.strip()]
+        model = HashedLogReg.train([(r["text"], int(r["label"])) for r in rows], epochs=args.epochs)
+        model.save(args.out)
+        hits = sum((model.score(r["text"]) >= 0.5) == bool(r["label"]) for r in rows)
+        print(f"trained on {len(rows)} messages, training accuracy {hits / len(rows):.1%} -> {args.out}")
+    else:
+        for module, c in stats().items():
+            rate = c["false_positive"] / c["blocked"] if c["blocked"] else 0.0
+            print(f"{module:<16} blocked {c['blocked']:>5}  false positives {c['false_positive']:>4} ({rate:.0%})")
@@ -0,0 +1,63 @@
+"""The numbered steps of each page's PROCEDURE_PROMPT.
+
+Used offline to label which procedure step an assistant message belongs to
+(a student's answer belongs to the step of the question before it).
+"""
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+_STEP = re.compile(r"^\s*(\d+[a-z]?\d*)\.\s+(.+)$")
+_WORD = re.compile(r"[a-z]{3,}")
+
+
+def steps(procedure_prompt):
+    """``[(step id, text), ...]`` in order, e.g. ``("5a1", "Ask whether ...")``."""
+    out = []
+    for line in procedure_prompt.splitlines():
+        m = _STEP.match(line)
+        if m:
+            out.append((m.group(1), m.group(2).strip()))
+    return out
+
+
+@lru_cache(maxsize=None)
+def page_steps():
+    """``{module: [(step id, text), ...]}`` for every page."""
+    from professorbot import warmup
+
+    out = {}
+    for path in warmup.pages():
+        c = warmup.page_constants(path)
+        if "PROCEDURE_PROMPT" in c:
+            out[c.get("MODULE", os.path.basename(path))] = steps(c["PROCEDURE_PROMPT"])
+    return out
+
+
+def _vector(text, idf):
+    counts = Counter(_WORD.findall(text.lower()))
+    vec = {w: c * idf.get(w, 0.0) for w, c in counts.items()}
+    norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+    return {w: v / norm for w, v in vec.items() if v}
+
+
+@lru_cache(maxsize=None)
+def _matcher(module):
+    module_steps = page_steps().get(module, [])
+    df = Counter(w for _, text in module_steps for w in set(_WORD.findall(text.lower())))
+    idf = {w: math.log((1 + len(module_steps)) / (1 + n)) + 1.0 for w, n in df.items()}
+    return idf, [(sid, _vector(text, idf)) for sid, text in module_steps]
+
+
+def match(module, assistant_text):
+    """Id of the procedure step ``assistant_text`` most resembles, or None."""
+    idf, vectors = _matcher(module)
+    v = _vector(assistant_text, idf)
+    best, score = None, 0.0
+    for sid, sv in vectors:
+        s = sum(x * sv.get(w, 0.0) for w, x in v.items())
+        if s > score:
+            best, score = sid, s
+    return best
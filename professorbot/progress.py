@@ -0,0 +1,194 @@
+"""Live progress of each module's section: which step every student is on.
+
+The engine publishes an event on every turn: module, session, student,
+procedure step of the reply (``procedure.match``), turn count and whether it
+approved the conversation. Per module a ``Board`` applies events as they
+arrive and keeps its numbers incrementally (students per step, approved,
+stuck), so reading a board never scans the sessions. Subscribers are told
+which module changed; ``professorbot.asgi`` pushes the board to its viewers
+over server-sent events (at most every PROFESSORBOT_BOARD_INTERVAL seconds,
+default 0.25) and ``pages/Progress.py`` refreshes from it.
+
+A student is stuck when PROFESSORBOT_STUCK_TURNS replies in a row (default 4)
+stayed on one step, or when they have been idle for PROFESSORBOT_STUCK_IDLE
+seconds (default 300) before approval. Sessions idle for
+PROFESSORBOT_BOARD_TTL seconds (default 3 hours) leave the board.
+
+Boards live in the process. With several workers and a Redis session store
+(PROFESSORBOT_SESSION_STORE=redis://...), events are also relayed over Redis
+pub/sub so every worker's boards see every student.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from professorbot import config, procedure
+
+INTERVAL = config.get_float("PROFESSORBOT_BOARD_INTERVAL", 0.25)
+STUCK_TURNS = config.get_int("PROFESSORBOT_STUCK_TURNS", 4)
+STUCK_IDLE = config.get_float("PROFESSORBOT_STUCK_IDLE", 300.0)
+BOARD_TTL = config.get_float("PROFESSORBOT_BOARD_TTL", 3 * 3600.0)
+CHANNEL = "professorbot:progress"
+ORIGIN = uuid.uuid4().hex  # this process, so relayed events are not applied twice
+
+_log = logging.getLogger(__name__)
+
+
+class Board:
+    """Where one module's students are, updated one event at a time."""
+
+    def __init__(self, module):
+        self.module = module
+        self.order = [sid for sid, _ in procedure.page_steps().get(module, [])]
+        self.version = 0
+        self.latest = 0.0  # time of the newest event applied
+        self.counts = Counter()  # step -> students on it, approved ones excluded
+        self.approved = 0
+        self._stuck = set()  # sessions stuck on a step for STUCK_TURNS replies
+        self._active = OrderedDict()  # session -> entry, least recently active first
+        self._done = OrderedDict()  # approved sessions, kept until BOARD_TTL
+        self._lock = threading.Lock()
+
+    def apply(self, event):
+        session = event["session"]
+        with self._lock:
+            old = self._active.pop(session, None) or self._done.pop(session, None)
+            if old is not None:
+                if event["turn"] < old["turn"]:  # a late relayed event: keep the newer state
+                    (self._done if old["approved"] else self._active)[session] = old
+                    return
+                self._leave(session, old)
+            step = event["step"] or (old["step"] if old else None)
+            since = old["since"] if old and old["step"] == step else event["turn"]
+            entry = {"student": event["student"], "step": step, "turn": event["turn"], "since": since,
+                     "at": event["at"], "approved": event["approved"]}
+            (self._done if entry["approved"] else self._active)[session] = entry
+            if entry["approved"]:
+                self.approved += 1
+            else:
+                self.counts[step] += 1
+                if entry["turn"] - since >= STUCK_TURNS:
+                    self._stuck.add(session)
+            self.version += 1
+            self.latest = max(self.latest, event["at"])
+
+    def _leave(self, session, entry):
+        if entry["approved"]:
+            self.approved -= 1
+            return
+        self.counts[entry["step"]] -= 1
+        if not self.counts[entry["step"]]:
+            del self.counts[entry["step"]]
+        self._stuck.discard(session)
+
+    def _expire(self, now):
+        for sessions in (self._active, self._done):
+            while sessions:
+                session, entry = next(iter(sessions.items()))
+                if now - entry["at"] < BOARD_TTL:
+                    break
+                del sessions[session]
+                self._leave(session, entry)
+                self.version += 1
+
+    def snapshot(self, now=None, limit=50):
+        """Counts per step in procedure order, approved, and who is stuck (longest first)."""
+        now = now or time.time()
+        with self._lock:
+            self._expire(now)
+            stuck = {s: "same step" for s in self._stuck}
+            for session, entry in self._active.items():  # least recently active first: stop at the first recent one
+                if now - entry["at"] < STUCK_IDLE:
+                    break
+                stuck[session] = "idle"
+            rows = []
+            for session, reason in stuck.items():
+                e = self._active[session]
+                rows.append({"student": e["student"], "step": e["step"], "turns_on_step": e["turn"] - e["since"],
+                             "idle_s": round(now - e["at"]), "reason": reason})
+            steps = [{"step": s, "students": self.counts.get(s, 0)} for s in self.order]
+            steps += [{"step": s or "?", "students": n} for s, n in self.counts.items() if s not in self.order]
+            return {
+                "module": self.module,
+                "version": self.version,
+                "latest": self.latest,
+                "students": len(self._active) + len(self._done),
+                "in_progress": len(self._active),
+                "approved": self.approved,
+                "steps": steps,
+                "stuck_count": len(rows),
+                "stuck": sorted(rows, key=lambda r: (-r["idle_s"], -r["turns_on_step"]))[:limit],
+            }
+
+
+# ---------- bus ----------
+_lock = threading.Lock()
+_boards = {}
+_subscribers = []
+_relay = None
+
+
+def board(module):
+    with _lock:
+        if module not in _boards:
+            _boards[module] = Board(module)
+            _start_relay()
+        return _boards[module]
+
+
+def subscribe(callback):
+    """Call ``callback(module)`` after every event; returns a function that unsubscribes."""
+    with _lock:
+        _subscribers.append(callback)
+
+    def unsubscribe():
+        with _lock:
+            if callback in _subscribers:
+                _subscribers.remove(callback)
+    return unsubscribe
+
+
+def publish(module, session, student, step, turn, approved=False):
+    event = {"module": module, "session": session, "student": student, "step": step, "turn": turn,
+             "approved": approved, "at": time.time(), "origin": ORIGIN}
+    _apply(event)
+    if _relay is not None:
+        try:
+            _relay.publish(CHANNEL, json.dumps(event))
+        except (OSError, RuntimeError):
+            _log.exception("progress relay failed")
+
+
+def _apply(event):
+    board(event["module"]).apply(event)
+    for callback in list(_subscribers):
+        callback(event["module"])
+
+
+def _start_relay():
+    # caller holds _lock
+    global _relay
+    from professorbot import store
+
+    if _relay is not None or not (store.STORE_URL or "").startswith("redis://"):
+        return
+    _relay = store.open_store(store.STORE_URL)
+
+    def listen():
+        try:
+            for data in store.open_store(store.STORE_URL).listen(CHANNEL):
+                event = json.loads(data)
+                if event.get("origin") != ORIGIN:
+                    _apply(event)
+        except (OSError, RuntimeError):
+            _log.exception("progress relay stopped")
+
+    threading.Thread(target=listen, name="professorbot-progress", daemon=True).start()
+
+
+def boards():
+    with _lock:
+        return dict(_boards)
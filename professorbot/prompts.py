@@ -0,0 +1,136 @@
+"""Prompt compiler: whitespace normalization of the page prompts, with a safety check.
+
+The prompts are written for people: ``\\n`` escapes next to real newlines,
+blank lines between numbered steps, trailing spaces and padding at the end.
+The model is sent every one of those characters on every turn, so
+``prompt_prefix`` sends the compiled form instead:
+
+- trailing spaces on a line and runs of spaces inside a line are dropped
+  (leading indentation, which marks sub-steps like `` 5a1.``, is kept),
+- blank lines before a numbered step or list item are dropped, other runs of
+  blank lines become one,
+- leading and trailing blank space is stripped.
+
+A compiled prompt is used only if ``check`` passes: the same words in the same
+order, the same non-blank lines, and the same numbered steps. Otherwise the
+original is sent unchanged. Set PROFESSORBOT_COMPILE_PROMPTS=0 to always send
+the originals.
+
+    python -m professorbot.prompts            # tokens per module before/after, projected savings
+    python -m professorbot.prompts --archive transcripts.sqlite3   # project at archived turn counts
+"""
+import re
+from functools import lru_cache
+
+from professorbot import config, procedure
+
+ENABLED = config.get("PROFESSORBOT_COMPILE_PROMPTS", "1") not in ("0", "false", "no")
+
+_INNER_SPACES = re.compile(r"(?<=\S)[ \t]{2,}(?=\S)")
+_ITEM = re.compile(r"^\s*(?:\d+[a-z]?\d*\.|[-*•])\s")
+
+
+class UnsafeCompile(ValueError):
+    pass
+
+
+def normalize(text):
+    lines = [_INNER_SPACES.sub(" ", line.rstrip()) for line in text.split("\n")]
+    out = []
+    for line in lines:
+        if not line and (not out or not out[-1]):
+            continue  # no leading blank lines, no runs of blank lines
+        if line and _ITEM.match(line) and out and not out[-1] and len(out) > 1 and _ITEM.match(out[-2]):
+            out.pop()  # consecutive list items need no blank line between them
+        out.append(line)
+    return "\n".join(out).strip()
+
+
+def check(original, compiled):
+    """Raise UnsafeCompile unless ``compiled`` differs from ``original`` only in whitespace."""
+    if original.split() != compiled.split():
+        raise UnsafeCompile("word sequence changed")
+    if [l.split() for l in original.splitlines() if l.strip()] != [l.split() for l in compiled.splitlines() if l.strip()]:
+        raise UnsafeCompile("non-blank lines changed")
+    if [n for n, _ in procedure.steps(original)] != [n for n, _ in procedure.steps(compiled)]:
+        raise UnsafeCompile("numbered steps changed")
+
+
+@lru_cache(maxsize=128)
+def compile_prompt(text):
+    """The normalized prompt, or ``text`` itself when normalization is disabled or not provably safe."""
+    if not ENABLED:
+        return text
+    compiled = normalize(text)
+    try:
+        check(text, compiled)
+    except UnsafeCompile:
+        return text
+    return compiled
+
+
+def report(turn_counts=(5, 10, 15), archive=None):
+    """Per module: prompt tokens before/after and projected savings per conversation."""
+    from professorbot import metrics, warmup
+
+    medians = {}
+    if archive:
+        from professorbot import ingest
+
+        db = ingest.connect(archive)
+        for module, turns in db.execute("SELECT module, turns FROM conversations ORDER BY module, turns"):
+            medians.setdefault(module, []).append(turns)
+        medians = {m: t[len(t) // 2] for m, t in medians.items()}
+
+    rows = []
+    for path in warmup.pages():
+        c = warmup.page_constants(path)
+        if "SYSTEM_PROMPT" not in c or "PROCEDURE_PROMPT" not in c:
+            continue
+        row = {"module": c.get("MODULE"), "safe": True, "before": 0, "after": 0}
+        for name in ("SYSTEM_PROMPT", "PROCEDURE_PROMPT"):
+            compiled = normalize(c[name])
+            try:
+                check(c[name], compiled)
+            except UnsafeCompile as exc:
+                row["safe"], compiled = f"{name}: {exc}", c[name]
+            row["before"] += warmup.count_tokens(c[name])
+            row["after"] += warmup.count_tokens(compiled)
+        saved = row["before"] - row["after"]
+        row["saved_per_request"] = saved
+        # a conversation of T student turns makes T + 1 completions (the opening message is one)
+        for t in turn_counts:
+            row[f"saved_at_{t}_turns"] = saved * (t + 1)
+        if row["module"] in medians:
+            row["archive_median_turns"] = medians[row["module"]]
+            row["saved_at_median"] = saved * (medians[row["module"]] + 1)
+        row["usd_per_1000_conversations"] = round(
+            saved * (turn_counts[len(turn_counts) // 2] + 1) * 1000 * metrics.PRICES["prompt"] / 1e6, 2)
+        rows.append(row)
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Prompt token report before/after whitespace normalization.")
+    ap.add_argument("--archive", help="transcript archive to take typical turn counts from")
+    ap.add_argument("--turns", default="5,10,15", help="turn counts to project savings at")
+    args = ap.parse_args()
+    counts = tuple(int(t) for t in args.turns.split(","))
+    rows = report(counts, args.archive)
+    print(f"{'module':<16} {'before':>7} {'after':>7} {'saved':>6} " + " ".join(f"{'@' + str(t):>7}" for t in counts)
+          + f" {'$/1k conv @' + str(counts[len(counts) // 2]):>14}  safe")
+    for r in rows:
+        print(f"{r['module']:<16} {r['before']:>7} {r['after']:>7} {r['saved_per_request']:>6} "
+              + " ".join(f"{r[f'saved_at_{t}_turns']:>7}" for t in counts)
+              + f" {r['usd_per_1000_conversations']:>14}  {r['safe']}"
+              + (f"  (archive median {r['archive_median_turns']} turns: {r['saved_at_median']} saved)"
+                 if "archive_median_turns" in r else ""))
+    total_before, total_after = sum(r["before"] for r in rows), sum(r["after"] for r in rows)
+    print(f"{'total':<16} {total_before:>7} {total_after:>7} {total_before - total_after:>6} "
+          f"({(total_before - total_after) / max(total_before, 1):.1%} of prompt tokens per request)")
+    try:
+        import tiktoken  # noqa: F401
+    except ImportError:
+        print("tiktoken is not installed: token counts are estimates (characters / 4)")
@@ -0,0 +1,149 @@
+"""Token accounting per student, per module and per day, with soft and hard caps.
+
+Usage from every completion is appended to a SQLite ledger, and the running
+total of each cap's scope is updated in the same transaction, so ``check`` on
+the hot path is one indexed query and every worker sharing the
+ledger file sees the same totals. Completions made for no student (digests,
+the closing judge) are logged but count toward no cap. Caps are token counts
+(prompt + completion) and 0 means "no cap":
+
+    PROFESSORBOT_QUOTA_STUDENT_DAY      one student, all modules, one day
+    PROFESSORBOT_QUOTA_STUDENT_MODULE   one student, one module, whole term
+    PROFESSORBOT_QUOTA_MODULE_DAY       whole class, one module, one day
+    PROFESSORBOT_QUOTA_TERM             whole class, everything
+
+A warning is shown once usage passes PROFESSORBOT_QUOTA_WARN_AT (a fraction of
+the cap). Run ``python -m professorbot.quota`` for a spend report.
+"""
+import json
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from professorbot import config
+
+LEDGER_PATH = config.get("PROFESSORBOT_LEDGER", "usage_ledger.sqlite3")
+
+OK, WARN, BLOCK = "ok", "warn", "block"
+
+_SCOPES = (
+    # (setting, human label, key function)
+    ("PROFESSORBOT_QUOTA_STUDENT_DAY", "your daily limit",
+     lambda student, module, day: ("student_day", student, day)),
+    ("PROFESSORBOT_QUOTA_STUDENT_MODULE", "your limit for this module",
+     lambda student, module, day: ("student_module", student, module)),
+    ("PROFESSORBOT_QUOTA_MODULE_DAY", "the class limit for this module today",
+     lambda student, module, day: ("module_day", module, day)),
+    ("PROFESSORBOT_QUOTA_TERM", "the course limit for this term",
+     lambda student, module, day: ("term",)),
+)
+
+
+class QuotaLedger:
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            " ts REAL, day TEXT, student TEXT, module TEXT,"
+            " prompt_tokens INTEGER, completion_tokens INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS usage_student ON usage (student, day)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS totals (scope TEXT PRIMARY KEY, tokens INTEGER)")
+        self._db.commit()
+        self.caps = [(config.get_int(name, 0), label, key) for name, label, key in _SCOPES]
+        self.warn_at = config.get_float("PROFESSORBOT_QUOTA_WARN_AT", 0.8)
+        self._db.execute("BEGIN IMMEDIATE")  # one worker builds the totals of a ledger that predates them
+        if self._db.execute("SELECT COUNT(*) FROM totals").fetchone()[0] == 0:
+            for day, student, module, tokens in self._db.execute(
+                "SELECT day, student, module, SUM(prompt_tokens + completion_tokens)"
+                " FROM usage WHERE student IS NOT NULL GROUP BY day, student, module"
+            ).fetchall():
+                self._add(student, module, day, tokens)
+        self._db.commit()
+
+    def _add(self, student, module, day, tokens):
+        self._db.executemany(
+            "INSERT INTO totals VALUES (?, ?)"
+            " ON CONFLICT (scope) DO UPDATE SET tokens = tokens + excluded.tokens",
+            [(json.dumps(key(student, module, day)), tokens) for _, _, key in _SCOPES],
+        )
+
+    def record(self, student, module, prompt_tokens, completion_tokens, day=None):
+        day = day or date.today().isoformat()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?)",
+                (time.time(), day, student, module, prompt_tokens, completion_tokens),
+            )
+            if student is not None:
+                self._add(student, module, day, prompt_tokens + completion_tokens)
+            self._db.commit()
+
+    def check(self, student, module, day=None):
+        """Return ``(status, note)``; status is OK, WARN or BLOCK."""
+        day = day or date.today().isoformat()
+        caps = [(cap, label, json.dumps(key(student, module, day))) for cap, label, key in self.caps if cap > 0]
+        if not caps:
+            return OK, None
+        with self._lock:
+            totals = dict(self._db.execute(
+                f"SELECT scope, tokens FROM totals WHERE scope IN ({', '.join('?' * len(caps))})",
+                [scope for _, _, scope in caps],
+            ).fetchall())
+        status, note = OK, None
+        for cap, label, scope in caps:
+            used = totals.get(scope, 0)
+            if used >= cap:
+                return BLOCK, f"⚠️ You have reached {label}. Please reach out to Professor Bhatia."
+            if status == OK and used >= self.warn_at * cap:
+                status, note = WARN, f"You have used {used / cap:.0%} of {label}."
+        return status, note
+
+    def report(self, day=None, limit=20):
+        """Top consumers, optionally restricted to one day."""
+        where, args = ("WHERE day = ?", (day,)) if day else ("", ())
+        return self._db.execute(
+            "SELECT student, module, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens)"
+            f" FROM usage {where} GROUP BY student, module"
+            " ORDER BY SUM(prompt_tokens + completion_tokens) DESC LIMIT ?",
+            (*args, limit),
+        ).fetchall()
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def ledger():
+    """Process-wide ledger, opened on first use."""
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = QuotaLedger()
+    return _ledger
+
+
+def check(student, module):
+    return ledger().check(student, module)
+
+
+def record(student, module, usage):
+    """Record an OpenAI ``resp.usage`` object (ignored when missing)."""
+    if usage is not None:
+        ledger().record(student, module, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Token spend per student and module.")
+    ap.add_argument("--day", help="YYYY-MM-DD; default is the whole term")
+    ap.add_argument("--limit", type=int, default=20)
+    args = ap.parse_args()
+    print(f"{'student':<20} {'module':<16} {'calls':>6} {'prompt':>10} {'completion':>10}")
+    for row in ledger().report(args.day, args.limit):
+        print(f"{row[0]:<20} {row[1]:<16} {row[2]:>6} {row[3]:>10} {row[4]:>10}")
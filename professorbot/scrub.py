@@ -0,0 +1,352 @@
+"""Pseudonymize transcripts before they go to TAs or into research data.
+
+- Penn IDs become keyed hashes, ``P-<12 hex>``: HMAC-SHA256 under
+  PROFESSORBOT_PII_KEY. A student keeps one pseudonym across every transcript
+  and module, and without the key nobody can recompute it from a roster.
+- Details students volunteer (age, gender, hometown, hobbies, e-mail, phone)
+  are replaced with tokens like ``[AGE-<10 hex>]``, keyed the same way, so
+  equal values still look equal. The patterns are compiled into one
+  alternation that only runs on lines with a digit or one of ``HINTS``
+  (most lines have neither). PROFESSORBOT_PII_PATTERNS can name a JSON file
+  of extra or replacement patterns, ``{"KIND": "regex" | ["regex", ...]}``.
+  A ``(?P<value>...)`` group marks the part to replace; without one, the
+  whole match is replaced. A ``"HINTS"`` list in the file adds to the
+  hints; without one, custom patterns run on every line.
+- A student's answer to a question that asks for two or more profile details
+  (Machine I step 2 asks for age, gender, hometown and hobbies) is replaced
+  line by line as ``[PROFILE-...]``, since free-form answers like "20, from
+  Austin, chess and hiking" defeat patterns.
+
+Every replacement is recorded as ``(token, kind, original)`` in a key map
+that is stored separately (PROFESSORBOT_PII_KEYMAP, default
+``pii-keymap.sqlite3``; never inside the output), and ``reveal`` turns
+scrubbed text back. Files are streamed in chunks of whole lines
+(PROFESSORBOT_PII_CHUNK bytes, default 1 MiB), one file per task on a
+process pool; an archive is copied in batches of conversations.
+
+Nothing in the output points back to the raw transcripts: files are named
+``<pseudonym>_<hash of the scrubbed text>.txt`` in one flat directory (the
+submitted names and folders carry student names), and archive rows get ids
+hashed from the scrubbed messages and no ``source`` path.
+
+    python -m professorbot.scrub submissions/ --out scrubbed/
+    python -m professorbot.scrub --archive transcripts.sqlite3 --out scrubbed.sqlite3
+    python -m professorbot.scrub --reveal scrubbed/P-3f2a9c0d1e4b_9a8b7c6d5e4f3a2b.txt
+"""
+import hashlib
+import hmac
+import json
+import os
+import re
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from professorbot import config
+from professorbot.students import penn_id
+
+KEY = config.get("PROFESSORBOT_PII_KEY")
+KEYMAP_PATH = config.get("PROFESSORBOT_PII_KEYMAP", "pii-keymap.sqlite3")
+PATTERNS_PATH = config.get("PROFESSORBOT_PII_PATTERNS")
+CHUNK = config.get_int("PROFESSORBOT_PII_CHUNK", 1 << 20)
+
+_FROM = r"(?i:\b(?:i'?m|i am|im)\s+(?:originally\s+)?from|\bi\s+grew\s+up\s+in|\bi\s+was\s+born\s+in|\bmy\s+home\s*town\s+is)\s+"
+_PLACE = r"(?P<value>[A-Za-z][\w'-]*(?:\.[\w'-]+)*(?:(?:\s+|,\s*)[A-Za-z][\w'-]*(?:\.[\w'-]+)*){0,3}?)(?=\s*[.;!?\n]|\s+(?:and|but)\b|,\s+(?:and|but|i)\b|\Z)"
+_GENDERS = r"male|female|man|woman|guy|girl|boy|non-?binary|genderqueer|agender|trans(?:gender)?(?:\s+(?:man|woman))?"
+
+PATTERNS = {
+    "PENN_ID": r"(?<!\d)\d{8}(?!\d)",
+    "EMAIL": r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+",
+    "PHONE": r"(?<![\d-])(?:\+?1[ .-]?)?(?:\(\d{3}\)\s?|\d{3}[ .-])\d{3}[ .-]\d{4}(?!\d)",
+    "AGE": [
+        r"(?i:\b(?:i'?m|i am|age|aged|turned)\s*:?\s+)(?P<value>\d{1,2})\b(?!\s*(?:%|percent|\$|dollars|times|out of))",
+        r"\b(?P<value>\d{1,2})(?i:\s*(?:-|\s)?\s*(?:years?|yrs?)(?:\s*|-)old|\s*y/?o)\b",
+    ],
+    "GENDER": [
+        r"(?i:\b(?:i'?m|i am|i identify as)\s+(?:an?\s+)?)(?P<value>(?i:%s))\b" % _GENDERS,
+        r"(?i:\bgender\s*(?:is|:)\s*)(?P<value>[A-Za-z][\w -]{0,24}?)(?=\s*[,.;\n]|\Z)",
+        r"(?i:\b(?:male|female|non-?binary)\b)",
+    ],
+    "HOMETOWN": _FROM + _PLACE,
+    "HOBBIES": r"(?i:\b(?:my\s+)?(?:hobbies|interests)\s+(?:are|include)\s*:?\s*|\bin\s+my\s+free\s+time,?\s+i\s+|\bfor\s+fun,?\s+i\s+)"
+               r"(?P<value>[^.!?\n]{1,160})",
+}
+
+# lowercase substrings at least one of which every pattern without a digit needs
+HINTS = ("@", "i'm", "i am", "identify", "gender", "male", "binary", "from", "grew up", "born", "home",
+         "hobbies", "interests", "free time", "for fun")
+
+_DIGIT = re.compile(r"\d")
+_ASKS = re.compile(r"(?i)\b(age|gender|where (?:you(?:'re| are)|they are) from|hometown|hobbies|interests)\b")
+_HEADERS = {f"{role}:": role.lower() for role in ("ASSISTANT", "USER", "SYSTEM", "UNKNOWN")}
+_TOKEN = re.compile(r"P-[0-9a-f]{12}|\[[A-Z_]+-[0-9a-f]{10}\]")
+
+
+def asks_profile(text):
+    """True when an assistant message asks for two or more profile details."""
+    return len({m.group(1).lower()[:5] for m in _ASKS.finditer(text)}) >= 2
+
+
+def load_patterns(path=PATTERNS_PATH):
+    if not path:
+        return PATTERNS
+    with open(path, encoding="utf-8") as f:
+        custom = json.load(f)
+    hints = custom.pop("HINTS", None)
+    return {**PATTERNS, **custom, "HINTS": HINTS + tuple(hints) if hints is not None else None}
+
+
+class Scrubber:
+    """One combined regex over every pattern, plus the keyed tokens it hands out."""
+
+    def __init__(self, key, patterns=PATTERNS):
+        if not key:
+            raise ValueError("set PROFESSORBOT_PII_KEY: pseudonyms are keyed hashes")
+        self.key = key.encode("utf-8")
+        self.hints = patterns.get("HINTS", HINTS)
+        parts, self.kinds = [], []
+        for kind, regexes in patterns.items():
+            if kind == "HINTS":
+                continue
+            for regex in [regexes] if isinstance(regexes, str) else regexes:
+                i = len(self.kinds)
+                parts.append(f"(?P<k{i}>{regex.replace('(?P<value>', f'(?P<v{i}>')})")
+                self.kinds.append(kind)
+        # every pattern starts at a word boundary or at the "(" / "+" of a phone number
+        self.regex = re.compile(r"(?:\b|(?=[(+]))(?:%s)" % "|".join(parts))
+        self.found = {}  # token -> (kind, original), drained by the caller
+
+    def token(self, kind, value):
+        digest = hmac.new(self.key, f"{kind}\x00{value}".encode("utf-8"), hashlib.sha256).hexdigest()
+        token = f"P-{digest[:12]}" if kind == "PENN_ID" else f"[{kind}-{digest[:10]}]"
+        self.found[token] = (kind, value)
+        return token
+
+    def _replace(self, m):
+        i = int(m.lastgroup[1:])
+        value = f"v{i}"
+        if value not in self.regex.groupindex or m.group(value) is None:
+            return self.token(self.kinds[i], m.group())
+        start, end = m.start(value) - m.start(), m.end(value) - m.start()
+        whole = m.group()
+        return whole[:start] + self.token(self.kinds[i], m.group(value)) + whole[end:]
+
+    def text(self, text):
+        if self.hints is None:
+            return self.regex.sub(self._replace, text)
+        lines = text.splitlines(True)
+        for i, line in enumerate(lines):
+            low = line.lower()
+            if _DIGIT.search(line) or any(h in low for h in self.hints):
+                lines[i] = self.regex.sub(self._replace, line)
+        return "".join(lines)
+
+    def lines(self, lines, state):
+        """Scrub a chunk of transcript lines; ``state`` carries the section across chunks."""
+        out = []
+        for line in lines:
+            head = line.rstrip("\r\n")
+            role = _HEADERS.get(head)
+            if role is not None:
+                if state.get("role") == "assistant":
+                    state["asked"] = asks_profile("".join(state["assistant"]))
+                elif state.get("role") == "user":
+                    state.setdefault("student", None)  # only the first user message names the student
+                state["role"], state["assistant"] = role, []
+            elif state.get("role") == "assistant":
+                state["assistant"].append(line)
+            elif state.get("role") == "user":
+                if "student" not in state and penn_id(head):
+                    state["student"] = self.token("PENN_ID", penn_id(head))
+                if state.get("asked") and head.strip() and head != "---":
+                    out.append(self.token("PROFILE", head) + line[len(head):])
+                    continue
+            out.append(line)
+        return self.text("".join(out))
+
+    def drain(self):
+        found, self.found = self.found, {}
+        return found
+
+
+# ---------- key map ----------
+def open_keymap(path=KEYMAP_PATH):
+    db = sqlite3.connect(path, timeout=30)
+    db.execute("CREATE TABLE IF NOT EXISTS keymap (token TEXT PRIMARY KEY, kind TEXT, original TEXT, added TEXT)")
+    return db
+
+
+def remember(db, found):
+    """Add new tokens to the key map; returns how many were new."""
+    before = db.total_changes
+    now = datetime.now().isoformat(timespec="seconds")
+    with db:
+        db.executemany("INSERT OR IGNORE INTO keymap VALUES (?, ?, ?, ?)",
+                       ((t, kind, original, now) for t, (kind, original) in found.items()))
+    return db.total_changes - before
+
+
+def reveal(text, keymap=KEYMAP_PATH):
+    """Put the originals back into scrubbed ``text``."""
+    db = open_keymap(keymap)
+    tokens = set(_TOKEN.findall(text))
+    originals = {}
+    for t in tokens:
+        row = db.execute("SELECT original FROM keymap WHERE token = ?", (t,)).fetchone()
+        if row:
+            originals[t] = row[0]
+    db.close()
+    return _TOKEN.sub(lambda m: originals.get(m.group(), m.group()), text)
+
+
+# ---------- workers ----------
+_scrubber = None
+
+
+def _init(key, patterns):
+    global _scrubber
+    _scrubber = Scrubber(key, patterns)
+
+
+def scrub_file(paths):
+    """Stream ``src`` into directory ``out`` in chunks; returns ``(bytes read, key map entries)``.
+
+    The output is named ``<student pseudonym>_<hash of the scrubbed text>.txt``:
+    submitted names carry the student's name and Penn ID.
+    """
+    src, out = paths
+    state, size, digest = {}, 0, hashlib.sha256()
+    fd, part = tempfile.mkstemp(suffix=".part", dir=out)
+    with open(src, encoding="utf-8", errors="replace", newline="") as fin, \
+            open(fd, "w", encoding="utf-8", newline="") as fout:
+        while True:
+            lines = fin.readlines(CHUNK)
+            if not lines:
+                break
+            size += sum(len(line) for line in lines)
+            text = _scrubber.lines(lines, state)
+            digest.update(text.encode("utf-8"))
+            fout.write(text)
+    os.replace(part, os.path.join(out, f"{state.get('student') or 'unknown'}_{digest.hexdigest()[:16]}.txt"))
+    return size, _scrubber.drain()
+
+
+def scrub_conversations(batch):
+    """Scrub archive rows: ``[(conversation row, [message rows])]`` -> same shape plus key map entries."""
+    from professorbot import ingest
+
+    out = []
+    for conv, messages in batch:
+        conv = list(conv)
+        if conv[3] and re.fullmatch(r"\d{8}", conv[3]):  # the student column holds the Penn ID
+            conv[3] = _scrubber.token("PENN_ID", conv[3])
+        asked, scrubbed = False, []
+        for row in messages:
+            row = list(row)
+            content = row[4]
+            if row[3] == "user" and asked:
+                content = "\n".join(_scrubber.token("PROFILE", l) if l.strip() else l for l in content.split("\n"))
+            row[4] = _scrubber.text(content)
+            asked = row[3] == "assistant" and asks_profile(content)
+            scrubbed.append(row)
+        # the original id hashes the raw transcript and the source is its path: both lead back to the student
+        conv[0] = hashlib.sha256(ingest.render((r[3], r[4]) for r in scrubbed).encode("utf-8")).hexdigest()
+        conv[8] = "scrubbed"
+        for row in scrubbed:
+            row[0] = conv[0]
+        out.append((conv, scrubbed))
+    return out, _scrubber.drain()
+
+
+# ---------- drivers ----------
+def _outside(keymap, out):
+    keymap, out = os.path.abspath(keymap), os.path.abspath(out)
+    if keymap == out or keymap.startswith(out.rstrip(os.sep) + os.sep):
+        raise ValueError("the key map must not be stored with the scrubbed output")
+
+
+def scrub_tree(root, out, keymap=KEYMAP_PATH, workers=None, key=KEY, patterns=None):
+    """Scrub every ``.txt`` under ``root`` into ``out`` (flat, renamed); returns ``(files, bytes, new tokens)``."""
+    _outside(keymap, out)
+    os.makedirs(out, exist_ok=True)
+    pairs = []
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(".txt"):
+                pairs.append((os.path.join(dirpath, name), out))
+    db = open_keymap(keymap)
+    total, tokens = 0, 0
+    with ProcessPoolExecutor(workers, initializer=_init, initargs=(key, patterns or load_patterns())) as pool:
+        for size, found in pool.map(scrub_file, pairs, chunksize=64):
+            total += size
+            if found:
+                tokens += remember(db, found)
+    db.close()
+    return len(pairs), total, tokens
+
+
+def scrub_archive(src, out, keymap=KEYMAP_PATH, workers=None, key=KEY, patterns=None, batch=500):
+    """Copy an ingest archive with every message scrubbed; returns ``(conversations, new tokens)``."""
+    from professorbot import ingest
+
+    _outside(keymap, out)
+    source = sqlite3.connect(src)
+    dest = ingest.connect(out)
+    db = open_keymap(keymap)
+
+    def batches():
+        convs = source.execute("SELECT id, module, module_score, student, started, day, turns, approved, source"
+                               " FROM conversations ORDER BY id")
+        while True:
+            rows = convs.fetchmany(batch)
+            if not rows:
+                return
+            yield [(c, source.execute("SELECT conversation, idx, turn, role, content, step FROM messages"
+                                      " WHERE conversation = ? ORDER BY idx", (c[0],)).fetchall()) for c in rows]
+
+    count, tokens = 0, 0
+    with ProcessPoolExecutor(workers, initializer=_init, initargs=(key, patterns or load_patterns())) as pool:
+        for rows, found in pool.map(scrub_conversations, batches()):
+            with dest:
+                dest.executemany("INSERT OR IGNORE INTO conversations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                 [c for c, _ in rows])
+                dest.executemany("INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                                 [m for _, messages in rows for m in messages])
+            tokens += remember(db, found)
+            count += len(rows)
+    source.close()
+    dest.close()
+    db.close()
+    return count, tokens
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    ap = argparse.ArgumentParser(description="Pseudonymize transcripts with keyed hashes and a separate key map.")
+    ap.add_argument("root", nargs="?", help="directory of .txt transcripts (searched recursively)")
+    ap.add_argument("--archive", help="scrub an ingest archive instead of files")
+    ap.add_argument("--out", help="output directory (files) or database (--archive)")
+    ap.add_argument("--keymap", default=KEYMAP_PATH)
+    ap.add_argument("--workers", type=int)
+    ap.add_argument("--reveal", help="print a scrubbed file with the originals put back")
+    args = ap.parse_args()
+
+    if args.reveal:
+        with open(args.reveal, encoding="utf-8") as f:
+            sys.stdout.write(reveal(f.read(), args.keymap))
+        sys.exit(0)
+    if not args.out or not (args.root or args.archive):
+        ap.error("give a directory or --archive, and --out")
+    started = time.perf_counter()
+    if args.archive:
+        count, tokens = scrub_archive(args.archive, args.out, args.keymap, args.workers)
+        print(f"{count} conversations scrubbed, {tokens} new tokens, in {time.perf_counter() - started:.1f}s")
+    else:
+        files, size, tokens = scrub_tree(args.root, args.out, args.keymap, args.workers)
+        elapsed = time.perf_counter() - started
+        print(f"{files} files, {size / 1e6:.1f} MB scrubbed in {elapsed:.1f}s "
+              f"({size / 1e6 / max(elapsed, 1e-9):.1f} MB/s), {tokens} new tokens")
@@ -0,0 +1,105 @@
+"""Full-text search over the transcript archive for instructors.
+
+Queries the FTS5 index that ``professorbot.ingest`` keeps on every archived
+message (it is updated by triggers as conversations are added, so there is
+nothing to rebuild). Plain queries match messages containing every word,
+stemmed, so "search costs" also finds "searching is costly"; ``raw=True``
+passes FTS5 syntax (``OR``, ``NEAR``, ``"exact phrase"``, ``prefix*``) through.
+Results can be narrowed by module, role, procedure step and date:
+
+    python -m professorbot.search "DEI opt-out" --module "Behavior III" --role user --students
+    python -m professorbot.search "search costs" --module "Behavior II" --since 2026-09-01
+"""
+import re
+from dataclasses import dataclass
+
+from professorbot import ingest
+
+_TERM = re.compile(r"[^\s\"]+")
+
+
+@dataclass(frozen=True)
+class Hit:
+    conversation: str
+    module: str
+    student: str
+    day: str
+    turn: int
+    step: str
+    role: str
+    snippet: str
+
+
+def fts_query(text):
+    """Each word of ``text`` as a quoted FTS5 string, so punctuation like "opt-out" is literal."""
+    return " ".join('"%s"' % term for term in _TERM.findall(text))
+
+
+def _where(module, role, step, since, until):
+    clauses, params = ["messages_fts MATCH ?"], []
+    for sql, value in (("c.module = ?", module), ("m.role = ?", role), ("m.step = ?", step),
+                       ("c.day >= ?", since), ("c.day <= ?", until)):
+        if value is not None:
+            clauses.append(sql)
+            params.append(value)
+    return " AND ".join(clauses), params
+
+
+def search(db, query, module=None, role=None, step=None, since=None, until=None, limit=50, raw=False):
+    """Best-matching messages first, as ``Hit`` rows with the match highlighted."""
+    where, params = _where(module, role, step, since, until)
+    rows = db.execute(
+        f"""SELECT c.id, c.module, c.student, c.day, m.turn, m.step, m.role,
+                   snippet(messages_fts, 0, '[', ']', '…', 16)
+            FROM messages_fts
+            JOIN messages m ON m.rowid = messages_fts.rowid
+            JOIN conversations c ON c.id = m.conversation
+            WHERE {where} ORDER BY rank LIMIT ?""",
+        [query if raw else fts_query(query), *params, limit])
+    return [Hit(*row) for row in rows]
+
+
+def students(db, query, module=None, role=None, step=None, since=None, until=None, raw=False):
+    """``[(student, conversations, matching messages), ...]``, most matches first."""
+    where, params = _where(module, role, step, since, until)
+    return db.execute(
+        f"""SELECT coalesce(c.student, '(no Penn ID)'), count(DISTINCT c.id), count(*)
+            FROM messages_fts
+            JOIN messages m ON m.rowid = messages_fts.rowid
+            JOIN conversations c ON c.id = m.conversation
+            WHERE {where} GROUP BY 1 ORDER BY 3 DESC, 1""",
+        [query if raw else fts_query(query), *params]).fetchall()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    ap = argparse.ArgumentParser(description="Search archived ProfessorBot conversations.")
+    ap.add_argument("query")
+    ap.add_argument("--db", default=ingest.ARCHIVE_PATH)
+    ap.add_argument("--module")
+    ap.add_argument("--role", choices=("user", "assistant"))
+    ap.add_argument("--step", help='procedure step label, e.g. "5a"')
+    ap.add_argument("--since", help="YYYY-MM-DD")
+    ap.add_argument("--until", help="YYYY-MM-DD")
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--raw", action="store_true", help="query is FTS5 syntax")
+    ap.add_argument("--students", action="store_true", help="list matching students instead of messages")
+    args = ap.parse_args()
+    db = ingest.connect(args.db)
+    filters = dict(module=args.module, role=args.role, step=args.step, since=args.since, until=args.until,
+                   raw=args.raw)
+    started = time.perf_counter()
+    if args.students:
+        rows = students(db, args.query, **filters)
+        elapsed = time.perf_counter() - started
+        for student, conversations, messages in rows:
+            print(f"{student}\t{conversations} conversations\t{messages} messages")
+    else:
+        rows = search(db, args.query, limit=args.limit, **filters)
+        elapsed = time.perf_counter() - started
+        for hit in rows:
+            print(f"{hit.day}  {hit.module}  {hit.student or '-'}  turn {hit.turn}  step {hit.step or '-'}  "
+                  f"{hit.role}: {hit.snippet}")
+    print(f"{len(rows)} results in {elapsed * 1000:.1f} ms")
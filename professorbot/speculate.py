@@ -0,0 +1,165 @@
+"""Speculative replies for closed-choice turns.
+
+When ProfessorBot's last message asks a question with a tiny answer space,
+replies to the likely answers are generated in the background while the
+student reads. If the student's answer matches one of them, that job becomes
+the reply to the turn and shows up immediately. Recognized questions:
+
+- "Next, Choose A, or Choose B?" (Brain II): Next / Choose A / Choose B
+- yes/no questions such as Behavior II and III step 5: Yes / No
+
+Speculation is off unless configured per module with PROFESSORBOT_SPECULATE, a
+JSON object like
+
+    {"Brain II": {"candidates": 3, "session_tokens": 40000},
+     "Behavior II": {"candidates": 2, "session_tokens": 20000}}
+
+where ``candidates`` caps the replies generated per turn and ``session_tokens``
+caps the speculative tokens one session may spend. Hit rate and wasted tokens
+(speculative replies nobody used) are counted per module in ``stats()``.
+
+Speculative completions are charged to nobody and kept out of the module's
+turn metrics (they go to the ``llm.SPECULATIVE`` bucket); the one a student's
+answer matches is charged to them and recorded as the turn by ``charge`` when
+the page stores it.
+"""
+import json
+import re
+import threading
+from collections import defaultdict
+
+from professorbot import cancel, config, jobs, llm
+
+BUDGETS = json.loads(config.get("PROFESSORBOT_SPECULATE", "{}"))
+
+_CHOICE = re.compile(r"\bNext\b.{0,40}\bChoose A\b.{0,20}\bChoose B\b", re.IGNORECASE | re.DOTALL)
+# a short closing question opened by an auxiliary verb and its subject ("Is this behavior irrational?"),
+# but not a request phrased as one ("Can you describe what they found?")
+_YES_NO = re.compile(
+    r"(?:^|[.!:\n]\s*)(?:do|does|did|would|will|is|are|was|were|could|should|can|have|has)\s+"
+    r"(?!you\s+(?:explain|describe|tell|share|give|walk|name|list|summarize|elaborate|think of)\b)"
+    r"(?:it|this|that|these|those|there|you|your|they|their|we|our|he|she|the|a|an|any|more|less|some)\b[^?.!\n]{0,100}\?\s*$",
+    re.IGNORECASE,
+)
+_SYNONYMS = {"y": "yes", "yeah": "yes", "yep": "yes", "yes": "yes", "n": "no", "nope": "no", "no": "no"}
+_PUNCT = re.compile(r"[^a-z0-9 ]+")
+
+_lock = threading.Lock()
+_spent = defaultdict(int)  # session -> speculative tokens
+_open = {}  # (session, turn) -> {normalized answer: future}
+_stats = defaultdict(lambda: {"turns": 0, "generated": 0, "hits": 0, "misses": 0,
+                              "used_tokens": 0, "wasted_tokens": 0})
+
+
+def candidates(assistant_text):
+    """Likely student answers to ``assistant_text``, most likely first."""
+    if _CHOICE.search(assistant_text):
+        return ["Next", "Choose A", "Choose B"]
+    text = assistant_text.strip()
+    if text.count("?") == 1 and _YES_NO.search(text) and " or " not in text.rsplit("\n", 1)[-1]:
+        return ["Yes", "No"]
+    return []
+
+
+def normalize(text):
+    text = " ".join(_PUNCT.sub(" ", text.lower()).split())
+    return _SYNONYMS.get(text, text)
+
+
+def launch(session, module, log, prefix, control):
+    """Start speculative replies for the next user turn, if the last message invites them."""
+    budget = BUDGETS.get(module)
+    if not budget or not len(log) or log[-1]["role"] != "assistant":
+        return
+    answers = candidates(log[-1]["content"])[: budget.get("candidates", 0)]
+    if not answers or _spent[session] >= budget.get("session_tokens", 0):
+        return
+    turn = sum(1 for m in log if m["role"] == "user") + 1
+    futures = {}
+    for answer in answers:
+        request = log.request(prefix, control, then=[("user", answer)])
+        futures[normalize(answer)] = jobs.submit(
+            (session, turn, "speculative", answer), llm.complete, request, module, None, session, speculative=True)
+    with _lock:
+        _open[session, turn] = futures
+        _stats[module]["turns"] += 1
+        _stats[module]["generated"] += len(futures)
+
+
+def resolve(session, module, turn, user_text):
+    """Adopt a matching speculative reply as the job for ``turn``; True on a hit."""
+    with _lock:
+        futures = _open.pop((session, turn), None)
+    if not futures:
+        return False
+    hit = futures.pop(normalize(user_text), None)
+    if hit is not None:
+        jobs.adopt((session, turn), _Reply(hit))
+        hit.add_done_callback(lambda f: _count(session, module, f, "used_tokens"))
+    with _lock:
+        _stats[module]["hits" if hit is not None else "misses"] += 1
+    for future in futures.values():
+        future.token.cancel()  # a speculative reply still streaming stops here
+        if not future.cancel():
+            future.add_done_callback(lambda f: _count(session, module, f, "wasted_tokens"))
+        jobs.forget(future)
+    return hit is not None
+
+
+def charge(job, student):
+    """Charge an adopted speculative reply to ``student`` and record it as the turn it answered."""
+    if isinstance(job, _Reply) and job.done() and not job.cancelled() and not job.exception():
+        result = job._future.result()
+        if len(result) > 2:  # an actual completion, not a notice
+            result[2](student)
+
+
+def _count(session, module, future, field):
+    if future.cancelled() or future.exception():
+        return
+    usage = future.result()[1]
+    tokens = (usage.prompt_tokens + usage.completion_tokens) if usage else 0
+    with _lock:
+        _spent[session] += tokens
+        _stats[module][field] += tokens
+
+
+class _Reply:
+    """Future adapter: the page expects call_llm's text, speculation runs llm.complete."""
+
+    def __init__(self, future):
+        self._future = future
+        self.key = future.key
+        self.token = future.token
+
+    def result(self, timeout=None):
+        try:
+            return self._future.result(timeout)[0]
+        except cancel.Cancelled as exc:
+            if exc.reason == "deadline":
+                return llm.TIMED_OUT
+            raise
+
+    def done(self):
+        return self._future.done()
+
+    def cancel(self):
+        return self._future.cancel()
+
+    def cancelled(self):
+        return self._future.cancelled()
+
+    def exception(self, timeout=None):
+        return self._future.exception(timeout)
+
+    def add_done_callback(self, fn):
+        self._future.add_done_callback(lambda _: fn(self))
+
+
+def stats():
+    with _lock:
+        out = {m: dict(s) for m, s in _stats.items()}
+    for s in out.values():
+        answered = s["hits"] + s["misses"]
+        s["hit_rate"] = s["hits"] / answered if answered else 0.0
+    return out
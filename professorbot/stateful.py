@@ -0,0 +1,146 @@
+"""Stateful completions: each turn sends only what the provider has not seen.
+
+With PROFESSORBOT_STATEFUL=1, completions that belong to a session go through
+the provider's Responses API with ``store=True``. The first request of a
+session carries the prompts and the history; later requests chain to the
+previous response with ``previous_response_id`` and carry only the new
+messages (the student's message, plus any locally answered turns). The
+per-turn control message goes in ``instructions``, which the provider does
+not keep in the chain, so the model sees only the current one, as in
+full-history mode. Speculative replies branch from the same response,
+and an adopted one becomes the next link of the chain.
+
+Chains are remembered per session and API key by a digest of the messages
+each response covers, so a request continues from the longest chain that
+matches its history. When the provider no longer has the previous response
+(expired or evicted), the request is retried once with the full history,
+transparently. ``professorbot.localserver`` implements ``/v1/responses``
+with expiring state for tests.
+
+Bytes sent per turn, against what full-history mode would have sent, are
+counted per module in ``stats()`` and shown on the dashboard.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict, defaultdict
+
+import openai
+from openai.types.chat import ChatCompletion
+
+from professorbot import config
+
+ENABLED = config.get("PROFESSORBOT_STATEFUL", "") in ("1", "true", "yes")
+MAX_SESSIONS = config.get_int("PROFESSORBOT_STATEFUL_SESSIONS", 10_000)
+LINKS_PER_SESSION = 4  # chain heads kept per session (the live one plus speculative branches)
+
+_lock = threading.Lock()
+_chains = OrderedDict()  # (session, key name) -> {covered message count: (digest, response id)}
+_stats = defaultdict(lambda: {"requests": 0, "chained": 0, "fallbacks": 0, "bytes_sent": 0, "bytes_full": 0})
+
+
+def _items(messages):
+    return [{"role": m["role"], "content": m["content"]} for m in messages]
+
+
+def _digests(items):
+    """Running digest after each item, so any prefix can be matched in one pass."""
+    h, out = hashlib.sha256(), []
+    for item in items:
+        h.update(item["role"].encode())
+        h.update(b"\x00")
+        h.update(item["content"].encode("utf-8"))
+        h.update(b"\x01")
+        out.append(h.hexdigest())
+    return out
+
+
+def _head(key, digests):
+    """``(covered, response id)`` of the longest stored chain that is a prefix of the conversation."""
+    with _lock:
+        links = _chains.get(key)
+        if not links:
+            return 0, None
+        _chains.move_to_end(key)
+        for covered in sorted(links, reverse=True):
+            digest, response_id = links[covered]
+            if covered <= len(digests) and digests[covered - 1] == digest:
+                return covered, response_id
+    return 0, None
+
+
+def _remember(key, covered, digest, response_id):
+    with _lock:
+        links = _chains.setdefault(key, {})
+        links.pop(covered, None)
+        links[covered] = (digest, response_id)
+        while len(links) > LINKS_PER_SESSION:  # dicts keep insertion order: drop the oldest link
+            del links[next(iter(links))]
+        _chains.move_to_end(key)
+        while len(_chains) > MAX_SESSIONS:
+            _chains.popitem(last=False)
+
+
+def forget(key):
+    with _lock:
+        _chains.pop(key, None)
+
+
+def holds(key):
+    """True when a chain is stored for ``key``; the pool keeps such a session on the same API key."""
+    with _lock:
+        return key in _chains
+
+
+def create(client, model, temperature, request, key, module=None):
+    """Responses-API completion of a ``ChatLog.request`` view, returned as a ChatCompletion."""
+    prefix, control, *rest = request.parts
+    conversation = _items(prefix) + _items(m for part in rest for m in part)
+    digests = _digests(conversation)
+    covered, previous = _head(key, digests)
+    full_bytes = len(json.dumps(_items(request)).encode("utf-8"))
+    instructions = "\n\n".join(m["content"] for m in control) or None
+    try:
+        resp, sent = _send(client, model, temperature, conversation[covered:], instructions, previous)
+    except (openai.NotFoundError, openai.BadRequestError) as exc:
+        if previous is None or "previous_response" not in str(exc):
+            raise
+        forget(key)  # the provider dropped our state: start over with the full history
+        with _lock:
+            _stats[module]["fallbacks"] += 1
+        covered, previous = 0, None
+        resp, sent = _send(client, model, temperature, conversation, instructions, None)
+    text = resp.output_text
+    reply = {"role": "assistant", "content": text}
+    _remember(key, len(conversation) + 1, _digests(conversation + [reply])[-1], resp.id)
+    with _lock:
+        s = _stats[module]
+        s["requests"] += 1
+        s["chained"] += previous is not None
+        s["bytes_sent"] += sent
+        s["bytes_full"] += full_bytes
+    usage = resp.usage
+    return ChatCompletion.model_validate({
+        "id": resp.id, "object": "chat.completion", "created": int(resp.created_at), "model": resp.model,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": reply}],
+        "usage": usage and {"prompt_tokens": usage.input_tokens, "completion_tokens": usage.output_tokens,
+                            "total_tokens": usage.total_tokens},
+    })
+
+
+def _send(client, model, temperature, items, instructions, previous):
+    body = {"model": model, "input": items, "temperature": temperature, "store": True}
+    if instructions is not None:
+        body["instructions"] = instructions
+    if previous is not None:
+        body["previous_response_id"] = previous
+    return client.responses.create(**body), len(json.dumps(body).encode("utf-8"))
+
+
+def stats():
+    with _lock:
+        out = {m: dict(s) for m, s in _stats.items()}
+    for s in out.values():
+        s["bytes_per_turn"] = s["bytes_sent"] / s["requests"] if s["requests"] else 0.0
+        s["full_bytes_per_turn"] = s["bytes_full"] / s["requests"] if s["requests"] else 0.0
+    return out
@@ -0,0 +1,292 @@
+"""External session state so any worker process can serve any session.
+
+Streamlit keeps ``st.session_state`` inside the process that owns the
+websocket. With PROFESSORBOT_SESSION_STORE set, the conversation state
+(messages, turn_count, conversation_done, pending turn) is also kept in a
+shared store and the browser carries a ``?sid=`` query parameter, so a refresh
+or a reconnect that lands on another worker picks the conversation up where it
+left off.
+
+    PROFESSORBOT_SESSION_STORE   unset (default, Streamlit-only state),
+                                 "sqlite:///sessions.sqlite3" (relative path),
+                                 "sqlite:////srv/sessions.sqlite3" (absolute) or
+                                 "redis://host:6379/0" (any Redis-protocol server)
+    PROFESSORBOT_SESSION_TTL     seconds a stored session is kept; default 7 days
+    PROFESSORBOT_REDIS_TIMEOUT   seconds to wait for the Redis server; default 5.
+                                 A dropped or stalled connection is reopened once
+                                 and the command sent again before giving up.
+
+Writes use optimistic concurrency: every save names the version it was based
+on and fails with ``VersionConflict`` if another worker saved first. The
+pages' ``persist`` then reloads the other worker's save: when it is an
+earlier point of the same conversation the change is re-applied on top of
+it, otherwise the other save wins and the student gets a note
+(``CONFLICT_NOTE``) to check the conversation and resend.
+"""
+import abc
+import json
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+from professorbot import config
+from professorbot.chatlog import ChatLog
+
+STORE_URL = config.get("PROFESSORBOT_SESSION_STORE")
+SESSION_TTL = config.get_int("PROFESSORBOT_SESSION_TTL", 7 * 24 * 3600)
+REDIS_TIMEOUT = config.get_float("PROFESSORBOT_REDIS_TIMEOUT", 5.0)
+
+STATE_KEYS = ("turn_count", "conversation_done", "pending")
+EXPIRE_EVERY = 60.0  # seconds between deletions of expired sessions (SQLite; Redis expires keys itself)
+CONFLICT_NOTE = ("This conversation was just updated from another tab or window, so your last message "
+                 "was not saved. Please check the conversation above and send it again if it is still needed.")
+
+
+class VersionConflict(Exception):
+    pass
+
+
+class SessionStore(abc.ABC):
+    """Versioned key-value store for serialized session state."""
+
+    @abc.abstractmethod
+    def version(self, sid):
+        """Current version of ``sid``; 0 when it does not exist."""
+
+    @abc.abstractmethod
+    def load(self, sid):
+        """``(version, state)``; ``(0, None)`` when it does not exist."""
+
+    @abc.abstractmethod
+    def save(self, sid, state, expected_version):
+        """Store ``state`` if ``sid`` is still at ``expected_version``; return the new version."""
+
+
+class SQLiteStore(SessionStore):
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " sid TEXT PRIMARY KEY, version INTEGER NOT NULL, data TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+        self._expired = 0.0
+
+    def version(self, sid):
+        with self._lock:
+            row = self._db.execute("SELECT version FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        return row[0] if row else 0
+
+    def load(self, sid):
+        with self._lock:
+            row = self._db.execute("SELECT version, data FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else (0, None)
+
+    def save(self, sid, state, expected_version):
+        data, now = json.dumps(state), time.time()
+        with self._lock:
+            if expected_version == 0:
+                cur = self._db.execute(
+                    "INSERT OR IGNORE INTO sessions VALUES (?, 1, ?, ?)", (sid, data, now))
+            else:
+                cur = self._db.execute(
+                    "UPDATE sessions SET version = version + 1, data = ?, updated = ?"
+                    " WHERE sid = ? AND version = ?", (data, now, sid, expected_version))
+            if cur.rowcount != 1:
+                raise VersionConflict(sid)
+            if now - self._expired >= EXPIRE_EVERY:
+                self._expired = now
+                self._db.execute("DELETE FROM sessions WHERE updated < ?", (now - SESSION_TTL,))
+        return expected_version + 1
+
+
+class RedisStore(SessionStore):
+    """Minimal RESP client; works with Redis, Valkey, KeyDB and other compatible servers."""
+
+    # compare-and-set on the version field, atomically on the server
+    _CAS = (
+        "local v = redis.call('HGET', KEYS[1], 'version') or '0' "
+        "if v ~= ARGV[1] then return -1 end "
+        "redis.call('HSET', KEYS[1], 'version', ARGV[2], 'data', ARGV[3]) "
+        "redis.call('EXPIRE', KEYS[1], ARGV[4]) "
+        "return tonumber(ARGV[2])"
+    )
+
+    def __init__(self, host="localhost", port=6379, db=0, password=None, prefix="professorbot:session:",
+                 timeout=REDIS_TIMEOUT):
+        self.prefix = prefix
+        self.address = (host, port)
+        self.timeout = timeout
+        self._database, self._password = db, password
+        self._lock = threading.Lock()
+        self._sock = None
+        with self._lock:
+            self._connect()
+
+    def _connect(self):
+        # caller holds _lock
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = socket.create_connection(self.address, self.timeout)
+        self._buf = self._sock.makefile("rb")
+        if self._password:
+            self._send("AUTH", self._password)
+        if self._database:
+            self._send("SELECT", self._database)
+
+    def _send(self, *args):
+        out = [f"*{len(args)}\r\n".encode()]
+        for a in args:
+            a = a if isinstance(a, bytes) else str(a).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(a), a))
+        self._sock.sendall(b"".join(out))
+        return self._reply()
+
+    def _command(self, *args):
+        with self._lock:
+            try:
+                return self._send(*args)
+            except OSError:  # dropped or timed out (ConnectionError, socket.timeout): reconnect once
+                self._connect()
+                return self._send(*args)
+
+    def _reply(self):
+        line = self._buf.readline()
+        if not line:
+            raise ConnectionError(f"Redis server at {self.address[0]}:{self.address[1]} closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            data = self._buf.read(n + 2)[:-2]
+            return data.decode("utf-8")
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [self._reply() for _ in range(n)]
+        raise RuntimeError(f"unexpected reply {line!r}")
+
+    def version(self, sid):
+        return int(self._command("HGET", self.prefix + sid, "version") or 0)
+
+    def load(self, sid):
+        version, data = self._command("HMGET", self.prefix + sid, "version", "data")
+        return (int(version), json.loads(data)) if version else (0, None)
+
+    def save(self, sid, state, expected_version):
+        # a save resent after a lost reply fails the version check and is resolved as a conflict
+        new = self._command("EVAL", self._CAS, 1, self.prefix + sid,
+                            expected_version, expected_version + 1, json.dumps(state), SESSION_TTL)
+        if new < 0:
+            raise VersionConflict(sid)
+        return new
+
+    # ---------- pub/sub (used by professorbot.progress across workers) ----------
+    def publish(self, channel, message):
+        return self._command("PUBLISH", channel, message)
+
+    def listen(self, channel):
+        """Yield messages published on ``channel``; the connection is dedicated to it from then on."""
+        self._command("SUBSCRIBE", channel)
+        while True:
+            self._sock.settimeout(None)  # a quiet channel is not a stalled server
+            try:
+                kind, _, data = self._reply()
+            except OSError:  # dropped: reconnect and subscribe again (raises if the server is gone)
+                with self._lock:
+                    self._connect()
+                self._command("SUBSCRIBE", channel)
+                continue
+            if kind == "message":
+                yield data
+
+
+def open_store(url):
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        return SQLiteStore(parsed.path[1:])  # sqlite:///relative.sqlite3, sqlite:////absolute.sqlite3
+    if parsed.scheme == "redis":
+        return RedisStore(parsed.hostname or "localhost", parsed.port or 6379,
+                          int(parsed.path.strip("/") or 0), parsed.password)
+    raise ValueError(f"unsupported session store {url!r}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def store():
+    """Process-wide store, or None when sessions are Streamlit-only."""
+    global _store
+    if STORE_URL and _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = open_store(STORE_URL)
+    return _store
+
+
+# ---------- page helpers ----------
+def snapshot(session_state):
+    state = {k: session_state.get(k) for k in STATE_KEYS}
+    state["messages"] = session_state.messages.to_rows()
+    return state
+
+
+def restore(session_state, query_params):
+    """Bring ``session_state`` up to date with the shared store (no-op without one)."""
+    shared = store()
+    if shared is None:
+        return
+    sid = query_params.get("sid")
+    if not sid:
+        sid = query_params["sid"] = uuid.uuid4().hex
+    if session_state.get("store_sid") == sid and shared.version(sid) == session_state.store_version:
+        return
+    version, state = shared.load(sid)
+    session_state.store_sid = sid
+    _adopt(session_state, version, state)
+
+
+def _adopt(session_state, version, state):
+    session_state.store_version = version
+    if state is not None:
+        session_state.messages = ChatLog.from_rows(state["messages"])
+        for k in STATE_KEYS:
+            session_state[k] = state.get(k)
+
+
+def persist(session_state, attempts=3):
+    """Save the conversation, re-applying it over another worker's earlier save of it.
+
+    False when another worker saved a different continuation first: that one is
+    loaded into ``session_state`` and ``input_note`` asks the student to check
+    and resend.
+    """
+    shared = store()
+    if shared is None:
+        return True
+    sid = session_state.store_sid
+    for _ in range(attempts):
+        mine = snapshot(session_state)
+        try:
+            session_state.store_version = shared.save(sid, mine, session_state.store_version)
+            return True
+        except VersionConflict:
+            version, theirs = shared.load(sid)
+        if theirs is not None and mine["messages"][:len(theirs["messages"])] != theirs["messages"]:
+            break
+        session_state.store_version = version  # theirs is behind ours (or expired): save ours over it
+    _adopt(session_state, version, theirs)
+    session_state["input_note"] = CONFLICT_NOTE
+    return False
@@ -0,0 +1,33 @@
+"""Identify the student behind a conversation.
+
+Every procedure opens by asking for the student's Penn ID, so the first user
+message normally carries it. Until it does, the Streamlit session id is used.
+"""
+import re
+
+PENN_ID_RE = re.compile(r"(?<!\d)\d{8}(?!\d)")
+
+
+def penn_id(text):
+    m = PENN_ID_RE.search(text or "")
+    return m.group(0) if m else None
+
+
+def student_key(messages, session_id=None):
+    """Penn ID from the first user message, else ``session:<id>``."""
+    for m in messages:
+        if m["role"] == "user":
+            pid = penn_id(m["content"])
+            if pid:
+                return pid
+            break
+    return f"session:{session_id or current_session_id()}"
+
+
+def current_session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return "local"
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else "local"
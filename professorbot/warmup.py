@@ -0,0 +1,164 @@
+"""Server start-up warm-up: connections, prompt precomputation and readiness.
+
+Run a page through this module instead of ``streamlit run`` and the server
+process first
+
+1. imports the completion stack (openai, httpx, ...),
+2. opens PROFESSORBOT_WARM_CONNECTIONS (default 4) pooled connections to each
+   completion backend and validates its key with a cheap model lookup,
+3. counts tokens and hashes SYSTEM_PROMPT and PROCEDURE_PROMPT of every page and
+   fills the shared prompt-prefix cache,
+
+then starts Streamlit in the same process, so the first student gets the warm
+connections, and writes PROFESSORBOT_READY_FILE once Streamlit's port accepts
+connections:
+
+    python -m professorbot.warmup "Brain-II.py" --server.port 8501
+    python -m professorbot.warmup --probe    # exit 0 while ready (container readiness probe)
+"""
+import ast
+import glob
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from professorbot import backends, config, limits, llm
+from professorbot.chatlog import prompt_prefix
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READY_FILE = config.get("PROFESSORBOT_READY_FILE", "/tmp/professorbot.ready")
+WARM_CONNECTIONS = config.get_int("PROFESSORBOT_WARM_CONNECTIONS", 4)
+
+PROMPT_STATS = {}  # module -> token counts and hashes, filled by precompute()
+
+
+def page_constants(path, names=("MODULE", "SYSTEM_PROMPT", "PROCEDURE_PROMPT")):
+    """Read string constants from a page without running it."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    found = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            name = getattr(node.targets[0], "id", None)
+            if name in names:
+                value = node.value
+                if isinstance(value, ast.JoinedStr):  # f-strings without placeholders
+                    if not all(isinstance(v, ast.Constant) for v in value.values):
+                        continue
+                    found[name] = "".join(v.value for v in value.values)
+                elif isinstance(value, ast.Constant) and isinstance(value.value, str):
+                    found[name] = value.value
+    return found
+
+
+def pages(root=ROOT):
+    """Module page scripts (the top-level .py files)."""
+    return sorted(glob.glob(os.path.join(root, "*.py")))
+
+
+def count_tokens(text):
+    try:
+        import tiktoken
+    except ImportError:
+        return limits.estimate_tokens(text)
+    return len(tiktoken.get_encoding("o200k_base").encode(text))
+
+
+def precompute(paths=None):
+    for path in paths or pages():
+        c = page_constants(path)
+        if "SYSTEM_PROMPT" not in c or "PROCEDURE_PROMPT" not in c:
+            continue
+        system, procedure = (m["content"] for m in prompt_prefix(c["SYSTEM_PROMPT"], c["PROCEDURE_PROMPT"]))
+        PROMPT_STATS[c.get("MODULE", os.path.basename(path))] = {
+            "system_tokens": count_tokens(system),
+            "procedure_tokens": count_tokens(procedure),
+            "sha256": hashlib.sha256((system + procedure).encode()).hexdigest(),
+        }
+    return PROMPT_STATS
+
+
+def warm_connections(n=WARM_CONNECTIONS):
+    """Open ``n`` pooled connections in parallel to every backend key; return each request's latency in seconds."""
+    targets = [k for b in backends.BACKENDS.values() for k in b.keys if k.api_key]
+    if not targets:
+        raise RuntimeError("OPENAI_API_KEY is not set")
+
+    def touch(key):
+        started = time.perf_counter()
+        key.client().models.retrieve(key.backend.model or llm.MODEL)
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(n * len(targets)) as pool:
+        return list(pool.map(touch, [k for k in targets for _ in range(n)]))
+
+
+def warm(paths=None, connections=WARM_CONNECTIONS):
+    if os.path.exists(READY_FILE):
+        os.remove(READY_FILE)
+    started = time.perf_counter()
+    summary = {"prompts": precompute(paths)}
+    if connections > 0:
+        summary["connect_s"] = [round(t, 4) for t in warm_connections(connections)]
+    summary["warmup_s"] = round(time.perf_counter() - started, 4)
+    return summary
+
+
+def accepting(port, host="127.0.0.1", timeout=0.5):
+    try:
+        with socket.create_connection((host, port), timeout):
+            return True
+    except OSError:
+        return False
+
+
+def mark_ready(summary, port, timeout=120.0):
+    """Write READY_FILE once ``port`` accepts connections; False if it does not within ``timeout`` seconds."""
+    ends = time.monotonic() + timeout
+    while not accepting(port):
+        if time.monotonic() > ends:
+            return False
+        time.sleep(0.1)
+    with open(READY_FILE, "w", encoding="utf-8") as f:
+        json.dump({**summary, "port": port}, f, indent=2)
+    return True
+
+
+def probe():
+    """0 when warm-up finished and the server it started still accepts connections, else 1."""
+    try:
+        with open(READY_FILE, encoding="utf-8") as f:
+            port = json.load(f)["port"]
+    except (OSError, ValueError, KeyError):
+        return 1
+    return 0 if accepting(port) else 1
+
+
+def server_port(args):
+    """The port ``streamlit run`` will listen on with these arguments."""
+    for i, arg in enumerate(args):
+        if arg.startswith("--server.port="):
+            return int(arg.partition("=")[2])
+        if arg == "--server.port" and i + 1 < len(args):
+            return int(args[i + 1])
+    return int(os.getenv("STREAMLIT_SERVER_PORT", 8501))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--probe"]:
+        sys.exit(probe())
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    summary = warm()
+    print(f"warm-up done in {summary['warmup_s']}s: {len(summary['prompts'])} pages, "
+          f"connections {summary.get('connect_s')}", file=sys.stderr)
+    threading.Thread(target=mark_ready, args=(summary, server_port(sys.argv[2:])), daemon=True).start()
+
+    from streamlit.web import cli
+
+    sys.exit(cli.main.main(args=["run", *sys.argv[1:]], prog_name="streamlit"))
@@ -0,0 +1,29 @@
+import pytest
+
+from professorbot import backends, localserver
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Route every module to one backend whose keys are local servers: ``pool({"a": Limits(...), ...})``.
+
+    A key maps to ``Limits`` (or None for an unlimited endpoint) and is sent as ``sk-<name>``.
+    """
+    servers = []
+
+    def make(keys, name="local"):
+        specs = []
+        for key, gate in keys.items():
+            server = localserver.serve(port=0, limits=gate)
+            servers.append(server)
+            specs.append({"name": key, "api_key": f"sk-{key}",
+                          "base_url": f"http://127.0.0.1:{server.server_port}/v1"})
+        backend = backends.Backend(name, keys=specs, metered=False)
+        monkeypatch.setattr(backends, "BACKENDS", {name: backend})
+        monkeypatch.setattr(backends, "WEIGHTS", {"*": {name: 1}})
+        return backend
+
+    yield make
+    for server in servers:
+        server.shutdown()
+        server.server_close()
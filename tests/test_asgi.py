@@ -0,0 +1,81 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from professorbot import asgi, engine, quota
+
+
+async def _call(method, path, body=None):
+    """One request against the app: ``(status, body)``; event streams are parsed into ``[(event, data)]``."""
+    sent, request = [], json.dumps(body).encode() if body is not None else b""
+    first = True
+
+    async def receive():
+        nonlocal first
+        if first:
+            first = False
+            return {"type": "http.request", "body": request, "more_body": False}
+        await asyncio.Event().wait()  # the client stays connected
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.app({"type": "http", "method": method, "path": path, "query_string": b""}, receive, send)
+    status = sent[0]["status"]
+    data = b"".join(m.get("body", b"") for m in sent[1:])
+    if dict(sent[0]["headers"]).get(b"content-type") == b"text/event-stream":
+        events = [block.split("\n", 1) for block in data.decode().split("\n\n") if block]
+        return status, [(e[len("event: "):], json.loads(d[len("data: "):])) for e, d in events]
+    return status, json.loads(data)
+
+
+@pytest.fixture
+def module(pool, monkeypatch, tmp_path):
+    pool({"a": None})
+    monkeypatch.setattr(quota, "_ledger", quota.QuotaLedger(str(tmp_path / "ledger.sqlite3")))
+    return next(iter(asgi.engines()))
+
+
+def test_engine_calls_run_off_the_event_loop(module, monkeypatch):
+    threads = {}
+    for name in ("accept", "finish"):
+        original = getattr(engine.Engine, name)
+
+        def spy(self, *args, _name=name, _original=original):
+            threads[_name] = threading.get_ident()
+            return _original(self, *args)
+
+        monkeypatch.setattr(engine.Engine, name, spy)
+
+    async def turn():
+        _, state = await _call("POST", f"/api/{module}/sessions")
+        status, events = await _call("POST", f"/api/{module}/sessions/{state['session']}/messages", {"text": "81234567"})
+        return threading.get_ident(), status, events
+
+    loop_thread, status, events = asyncio.run(turn())
+    assert status == 200 and events[-1][0] == "done" and events[-1][1]["text"]
+    assert set(threads) == {"accept", "finish"} and loop_thread not in threads.values()
+
+
+def test_a_slow_turn_does_not_stall_other_requests(module, monkeypatch):
+    accept = engine.Engine.accept
+    monkeypatch.setattr(engine.Engine, "accept", lambda self, state, text: (time.sleep(0.5), accept(self, state, text))[1])
+
+    async def race():
+        _, state = await _call("POST", f"/api/{module}/sessions")
+        url = f"/api/{module}/sessions/{state['session']}"
+        started = time.monotonic()
+        first = asyncio.ensure_future(_call("POST", f"{url}/messages", {"text": "81234567"}))
+        second = asyncio.ensure_future(_call("POST", f"{url}/messages", {"text": "81234567"}))
+        await asyncio.sleep(0.1)
+        status, _ = await _call("GET", url)
+        waited = time.monotonic() - started
+        return status, waited, await first, await second
+
+    status, waited, first, second = asyncio.run(race())
+    assert status == 200 and waited < 0.4  # answered while the first message is still being accepted
+    assert first[0] == 200 and first[1][-1][0] == "done"
+    assert second == (409, {"error": "a reply is still owed"})
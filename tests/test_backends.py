@@ -0,0 +1,57 @@
+import time
+
+from professorbot import llm
+from professorbot.localserver import Limits
+
+MESSAGES = [{"role": "system", "content": "1. Ask a question.\n2. Ask another.\n3. Stop."},
+            {"role": "user", "content": "My answer is B because it is cheaper."}]
+
+
+def _complete(times=1):
+    for _ in range(times):
+        text, usage = llm.complete(MESSAGES, "test")
+        assert text and usage.total_tokens
+
+
+def test_rate_limited_key_fails_over(pool):
+    gates = {"a": Limits(rpm=1), "b": Limits(rpm=1000)}
+    a, b = pool(gates).keys
+    gates["a"].requests = 0  # spent by another client: a's next request is a 429
+
+    _complete()
+    assert gates["a"].stats["limited"] == 1 and b.calls == 1
+    assert a.disabled is None and a.down_until > time.time()  # waits out the reset, stays in the pool
+
+
+def test_exhausted_quota_fails_over_and_leaves_the_pool(pool):
+    gates = {"a": Limits(quota=0), "b": Limits()}
+    a, b = pool(gates).keys
+
+    _complete(3)
+    assert gates["a"].stats["exhausted"] == 1 and b.calls == 3
+    assert a.disabled == "quota" and not a.usable(time.time())
+
+
+def test_rejected_key_is_removed_from_the_pool(pool):
+    gates = {"a": Limits(api_key="sk-rotated"), "b": Limits()}
+    a, b = pool(gates).keys
+
+    _complete(5)
+    assert gates["a"].stats["rejected"] == 1 and a.calls == 1 and b.calls == 5
+    assert a.disabled == "rejected" and not a.usable(time.time())
+
+
+def test_routing_follows_remaining_quota_headers(pool):
+    gates = {"a": Limits(rpm=1000, tpm=100_000), "b": Limits(rpm=1000, tpm=100_000)}
+    a, b = pool(gates).keys
+    gates["a"].tokens = 5_000  # another client used most of a's minute
+
+    for key in (a, b):
+        key.client().models.list()  # every response carries x-ratelimit-remaining-*
+    _complete(4)
+    assert (a.calls, b.calls) == (0, 4)
+
+    gates["b"].tokens = 1_000
+    b.client().models.list()
+    _complete()
+    assert (a.calls, b.calls) == (1, 4)
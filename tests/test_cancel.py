@@ -0,0 +1,79 @@
+import time
+from concurrent.futures import CancelledError
+from types import SimpleNamespace
+
+import pytest
+
+from professorbot import backends, cancel, engine, jobs, llm, localserver, speculate
+from professorbot.chatlog import ChatLog, prompt_prefix
+
+PROCEDURE = "\n".join(f"{i}. Ask the student a long and careful question about their choice." for i in range(1, 6))
+
+
+def _request():
+    log = ChatLog()
+    log.append("assistant", "Hi, what is your Penn ID?")
+    log.append("user", "12345678")
+    return log.request(prompt_prefix("You are ProfessorBot.", PROCEDURE), "User turn count so far: 1.")
+
+
+def _until(condition, timeout=5.0):
+    ends = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < ends, "timed out"
+        time.sleep(0.01)
+
+
+def test_disconnect_aborts_the_stream_and_releases_the_key(pool, monkeypatch):
+    monkeypatch.setattr(localserver, "TOKEN_DELAY", 0.05)
+    key = pool({"a": localserver.Limits(tpm=1_000_000)}).keys[0]
+    released = []
+    release = backends.Key.release
+    monkeypatch.setattr(backends.Key, "release", lambda self, cost, usage=None, error=None: (
+        released.append((cost, usage)), release(self, cost, usage, error)))
+    aborted = localserver.STREAMS["aborted"]
+
+    table = jobs.Jobs(max_workers=2)
+    job = table.submit(("session", 1), llm.call_llm, _request(), "test")
+    _until(lambda: job.token.pieces)
+    table.cancel(("session", 1), "disconnected")
+    with pytest.raises(cancel.Cancelled, match="disconnected"):
+        job.result(5)
+
+    _until(lambda: localserver.STREAMS["aborted"] > aborted)  # the server saw the hang-up mid-stream
+    assert key.in_flight == 0
+    (cost, usage), = released
+    assert usage.completion_tokens < cost - usage.prompt_tokens  # settled with what was received
+
+
+def test_cancel_an_adopted_speculative_reply():
+    table = jobs.Jobs(max_workers=1)
+    table.submit(("busy",), time.sleep, 0.2)
+    speculative = table.submit(("speculative",), time.sleep, 0.2)  # still queued
+    table.adopt(("session", 1), speculate._Reply(speculative))
+
+    table.cancel(("session", 1), "disconnected")
+    assert speculative.token.reason() == "disconnected"
+    with pytest.raises(CancelledError):
+        speculative.result(1)
+
+
+def test_a_timed_out_turn_is_not_stored_and_can_be_sent_again(pool, monkeypatch):
+    monkeypatch.setattr(localserver, "TOKEN_DELAY", 0.05)
+    pool({"a": None})
+    eng = engine.Engine("Behavior I", "You are ProfessorBot.", PROCEDURE)
+    state = {"session_id": "test-deadline"}
+    engine.init_state(state)
+    eng.start(state)
+    assert eng.accept(state, "12345678")
+
+    request = state["messages"].request(eng.prefix, eng.control(state["turn_count"], state["messages"]))
+    text = cancel.run(cancel.Token(deadline=0.2), llm.call_llm, request, "Behavior I")
+    assert text is llm.TIMED_OUT
+    eng.finish(state, SimpleNamespace(key=None), text, "12345678")
+    assert state["input_note"] == llm.TIMED_OUT and state["pending"] is None
+    assert [m["role"] for m in state["messages"]] == ["assistant", "user"]
+
+    assert eng.accept(state, "12345678")
+    assert [m["role"] for m in state["messages"]] == ["assistant", "user"]
+    assert state["turn_count"] == 1 and state["pending"] == 1
@@ -0,0 +1,27 @@
+import pytest
+
+from professorbot import backends, cassette, llm
+from professorbot.chatlog import ChatLog, prompt_prefix
+
+
+def _request(answer):
+    log = ChatLog()
+    log.append("assistant", "Hi, what is your Penn ID?")
+    log.append("user", answer)
+    return log.request(prompt_prefix("You are ProfessorBot.", "1. Ask for the Penn ID.\n2. Ask a question.\n3. Stop."),
+                       "User turn count so far: 1.")
+
+
+def test_replay_matches_a_recording_from_a_non_default_backend(pool, monkeypatch, tmp_path):
+    pool({"a": None}).model = "practice-model"
+    monkeypatch.setattr(cassette, "_recorder", cassette.Recorder(str(tmp_path)))
+    text, usage = llm.complete(_request("12345678"), "test", "12345678")
+    (entry,) = cassette.load(str(tmp_path))
+    assert entry["request"]["model"] == "practice-model"
+
+    monkeypatch.setattr(cassette, "_recorder", None)
+    monkeypatch.setattr(cassette, "_player", cassette.Player(str(tmp_path), latency=0))
+    monkeypatch.setattr(backends, "attempts", lambda *a, **k: pytest.fail("replay went to the network"))
+    assert llm.complete(_request("12345678"), "test", "12345678") == (text, usage)
+    with pytest.raises(cassette.CassetteMiss):
+        llm.complete(_request("87654321"), "test", "87654321")
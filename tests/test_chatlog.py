@@ -0,0 +1,32 @@
+import os
+import stat
+import weakref
+
+from professorbot.chatlog import ChatLog
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_spilled_transcripts_are_private():
+    log = ChatLog()
+    log.append("user", "My Penn ID is 81234567")
+    log.spill()
+    path = log._spill_path
+    assert _mode(os.path.dirname(path)) == 0o700 and _mode(path) == 0o600
+    assert log[0]["content"] == "My Penn ID is 81234567" and not os.path.exists(path)
+
+
+def test_one_cleanup_per_log():
+    log = ChatLog()
+    log.append("user", "hello")
+    before = len(weakref.finalize._registry)
+    for _ in range(5):
+        log.spill()
+        len(log)  # reload
+    log.spill()
+    path = log._spill_path
+    assert len(weakref.finalize._registry) == before + 1
+    del log
+    assert not os.path.exists(path)
@@ -0,0 +1,69 @@
+from datetime import datetime
+
+from professorbot import closing, engine, ingest, llm
+from professorbot.chatlog import ChatLog
+
+PROCEDURE = """
+1. Ask for the Penn ID. \\n
+2. Ask what Iyengar and Lepper found with the jam displays. \\n
+3. Ask whether lower purchase rates are irrational. \\n
+4. Stop once the student clearly articulates (a) search costs or effort explain the lower purchase rates, and (b) utility depends on the process of choosing, not only final outcomes. \\n
+5. Give approval to download the transcript.
+"""
+SEARCH = "I think search costs and the extra effort of comparing jams explain the lower purchase rates."
+PROCESS = "So utility depends on the process of choosing too, not just on the final outcomes we end up with."
+
+
+def test_criteria_and_coverage():
+    stop_step, parts = closing.criteria(PROCEDURE)
+    assert stop_step == 4 and len(parts) == 2
+    assert not closing.met(PROCEDURE, [SEARCH, PROCESS])  # before the stop step
+    assert not closing.met(PROCEDURE, [SEARCH] * 3)  # enough turns, still one part
+    assert not closing.met(PROCEDURE, ["81234567", "search costs, process, outcomes, utility, effort"])  # too short
+    assert closing.met(PROCEDURE, ["81234567", SEARCH, PROCESS])
+    assert not closing.met("1. Ask for the Penn ID.\n2. Ask a question.", ["81234567", SEARCH, PROCESS])
+
+
+def _log(*student):
+    log = ChatLog()
+    for text in student:
+        log.append("assistant", "Tell me more.")
+        log.append("user", text)
+    return log
+
+
+def test_signal_is_off_by_default(monkeypatch):
+    log = _log("81234567", SEARCH, PROCESS)
+    monkeypatch.setattr(closing, "ENABLED", False)
+    assert closing.signal(PROCEDURE, log) == ""
+    assert engine.Engine("test", "You are ProfessorBot.", PROCEDURE).control(3, log).endswith("you must end now.")
+
+    monkeypatch.setattr(closing, "ENABLED", True)
+    assert closing.signal(PROCEDURE, _log("81234567", SEARCH)) == ""
+    assert "Completion check:" in closing.signal(PROCEDURE, log)
+    assert "Completion check:" in engine.Engine("test", "You are ProfessorBot.", PROCEDURE).control(3, log)
+
+
+def test_evaluate_with_the_llm_judge(monkeypatch, tmp_path):
+    db = ingest.connect(str(tmp_path / "archive.sqlite3"))
+    for i, answers in enumerate([["81234567", SEARCH, PROCESS, "Thanks!", "Bye."],
+                                 ["81234568", "I do not know.", "Maybe."]]):
+        pairs = [p for a in answers for p in (("assistant", "Tell me more."), ("user", a))]
+        ingest.insert(db, ingest.conversation(ingest.render(pairs), pairs, datetime(2026, 3, i + 1), "test"), "test")
+
+    calls = []
+
+    def judge(messages, module=None, student=None, session=None):
+        calls.append((messages, module, student))
+        return ("YES" if "process of choosing" in messages[1]["content"] else "NO"), None
+
+    monkeypatch.setattr(llm, "complete", judge)
+    out = closing.evaluate(db, "test", PROCEDURE, judge=10)
+    assert (out["conversations"], out["fired"], out["turns_saved"]) == (2, 1, 2)
+    assert out["judged"] == 6 == len(calls)  # every scored turn, up to the sample size
+    assert out["agreement"] == 1.0 and out["precision"] == 1.0 and out["recall"] == 1.0
+    messages, module, student = calls[0]
+    assert module == "test close-judge" and student is None
+    assert "search costs or effort" in messages[0]["content"] and messages[1]["content"].startswith("STUDENT: ")
+
+    assert "judged" not in closing.evaluate(db, "test", PROCEDURE)
@@ -0,0 +1,67 @@
+import numpy as np
+
+from professorbot import clusters
+
+SEARCH = ["Comparing 24 jams takes effort and search costs time.",
+          "The search costs of tasting every jam are too high.",
+          "Too much effort to compare all the jams, search costs matter.",
+          "Search costs and effort explain buying less."]
+REGRET = ["I would feel regret about the jams I did not pick.",
+          "More options mean more regret and less satisfaction afterwards.",
+          "Regret after choosing makes satisfaction lower.",
+          "Anticipated regret lowers my satisfaction with the choice."]
+
+
+def _archive(tmp_path, name, answers, first=1):
+    db = clusters.connect(str(tmp_path / name))
+    with db:
+        for i, text in enumerate(answers, first):
+            db.execute("INSERT INTO conversations VALUES (?, 'Behavior II', 1.0, ?, '2026-03-02T10:00:00',"
+                       " '2026-03-02', 1, 0, 'test')", (f"c{i}", f"8123456{i}"))
+            db.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)", [
+                (f"c{i}", 0, 0, "assistant", "Why were purchase rates lower?", "4"),
+                (f"c{i}", 1, 1, "user", text, "4"),
+                (f"c{i}", 2, 2, "user", "81234567", "4"),  # a Penn ID is not an answer
+            ])
+    return db
+
+
+def _groups(db):
+    (step, found), = clusters.report(db, "Behavior II", quotes=10).items()
+    return step, sorted(sorted(c["quotes"]) for c in found)
+
+
+def test_two_topics_make_two_clusters(tmp_path):
+    db = _archive(tmp_path, "a.sqlite3", SEARCH + REGRET)
+    assert clusters.update(db, "Behavior II", k=2) == {"4": 8}
+    assert _groups(db) == ("4", sorted([sorted(SEARCH), sorted(REGRET)]))
+
+
+def test_same_corpus_same_clusters(tmp_path):
+    runs = []
+    for name in ("a.sqlite3", "b.sqlite3"):
+        db = _archive(tmp_path, name, REGRET + SEARCH)
+        clusters.update(db, "Behavior II", k=3)
+        runs.append((clusters.report(db, "Behavior II", quotes=10),
+                     db.execute("SELECT centers FROM cluster_models").fetchone()))
+    assert runs[0] == runs[1]
+
+
+def test_new_answers_are_folded_in(tmp_path):
+    db = _archive(tmp_path, "a.sqlite3", SEARCH[:3] + REGRET[:3])
+    assert clusters.update(db, "Behavior II", k=2) == {"4": 6}
+    with db:
+        db.execute("INSERT INTO conversations VALUES ('c9', 'Behavior II', 1.0, '81234569', '2026-03-03T10:00:00',"
+                   " '2026-03-03', 1, 0, 'test')")
+        db.executemany("INSERT INTO messages VALUES ('c9', ?, ?, ?, ?, '4')",
+                       [(0, 0, "assistant", "Why?"), (1, 1, "user", SEARCH[3]), (2, 2, "user", REGRET[3])])
+    assert clusters.update(db, "Behavior II") == {"4": 2}  # only what was added since
+    assert clusters.update(db, "Behavior II") == {}
+    assert _groups(db) == ("4", sorted([sorted(SEARCH), sorted(REGRET)]))
+    assert clusters.update(db, "Behavior II", k=2, refit=True) == {"4": 8}
+
+
+def test_hashing_embedder_is_stable():
+    x = clusters.hashing_embedder(["search costs", "search costs", "regret"], dim=64)
+    assert x.shape == (3, 64) and np.allclose(np.linalg.norm(x, axis=1), 1.0)
+    assert np.array_equal(x[0], x[1]) and not np.array_equal(x[0], x[2])
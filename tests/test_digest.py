@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import pytest
+
+from professorbot import digest, ingest
+
+
+@pytest.fixture
+def archive(tmp_path):
+    db = ingest.connect(str(tmp_path / "archive.sqlite3"))
+    with db:
+        for n in range(5):
+            pairs = [("assistant", "Which option would you choose?"), ("user", f"Option {n}, because of reason {n}.")]
+            ingest.insert(db, ingest.conversation(ingest.render(pairs), pairs, datetime(2026, 9, 1), "Risk I"), "test")
+    return db
+
+
+def test_failed_summaries_do_not_discard_the_finished_ones(archive, monkeypatch):
+    calls = []
+
+    def complete(self, system, user):
+        calls.append(user)
+        if "Option 3" in user and len(calls) <= 5:
+            raise RuntimeError("upstream error")
+        return f"summary of {len(calls)}"
+
+    monkeypatch.setattr(digest.Digest, "_complete", complete)
+    first = digest.Digest(archive, "Risk I")
+    with pytest.raises(digest.Incomplete) as failed:
+        first.build()
+    assert len(failed.value.failed) == 1 and first.calls == 5
+
+    second = digest.Digest(archive, "Risk I")
+    assert second.build()
+    assert second.hits == 4 and second.calls == 2  # the failed map call, then the final merge
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from professorbot import forecast, metrics
+
+DAY = 86400.0
+SCHEDULE = [{"module": "Brain I", "assigned": 10 * DAY, "due": 17 * DAY, "bursts": []},
+            {"module": "Risk II", "assigned": 12 * DAY, "due": 19 * DAY, "students": 20,
+             "bursts": [{"at": 13 * DAY + 36000, "minutes": 50, "share": 0.5}]}]
+
+
+def _profiles():
+    # every Brain I conversation costs the same: two completions of 1000 + 100 tokens, 1 s each
+    brain = forecast.Profile([[(1000, 100, 1.0), (1000, 100, 1.0)]] * 3)
+    risk = forecast.Profile([[(500, 50, 0.5)], [(500, 50, 0.5)] * 3])
+    return {"Brain I": brain, "Risk II": risk}
+
+
+def test_profile_from_conversations():
+    p = forecast.Profile([[(1, 2, 0.1)], [], [(3, 4, 0.2), (5, 6, 0.3)]])
+    assert len(p) == 2 and p.turns.tolist() == [1, 2]
+    assert p.prompt.tolist() == [[1, 0], [3, 5]] and p.latency[1].tolist() == [0.2, 0.3]
+    with pytest.raises(ValueError):
+        forecast.Profile([[]])
+
+
+def test_spend_and_completions(monkeypatch):
+    monkeypatch.setattr(metrics, "PRICES", {"prompt": 2.0, "completion": 8.0})
+    out = forecast.simulate(_profiles(), SCHEDULE, enrollment=50, runs=40, workers=8, seed=1)
+    brain = out["Brain I"]
+    assert (brain["students"], brain["profiles"], brain["completions"]) == (50, 3, 100.0)
+    assert brain["spend_usd"] == brain["spend_usd_p95"] == round(100 * (1000 * 2 + 100 * 8) / 1e6, 2)
+    assert 1 <= brain["peak_concurrent"] <= 50 and 1 <= brain["peak_concurrent_p95"] <= 50
+    assert 20 <= out["Risk II"]["completions"] <= 60  # one or three completions per student
+    assert out["all"]["students"] == 70
+    assert out["all"]["completions"] == pytest.approx(brain["completions"] + out["Risk II"]["completions"], abs=0.1)  # rounded means
+    assert out["all"]["required_tpm_p95"] >= brain["required_tpm_p95"]
+
+
+def test_same_seed_same_forecast():
+    a = forecast.simulate(_profiles(), SCHEDULE, enrollment=30, runs=10, seed=7)
+    b = forecast.simulate(_profiles(), SCHEDULE, enrollment=30, runs=10, seed=7)
+    assert a == b
+
+
+def test_a_module_with_no_recordings_uses_the_course():
+    schedule = [*SCHEDULE, {"module": "Time III", "assigned": 20 * DAY, "due": 27 * DAY, "bursts": []}]
+    out = forecast.simulate(_profiles(), schedule, enrollment=10, runs=5, seed=3)
+    assert out["Time III"]["profiles"] == "course" and out["Time III"]["completions"] > 0
+
+
+def test_queue_helpers():
+    t = np.array([0.0, 0.0, 0.0, 10.0])
+    assert forecast._wait(t, np.ones(4), rate=1.0).tolist() == [0.0, 1.0, 2.0, 0.0]
+    keys, latency = np.array([0.0, 0.5, 0.9, 5.0]), np.ones(4)
+    assert forecast._peaks(keys, latency, np.zeros(4, int), 1).tolist() == [3.0]
+    requests, tokens = forecast._busiest_minute(np.array([0.0, 30.0, 59.0, 61.0]), np.array([1.0, 2.0, 3.0, 4.0]),
+                                                np.zeros(4, int), 1)
+    assert requests.tolist() == [3.0] and tokens.tolist() == [9.0]
@@ -0,0 +1,62 @@
+import os
+import sqlite3
+
+from professorbot import ingest
+
+PAIRS = [("assistant", "What is your Penn ID?"), ("user", "81234567"),
+         ("assistant", "Which option would you choose?"), ("user", "{answer}")]
+
+
+def _write(folder, name, answer):
+    text = ingest.render([(role, content.format(answer=answer)) for role, content in PAIRS])
+    (folder / name).write_text(text, encoding="utf-8")
+
+
+def test_malformed_timestamp_does_not_stop_the_run(tmp_path):
+    folder = tmp_path / "submissions"
+    folder.mkdir()
+    _write(folder, "transcript_20250210_120000.txt", "Option A.")
+    _write(folder, "transcript_20251399_256199.txt", "Option B.")  # month 13, hour 25
+    (folder / "transcript_20250211_090000.txt").write_bytes(b"")  # nothing to parse
+
+    db_path = str(tmp_path / "archive.sqlite3")
+    assert ingest.ingest(str(folder), db_path, workers=1) == (3, 2)
+
+    db = sqlite3.connect(db_path)
+    days = sorted(day for day, in db.execute("SELECT day FROM conversations"))
+    assert days[0] == "2025-02-10" and days[1] > "2025-02-10"  # the bad name falls back to the file time
+    assert db.execute("SELECT COUNT(*) FROM files WHERE conversation IS NULL").fetchone() == (1,)
+
+
+def test_a_changed_file_replaces_its_conversation(tmp_path):
+    folder = tmp_path / "submissions"
+    folder.mkdir()
+    _write(folder, "transcript_20250210_120000.txt", "Option A.")
+    _write(folder, "copy_transcript_20250210_120000.txt", "Option A.")  # submitted twice
+    _write(folder, "transcript_20250211_120000.txt", "Option A, because of search costs.")
+    db_path = str(tmp_path / "archive.sqlite3")
+    assert ingest.ingest(str(folder), db_path, workers=1) == (3, 2)
+
+    _write(folder, "transcript_20250211_120000.txt", "Option B, since more choice made me worse off.")
+    os.utime(folder / "transcript_20250211_120000.txt", (1, 1))
+    assert ingest.ingest(str(folder), db_path, workers=1) == (1, 1)
+    _write(folder, "transcript_20250210_120000.txt", "Option C.")
+    os.utime(folder / "transcript_20250210_120000.txt", (2, 2))
+    assert ingest.ingest(str(folder), db_path, workers=1) == (1, 1)
+
+    db = sqlite3.connect(db_path)
+    assert db.execute("SELECT COUNT(*) FROM conversations").fetchone() == (3,)  # the copy keeps Option A
+    answers = sorted(c for c, in db.execute("SELECT content FROM messages WHERE idx = 3"))
+    assert answers == ["Option A.", "Option B, since more choice made me worse off.", "Option C."]
+    assert db.execute("SELECT COUNT(*) FROM messages_fts WHERE messages_fts MATCH 'search'").fetchone() == (0,)
+    assert db.execute("SELECT COUNT(*) FROM messages WHERE conversation NOT IN (SELECT id FROM conversations)"
+                      ).fetchone() == (0,)
+
+
+def test_a_file_gone_before_stat_is_skipped(tmp_path):
+    folder = tmp_path / "submissions"
+    folder.mkdir()
+    _write(folder, "transcript_20250210_120000.txt", "Option A.")
+    db = ingest.connect(str(tmp_path / "archive.sqlite3"))
+    paths = [str(folder / "transcript_20250210_120000.txt"), str(folder / "gone.txt")]
+    assert [p for p, _ in ingest.changed_files(db, paths)] == paths[:1]
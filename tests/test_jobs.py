@@ -0,0 +1,42 @@
+import threading
+
+from professorbot import jobs
+
+
+def test_a_second_submit_joins_the_running_job():
+    table = jobs.Jobs(max_workers=2)
+    release, calls = threading.Event(), []
+    first = table.submit(("session", 1), lambda: (calls.append(1), release.wait(5))[1])
+    again = table.submit(("session", 1), calls.append, 2)
+    assert again is first
+    release.set()
+    assert first.result(5) is True and calls == [1]
+    assert table.submit(("session", 1), calls.append, 3) is first  # finished, not yet consumed
+
+
+def test_a_failed_job_is_retried():
+    table = jobs.Jobs(max_workers=1)
+    failed = table.submit(("session", 1), int, "not a number")
+    assert isinstance(failed.exception(5), ValueError)
+    retried = table.submit(("session", 1), int, "7")
+    assert retried is not failed and retried.result(5) == 7
+
+
+def test_a_cancelled_job_is_retried():
+    table = jobs.Jobs(max_workers=1)
+    release = threading.Event()
+    table.submit(("busy",), release.wait, 5)
+    queued = table.submit(("session", 1), int, "7")
+    assert queued.cancel()  # cancelled while queued, still stored under its key
+    retried = table.submit(("session", 1), int, "8")
+    release.set()
+    assert retried is not queued and retried.result(5) == 8
+
+
+def test_forget_drops_a_consumed_job():
+    table = jobs.Jobs(max_workers=1)
+    job = table.submit(("session", 1), int, "7")
+    assert job.result(5) == 7 and table.get(("session", 1)) is job
+    table.forget(job)
+    assert table.get(("session", 1)) is None and len(table) == 0
+    assert table.submit(("session", 1), int, "8").result(5) == 8  # the next turn starts fresh
@@ -0,0 +1,51 @@
+import pytest
+
+from professorbot import engine, limits
+
+
+@pytest.fixture
+def machine_limit(monkeypatch):
+    """Machine I allows 600 characters, every other module the 4000-character default."""
+    monkeypatch.setattr(limits, "MAX_CHARS", 4000)
+    monkeypatch.setattr(limits, "MAX_TOKENS", 1000)
+    monkeypatch.setattr(limits, "MODULE_LIMITS", {"Machine I": {"chars": 600}})
+    return 600
+
+
+def _engine(module):
+    eng = engine.Engine(module, "You are ProfessorBot.", "1. Ask for the Penn ID.\n2. Ask a question.\n3. Stop.")
+    state = {"session_id": f"limits-{module}"}
+    engine.init_state(state)
+    eng.start(state)
+    return eng, state
+
+
+def test_per_module_limit_in_reject_mode(machine_limit, monkeypatch):
+    monkeypatch.setattr(limits, "MODE", "reject")
+    assert limits.max_chars("Machine I") == machine_limit
+    assert limits.max_chars("Brain I") == 4000
+
+    eng, state = _engine("Machine I")
+    assert not eng.accept(state, "x" * (machine_limit + 1))
+    assert "under 600 characters" in state["input_note"]
+    assert len(state["messages"]) == 1 and state["turn_count"] == 0
+
+    assert eng.accept(state, "x" * machine_limit)
+    assert state["input_note"] is None
+    assert state["messages"][-1].full_text == "x" * machine_limit and state["turn_count"] == 1
+
+
+def test_per_module_limit_in_truncate_mode(machine_limit, monkeypatch):
+    monkeypatch.setattr(limits, "MODE", "truncate")
+    assert limits.max_chars("Machine I") is None
+
+    eng, state = _engine("Machine I")
+    assert eng.accept(state, "y" * machine_limit)
+    assert state["input_note"] is None and state["messages"][-1]["content"] == "y" * machine_limit
+
+    long = "z" * (machine_limit + 1)
+    assert eng.accept(state, long)
+    assert "first 600 characters" in state["input_note"]
+    assert state["messages"][-1].full_text == long  # the transcript keeps everything
+    assert state["messages"][-1]["content"].startswith("z" * machine_limit + "\n\n[… 1 characters omitted")
+    assert limits.check(long, "Brain I") == (None, None, False)  # other modules keep the default
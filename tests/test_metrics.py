@@ -0,0 +1,44 @@
+import threading
+
+import numpy as np
+
+from professorbot import metrics
+
+
+def test_percentiles_match_numpy_lower():
+    rng = np.random.default_rng(7)
+    buf = metrics.TurnBuffer(capacity=500)
+    rows = [(str(m), float(v), float(t)) for m, v, t in
+            zip(rng.choice(["Brain I", "Risk II", "Time III"], 800), rng.lognormal(0, 1, 800), rng.random(800))]
+    for module, latency, ttft in rows:
+        buf.record(module, latency, ttft, 100, 20, ts=1.0)
+    kept = rows[-500:]  # the ring buffer holds the last ``capacity`` rows
+
+    summary = buf.summary(percentiles=(0, 10, 50, 90, 99, 100))
+    assert sum(s["turns"] for s in summary.values()) == 500
+    for module, stats in summary.items():
+        latency = np.array([r[1] for r in kept if r[0] == module], np.float32)
+        ttft = np.array([r[2] for r in kept if r[0] == module], np.float32)
+        assert stats["turns"] == latency.size
+        for p in (0, 10, 50, 90, 99, 100):
+            assert np.isclose(stats[f"latency_p{p}"], np.percentile(latency, p, method="lower"), rtol=1e-6)
+            assert np.isclose(stats[f"ttft_p{p}"], np.percentile(ttft, p, method="lower"), rtol=1e-6, atol=1e-9)
+
+
+def test_summary_while_recording():
+    buf = metrics.TurnBuffer(capacity=1000)
+    stop = threading.Event()
+
+    def record():
+        while not stop.is_set():
+            buf.record("Brain I", 1.0, 0.5, 100, 20)
+
+    writer = threading.Thread(target=record)
+    writer.start()
+    try:
+        for _ in range(200):
+            for stats in buf.summary().values():
+                assert stats["latency_p50"] == 1.0 and stats["tokens_per_turn"] == 120.0
+    finally:
+        stop.set()
+        writer.join()
@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from professorbot import engine, warmup
+
+PAGES = warmup.pages()
+
+
+@pytest.mark.parametrize("page", PAGES, ids=[os.path.basename(p)[:-3] for p in PAGES])
+def test_page_reaches_approval_on_the_local_server(page, pool):
+    pool({"local": None})
+    eng = engine.Engine.from_page(page)
+    state = {"session_id": f"test-{eng.module}"}
+    engine.init_state(state)
+    eng.start(state)
+
+    answers = iter(["81234567"] + ["I think the second option, because the incentives are clearer there."] * 40)
+    while not state["conversation_done"]:
+        assert eng.accept(state, next(answers))
+        student = "81234567"
+        job = eng.reply_job(state, student)
+        eng.finish(state, job, job.result(10), student)
+        assert state["turn_count"] <= engine.MAX_TURNS
+
+    assert engine.approved(state["messages"][-1]["content"])
+    assert engine.transcript(state["messages"]).count("USER:\n") == state["turn_count"]
@@ -0,0 +1,40 @@
+from professorbot import progress
+
+MODULE = "Progress test"
+
+
+def test_publish_then_read_the_board(monkeypatch):
+    monkeypatch.setattr(progress, "STUCK_TURNS", 3)
+    monkeypatch.setattr(progress, "STUCK_IDLE", 300.0)
+    monkeypatch.setattr(progress, "_boards", {})
+    changed = []
+    unsubscribe = progress.subscribe(changed.append)
+    try:
+        progress.publish(MODULE, "s1", "81234567", "1", 0)
+        progress.publish(MODULE, "s2", "81234568", "1", 0)
+        progress.publish(MODULE, "s1", "81234567", "2", 1)
+        for turn in range(1, 5):  # s2 keeps getting replies on step 1
+            progress.publish(MODULE, "s2", "81234568", None if turn == 2 else "1", turn)
+        progress.publish(MODULE, "s3", "81234569", "2", 3)
+        progress.publish(MODULE, "s3", "81234569", None, 4, approved=True)
+        progress.publish(MODULE, "s3", "81234569", "1", 2)  # a late event does not undo the approval
+    finally:
+        unsubscribe()
+
+    board = progress.board(MODULE).snapshot()
+    assert changed == [MODULE] * 10
+    assert (board["students"], board["in_progress"], board["approved"]) == (3, 2, 1)
+    assert {s["step"]: s["students"] for s in board["steps"]} == {"1": 1, "2": 1}
+    (stuck,) = board["stuck"]
+    assert (stuck["student"], stuck["step"], stuck["turns_on_step"], stuck["reason"]) == ("81234568", "1", 4, "same step")
+
+    later = progress.board(MODULE).snapshot(now=board["latest"] + 301)  # everyone idle
+    assert {s["student"]: s["reason"] for s in later["stuck"]} == {"81234568": "idle", "81234567": "idle"}
+
+
+def test_sessions_leave_the_board_after_the_ttl(monkeypatch):
+    monkeypatch.setattr(progress, "_boards", {})
+    progress.publish(MODULE, "s1", "81234567", "1", 0)
+    board = progress.board(MODULE)
+    assert board.snapshot()["students"] == 1
+    assert board.snapshot(now=board.latest + progress.BOARD_TTL + 1)["students"] == 0
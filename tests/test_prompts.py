@@ -0,0 +1,29 @@
+import pytest
+
+from professorbot import procedure, prompts, warmup
+
+PAGES = [c for c in map(warmup.page_constants, warmup.pages()) if "SYSTEM_PROMPT" in c and "PROCEDURE_PROMPT" in c]
+
+
+def test_every_module_page_is_covered():
+    assert len(PAGES) == 19
+
+
+@pytest.mark.parametrize("page", PAGES, ids=[c["MODULE"] for c in PAGES])
+@pytest.mark.parametrize("name", ["SYSTEM_PROMPT", "PROCEDURE_PROMPT"])
+def test_normalization_keeps_the_content(page, name):
+    original = page[name]
+    compiled = prompts.normalize(original)
+    prompts.check(original, compiled)  # raises UnsafeCompile on any change beyond whitespace
+    assert compiled.split() == original.split()
+    assert [(n, t.split()) for n, t in procedure.steps(compiled)] == [(n, t.split()) for n, t in procedure.steps(original)]
+    assert prompts.normalize(compiled) == compiled
+    assert len(compiled) <= len(original)
+    assert prompts.compile_prompt(original) == compiled  # the compiled form is the one sent
+
+
+def test_a_changed_word_is_not_safe():
+    with pytest.raises(prompts.UnsafeCompile):
+        prompts.check("1. Ask for the Penn ID.\n2. Ask a question.", "1. Ask for the Penn ID.\n2. Ask two questions.")
+    with pytest.raises(prompts.UnsafeCompile):
+        prompts.check("1. Ask for the Penn ID.\n2. Ask a question.", "1. Ask for the Penn ID. 2. Ask a question.")
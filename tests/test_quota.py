@@ -0,0 +1,77 @@
+import pytest
+
+from professorbot import engine, llm, quota
+
+
+@pytest.fixture
+def ledger(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFESSORBOT_QUOTA_STUDENT_DAY", "1000")
+    monkeypatch.setenv("PROFESSORBOT_QUOTA_TERM", "5000")
+    monkeypatch.setenv("PROFESSORBOT_QUOTA_WARN_AT", "0.8")
+    return lambda: quota.QuotaLedger(str(tmp_path / "ledger.sqlite3"))
+
+
+def test_warn_then_block(ledger):
+    book = ledger()
+    book.record("alice", "Brain I", 500, 200, day="2026-03-02")
+    assert book.check("alice", "Brain I", day="2026-03-02") == (quota.OK, None)
+
+    book.record("alice", "Brain II", 100, 50, day="2026-03-02")
+    status, note = book.check("alice", "Brain I", day="2026-03-02")
+    assert status == quota.WARN and "85% of your daily limit" in note
+
+    book.record("alice", "Brain II", 100, 50, day="2026-03-02")
+    status, note = book.check("alice", "Brain I", day="2026-03-02")
+    assert status == quota.BLOCK and "your daily limit" in note
+    assert book.check("bob", "Brain I", day="2026-03-02") == (quota.OK, None)
+
+
+def test_daily_cap_resets_the_next_day(ledger):
+    book = ledger()
+    book.record("alice", "Brain I", 900, 100, day="2026-03-02")
+    assert book.check("alice", "Brain I", day="2026-03-02")[0] == quota.BLOCK
+    assert book.check("alice", "Brain I", day="2026-03-03") == (quota.OK, None)
+
+
+def test_term_cap_is_shared_across_workers(ledger):
+    first, second = ledger(), ledger()  # two processes opening the same ledger file
+    for day in ("2026-03-02", "2026-03-03", "2026-03-04", "2026-03-05", "2026-03-06"):
+        first.record("alice", "Brain I", 600, 0, day=day)
+        second.record("bob", "Brain I", 600, 0, day=day)
+    status, note = second.check("carol", "Brain I", day="2026-03-07")
+    assert status == quota.BLOCK and "the course limit for this term" in note
+    assert ledger().check("carol", "Brain I", day="2026-03-07")[0] == quota.BLOCK  # a worker started later
+
+
+def test_calls_without_a_student_count_toward_no_cap(ledger):
+    book = ledger()
+    book.record(None, "digest", 10_000, 1_000, day="2026-03-02")
+    assert book.check("alice", "Brain I", day="2026-03-02") == (quota.OK, None)
+    assert book.report()[0][:3] == (None, "digest", 1)  # still in the spend report
+
+
+def test_totals_are_rebuilt_for_an_older_ledger(ledger):
+    book = ledger()
+    book.record("alice", "Brain I", 900, 100, day="2026-03-02")
+    book._db.execute("DELETE FROM totals")
+    book._db.commit()
+    assert ledger().check("alice", "Brain I", day="2026-03-02")[0] == quota.BLOCK
+
+
+def test_a_blocked_turn_is_a_notice_not_a_reply(ledger, pool, monkeypatch):
+    pool({"a": None}).metered = True
+    book = ledger()
+    monkeypatch.setattr(quota, "_ledger", book)
+    eng = engine.Engine("test", "You are ProfessorBot.", "1. Ask for the Penn ID.\n2. Ask a question.\n3. Stop.")
+    state = {"session_id": "blocked"}
+    engine.init_state(state)
+    eng.start(state)
+    book.record("12345678", "test", 900, 100)
+
+    assert eng.accept(state, "12345678")
+    job = eng.reply_job(state, "12345678")
+    text = job.result(5)
+    eng.finish(state, job, text, "12345678")
+    assert isinstance(text, llm.Unanswered) and not text.retry
+    assert state["input_note"] == text
+    assert [m["role"] for m in state["messages"]] == ["assistant", "user"]
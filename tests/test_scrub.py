@@ -0,0 +1,69 @@
+import os
+import sqlite3
+
+from professorbot import ingest, scrub
+
+KEY = "test-key"
+PENN_ID = "81234567"
+NAME = "smithjane"
+TRANSCRIPT = ingest.render([
+    ("assistant", "Hi, I'm ProfessorBot. Before we begin: **What is your Penn ID?**"),
+    ("user", PENN_ID),
+    ("assistant", "Thanks! Tell me your age, gender, where you are from and your hobbies."),
+    ("user", "20\nfemale\nAustin\nchess and hiking"),
+    ("assistant", "Which option would a rational agent choose, A or B?"),
+    ("user", "B, because it is cheaper. Email me at jsmith@upenn.edu"),
+])
+
+
+def _submissions(root):
+    folder = os.path.join(root, f"{NAME}_{PENN_ID}")
+    os.makedirs(folder)
+    path = os.path.join(folder, f"{NAME}_{PENN_ID}_4411_Machine I_transcript_20250210_120000.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(TRANSCRIPT)
+    return path
+
+
+def _assert_clean(values):
+    for value in values:
+        text = str(value).lower()
+        assert NAME not in text and PENN_ID not in text and "jsmith" not in text, value
+
+
+def test_scrub_tree_leaves_no_name_or_penn_id(tmp_path):
+    _submissions(tmp_path / "in")
+    keymap = str(tmp_path / "keymap.sqlite3")
+    files, _, tokens = scrub.scrub_tree(str(tmp_path / "in"), str(tmp_path / "out"), keymap, 1, KEY)
+    assert files == 1 and tokens > 0
+
+    pseudonym = scrub.Scrubber(KEY).token("PENN_ID", PENN_ID)
+    for dirpath, dirs, names in os.walk(tmp_path / "out"):
+        _assert_clean(dirs + names)
+        for name in names:
+            assert name.startswith(pseudonym + "_") and name.endswith(".txt")
+            with open(os.path.join(dirpath, name), encoding="utf-8") as f:
+                text = f.read()
+            _assert_clean([text])
+            assert scrub.reveal(text, keymap) == TRANSCRIPT
+
+
+def test_scrub_archive_leaves_no_name_or_penn_id(tmp_path):
+    _submissions(tmp_path / "in")
+    raw = str(tmp_path / "raw.sqlite3")
+    ingest.ingest(str(tmp_path / "in"), raw, workers=1)
+    raw_ids = {row[0] for row in sqlite3.connect(raw).execute("SELECT id FROM conversations")}
+
+    out = str(tmp_path / "scrubbed.sqlite3")
+    count, _ = scrub.scrub_archive(raw, out, str(tmp_path / "keymap.sqlite3"), 1, KEY)
+    assert count == 1
+
+    db = sqlite3.connect(out)
+    tables = [row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'"
+                                           " AND name NOT LIKE 'messages_fts%'")]
+    for table in tables:
+        for row in db.execute(f"SELECT * FROM {table}"):
+            _assert_clean(row)
+    ids = {row[0] for row in db.execute("SELECT id FROM conversations")}
+    assert ids and not ids & raw_ids
+    assert {row[0] for row in db.execute("SELECT DISTINCT conversation FROM messages")} == ids
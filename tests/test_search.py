@@ -0,0 +1,56 @@
+import pytest
+
+from professorbot import ingest, search
+
+
+def _conversation(cid, module, student, day, messages):
+    """An archive record with explicit steps: ``messages`` is ``[(role, content, step), ...]``."""
+    rows, turn = [], 0
+    for idx, (role, content, step) in enumerate(messages):
+        turn += role == "user"
+        rows.append((idx, turn, role, content, step))
+    return {"id": cid, "module": module, "module_score": 1.0, "student": student, "started": f"{day}T10:00:00",
+            "day": day, "turns": turn, "approved": 0, "messages": rows}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    db = ingest.connect(str(tmp_path / "archive.sqlite3"))
+    with db:
+        ingest.insert(db, _conversation("c1", "Behavior II", "81234567", "2026-03-02", [
+            ("assistant", "Is this pattern irrational?", "4"),
+            ("user", "No, searching through 24 jams has real costs in time and effort.", "4"),
+        ]), "test")
+        ingest.insert(db, _conversation("c2", "Brain I", "81234568", "2026-03-09", [
+            ("assistant", "What about search costs?", "2"),
+            ("user", "Search costs do not matter to me, I just opt-out of choosing.", "2"),
+            ("user", "Honestly I never think about search costs.", "3"),
+        ]), "test")
+    return db
+
+
+def test_query_matches_stemmed_words(archive):
+    hits = search.search(archive, "search costs")
+    assert len(hits) == 4 and all("[" in h.snippet for h in hits)
+    assert {h.conversation for h in hits} == {"c1", "c2"}  # "searching ... costs" matches too
+    assert search.search(archive, "jam") and not search.search(archive, "marmalade")
+
+
+def test_filters(archive):
+    assert [h.role for h in search.search(archive, "search costs", role="assistant")] == ["assistant"]
+    assert {h.module for h in search.search(archive, "search costs", module="Brain I")} == {"Brain I"}
+    assert [h.step for h in search.search(archive, "search costs", module="Brain I", role="user", step="3")] == ["3"]
+    assert {h.day for h in search.search(archive, "search costs", since="2026-03-05")} == {"2026-03-09"}
+    assert {h.day for h in search.search(archive, "search costs", until="2026-03-05")} == {"2026-03-02"}
+    assert len(search.search(archive, "search costs", limit=2)) == 2
+
+
+def test_punctuation_and_raw_queries(archive):
+    assert search.fts_query('opt-out "choosing"') == '"opt-out" "choosing"'
+    (hit,) = search.search(archive, "opt-out")
+    assert hit.conversation == "c2" and hit.turn == 1
+    assert len(search.search(archive, "jams OR honestly", raw=True)) == 2
+
+
+def test_students(archive):
+    assert search.students(archive, "search costs", role="user") == [("81234568", 1, 2), ("81234567", 1, 1)]
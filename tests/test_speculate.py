@@ -0,0 +1,66 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from professorbot import engine, llm, metrics, quota, speculate
+
+PROCEDURE = "\n".join(f"{i}. Ask the student whether the pattern is irrational." for i in range(1, 6))
+
+
+@pytest.mark.parametrize("text", [
+    "Is this pattern of behavior necessarily irrational?",
+    "Good point. Would you say that choice overload applies to you?",
+    "Thanks for sharing.\nDid more choice make you worse off?",
+])
+def test_yes_no_questions(text):
+    assert speculate.candidates(text) == ["Yes", "No"]
+
+
+@pytest.mark.parametrize("text", [
+    "Can you describe what Iyengar and Lepper found?",
+    "Could you explain why purchase rates were lower?",
+    "Is it irrational, or can it be explained by search costs?",
+    "Have you experienced choice overload? In what settings?",
+    "Does it matter whether utility depends only on final outcomes rather than on the process of choosing"
+    " and on everything else the student brought up in the previous several turns of the conversation?",
+    "Do.",
+    "What did they find?",
+])
+def test_other_questions(text):
+    assert speculate.candidates(text) == []
+
+
+def test_speculation_is_charged_only_when_adopted(pool, monkeypatch, tmp_path):
+    pool({"a": None}).metered = True
+    ledger = quota.QuotaLedger(str(tmp_path / "ledger.sqlite3"))
+    monkeypatch.setattr(quota, "_ledger", ledger)
+    monkeypatch.setattr(metrics, "turns", metrics.TurnBuffer(100))
+    monkeypatch.setattr(speculate, "BUDGETS", {"test": {"candidates": 2, "session_tokens": 100_000}})
+
+    eng = engine.Engine("test", "You are ProfessorBot.", PROCEDURE)
+    state = {"session_id": "speculation"}
+    engine.init_state(state)
+    eng.start(state)
+    assert eng.accept(state, "12345678")
+    eng.finish(state, SimpleNamespace(key=None), "Is this pattern of behavior necessarily irrational?", "12345678")
+
+    futures = list(speculate._open["speculation", 2].values())
+    ends = time.monotonic() + 5
+    while not all(f.done() for f in futures):
+        assert time.monotonic() < ends, "timed out"
+        time.sleep(0.01)
+    assert ledger.report() == []
+    assert set(metrics.turns.summary()) == {llm.SPECULATIVE.format("test")}
+
+    assert eng.accept(state, "Yes.")
+    job = eng.reply_job(state, "12345678")
+    assert isinstance(job, speculate._Reply)
+    eng.finish(state, job, job.result(5), "12345678")
+
+    (student, module, calls, _, _), = ledger.report()
+    assert (student, module, calls) == ("12345678", "test", 1)
+    summary = metrics.turns.summary()
+    assert summary["test"]["turns"] == 1
+    assert summary[llm.SPECULATIVE.format("test")]["turns"] == 2
+    assert speculate.stats()["test"]["hits"] >= 1
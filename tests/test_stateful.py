@@ -0,0 +1,46 @@
+import pytest
+
+from professorbot import engine, llm, localserver, stateful
+
+PROCEDURE = "\n".join(f"{i}. Ask the student question number {i}." for i in range(1, 8))
+
+
+@pytest.fixture
+def seen(monkeypatch):
+    """Every message list the local server's engine was given."""
+    calls = []
+    generate = localserver.generate
+
+    def record(messages, temperature=0.4):
+        calls.append([(m["role"], m["content"]) for m in messages])
+        return generate(messages, temperature)
+
+    monkeypatch.setattr(localserver, "generate", record)
+    return calls
+
+
+def test_chained_turns_see_what_full_history_sees(pool, seen, monkeypatch):
+    pool({"a": None})
+    eng = engine.Engine("Behavior I", "You are ProfessorBot.", PROCEDURE)
+    state = {"session_id": "test-stateful"}
+    engine.init_state(state)
+    eng.start(state)
+    log = state["messages"]
+
+    for turn, answer in enumerate(["81234567", "I would pick A.", "Because it is cheaper.", "Yes."], 1):
+        assert eng.accept(state, answer)
+        control = eng.control(state["turn_count"], log)
+        request = log.request(eng.prefix, control)
+
+        monkeypatch.setattr(stateful, "ENABLED", False)
+        llm.complete(request, "Behavior I", None, "test-stateful")
+        monkeypatch.setattr(stateful, "ENABLED", True)
+        text, _ = llm.complete(request, "Behavior I", None, "test-stateful")
+        full, chained = seen[-2:]
+
+        assert chained.count(("system", control)) == 1
+        assert not [m for m in chained if m[1].startswith("User turn count") and m[1] != control]
+        assert [m for m in chained if m[1] != control] == [m for m in full if m[1] != control]
+
+        eng.finish(state, type("Job", (), {"key": None}), text, "81234567")
+    assert stateful.stats()["Behavior I"]["chained"] >= 3
@@ -0,0 +1,135 @@
+import multiprocessing
+import random
+import socket
+import threading
+import time
+
+import pytest
+
+from professorbot import store
+from professorbot.chatlog import ChatLog
+
+
+class State(dict):
+    """Stand-in for ``st.session_state``: keys are also attributes."""
+
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+
+def _turn(state, url, sid, text):
+    """One page run: reload, add an exchange, save."""
+    store.restore(state, {"sid": sid})
+    if "messages" not in state:
+        state.messages = ChatLog()
+    state.messages.append("user", text)
+    state.messages.append("assistant", f"reply to {text}")
+    return store.persist(state)
+
+
+def _worker(url, sid, name, turns, results):
+    store._store = store.open_store(url)
+    random.seed(name)
+    state, saved = State(), []
+    for i in range(turns):
+        time.sleep(random.random() * 0.005)
+        if _turn(state, url, sid, f"{name}-{i}"):
+            saved.append(f"{name}-{i}")
+        else:
+            assert state.input_note == store.CONFLICT_NOTE
+            state.input_note = None
+    results.put((name, saved))
+
+
+@pytest.fixture
+def url(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'sessions.sqlite3'}"
+    monkeypatch.setattr(store, "_store", store.open_store(url))
+    return url
+
+
+def test_two_workers_keep_every_saved_message(url):
+    results = multiprocessing.get_context("fork").Queue()
+    workers = [multiprocessing.get_context("fork").Process(target=_worker, args=(url, "sid", name, 40, results))
+               for name in ("a", "b")]
+    for w in workers:
+        w.start()
+    saved = dict(results.get(timeout=60) for _ in workers)
+    for w in workers:
+        w.join(10)
+        assert w.exitcode == 0
+
+    _, state = store.open_store(url).load("sid")
+    users = [content for role, content, _ in state["messages"] if role == "user"]
+    assert sorted(users) == sorted(saved["a"] + saved["b"])  # nothing saved was lost, nothing unsaved kept
+    assert [role for role, _, _ in state["messages"]] == ["user", "assistant"] * len(users)
+
+
+def test_conflicting_save_reloads_and_tells_the_student(url):
+    first, second = State(), State()
+    assert _turn(first, url, "sid", "hello")
+    store.restore(second, {"sid": "sid"})
+    assert _turn(first, url, "sid", "from the first tab")
+
+    second.messages.append("user", "from the second tab")
+    assert not store.persist(second)
+    assert second.input_note == store.CONFLICT_NOTE
+    assert [m.content for m in second.messages][-2:] == ["from the first tab", "reply to from the first tab"]
+
+
+def test_stale_save_of_the_same_conversation_is_reapplied(url):
+    first, second = State(), State()
+    assert _turn(first, url, "sid", "hello")
+    store.restore(second, {"sid": "sid"})
+    assert store.persist(first)  # saved again, nothing new
+
+    second.messages.append("user", "next")
+    assert store.persist(second)
+    assert store.store().load("sid")[1]["messages"][-1][1] == "next"
+
+
+def test_store_is_abstract():
+    with pytest.raises(TypeError):
+        store.SessionStore()
+
+
+def _fake_redis(behaviours):
+    """A RESP server answering HGET with a null; each connection follows the next of ``behaviours``:
+    "drop" closes it on the first command, "stall" never answers, "serve" answers."""
+    listener = socket.create_server(("127.0.0.1", 0))
+    accepted, held = [], []
+
+    def serve():
+        for behaviour in behaviours:
+            conn, _ = listener.accept()
+            accepted.append(behaviour)
+            held.append(conn)
+            conn.recv(4096)
+            if behaviour == "drop":
+                conn.close()
+            elif behaviour == "serve":
+                conn.sendall(b"$-1\r\n")
+                conn.recv(4096)  # hold it open until the client goes
+                conn.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener, accepted
+
+
+def test_redis_reconnects_once_after_a_dropped_connection():
+    listener, accepted = _fake_redis(["drop", "serve"])
+    with listener:
+        redis = store.RedisStore("127.0.0.1", listener.getsockname()[1], timeout=1)
+        assert redis.version("sid") == 0
+    assert accepted == ["drop", "serve"]
+
+
+def test_redis_gives_up_after_one_reconnect():
+    listener, accepted = _fake_redis(["stall", "stall"])
+    with listener:
+        redis = store.RedisStore("127.0.0.1", listener.getsockname()[1], timeout=0.2)
+        started = time.monotonic()
+        with pytest.raises(OSError):
+            redis.version("sid")
+        assert time.monotonic() - started < 2
+    assert accepted == ["stall", "stall"]
@@ -0,0 +1,28 @@
+import socket
+
+from professorbot import warmup
+
+
+def test_ready_only_while_the_port_accepts(monkeypatch, tmp_path):
+    monkeypatch.setattr(warmup, "READY_FILE", str(tmp_path / "ready"))
+    listener = socket.create_server(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+    assert warmup.probe() == 1
+
+    assert warmup.mark_ready({"prompts": {}}, port, timeout=1)
+    assert warmup.probe() == 0
+    listener.close()
+    assert warmup.probe() == 1  # the server is gone
+
+
+def test_not_ready_before_the_server_listens(monkeypatch, tmp_path):
+    monkeypatch.setattr(warmup, "READY_FILE", str(tmp_path / "ready"))
+    with socket.create_server(("127.0.0.1", 0)) as unused:
+        port = unused.getsockname()[1]
+    assert not warmup.mark_ready({"prompts": {}}, port, timeout=0.3)
+    assert warmup.probe() == 1
+
+
+def test_server_port():
+    assert warmup.server_port(["--server.port", "8600"]) == 8600
+    assert warmup.server_port(["--server.headless=true", "--server.port=8601"]) == 8601